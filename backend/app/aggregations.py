@@ -0,0 +1,115 @@
+from sqlalchemy import func, literal_column, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.cache import LRUCache
+from app.config import DASHBOARD_CACHE_TTL, DASHBOARD_CACHE_SIZE
+from app.filters import ClienteFilters, apply_cliente_filters
+from app.models import Cliente, Polizza
+
+# same bins and labels as the Dashboard charts, so a clicked bar can be sent back as a filter
+REDDITO_BINS = [0, 20000, 40000, 60000, 80000, 100000, 120000]
+REDDITO_LABELS = [f"{low}-{high}" for low, high in zip(REDDITO_BINS, REDDITO_BINS[1:])] + [f"{REDDITO_BINS[-1]}-+"]
+PROPENSIONE_BINS = [0, 0.21, 0.41, 0.61, 0.81, 1.01]
+PROPENSIONE_LABELS = ["0 - 0.20", "0.21 - 0.40", "0.41 - 0.60", "0.61 - 0.80", "0.81 - 1"]
+
+dashboard_cache = LRUCache(maxsize=DASHBOARD_CACHE_SIZE, ttl=DASHBOARD_CACHE_TTL)
+
+def invalidate_dashboard():
+    """Svuota la cache: una modifica a un cliente può cambiare qualsiasi combinazione di filtri."""
+    dashboard_cache.clear()
+
+def _bucket(column_name: str, bins: list):
+    # literal SQL so that the same text appears in SELECT and GROUP BY (bound params would differ)
+    bounds = ", ".join(str(b) for b in bins)
+    return literal_column(f"width_bucket({column_name}::float8, ARRAY[{bounds}]::float8[])")
+
+def _binned(counts: dict, labels: list) -> list:
+    # width_bucket returns 1..len(labels) for values inside the bins; 0 and overflow are dropped
+    return [{"label": label, "count": counts.get(i + 1, 0)} for i, label in enumerate(labels)]
+
+def _split_grouping_sets(rows, names: list) -> dict:
+    """
+    Divide le righe di una query GROUPING SETS per insieme di raggruppamento,
+    usando la maschera di bit restituita da grouping().
+    """
+    full_mask = (1 << len(names)) - 1
+    sets = {name: {} for name in names}
+    for row in rows:
+        *values, mask, count = row
+        for i, name in enumerate(names):
+            if mask == full_mask ^ (1 << (len(names) - 1 - i)):
+                sets[name][values[i]] = count
+    return sets
+
+async def _clienti_histograms(db: AsyncSession, filters: ClienteFilters) -> dict:
+    reddito_bucket = _bucket("reddito", REDDITO_BINS)
+    vita_bucket = _bucket("propensione_acquisto_prodotti_vita", PROPENSIONE_BINS)
+    danni_bucket = _bucket("propensione_acquisto_prodotti_danni", PROPENSIONE_BINS)
+    keys = [Cliente.eta, Cliente.professione, reddito_bucket, vita_bucket, danni_bucket]
+
+    stmt = select(*keys, func.grouping(*keys), func.count()).group_by(
+        func.grouping_sets(*[tuple_(key) for key in keys])
+    )
+    stmt = apply_cliente_filters(stmt, filters)
+    result = await db.execute(stmt)
+    return _split_grouping_sets(result.all(), ["eta", "professione", "reddito", "vita", "danni"])
+
+async def _polizze_totals(db: AsyncSession, filters: ClienteFilters) -> dict:
+    keys = [Polizza.prodotto, Polizza.area_di_bisogno]
+    stmt = select(*keys, func.grouping(*keys), func.count()).group_by(
+        func.grouping_sets(*[tuple_(key) for key in keys])
+    )
+    if filters != ClienteFilters():
+        clienti_filtrati = apply_cliente_filters(select(Cliente.codice_cliente), filters)
+        stmt = stmt.where(Polizza.codice_cliente.in_(clienti_filtrati))
+    result = await db.execute(stmt)
+    return _split_grouping_sets(result.all(), ["prodotto", "area"])
+
+async def _domini(db: AsyncSession) -> dict:
+    """Valori ammessi dai controlli del filtro, calcolati sull'intero portafoglio."""
+    cached = dashboard_cache.get("__domini__")
+    if cached is not None:
+        return cached
+    result = await db.execute(
+        select(func.min(Cliente.eta), func.max(Cliente.eta), func.array_agg(Cliente.professione.distinct()))
+    )
+    eta_min, eta_max, professioni = result.one()
+    domini = {
+        "eta_min": eta_min,
+        "eta_max": eta_max,
+        "professioni_disponibili": sorted(p for p in (professioni or []) if p),
+    }
+    dashboard_cache.set("__domini__", domini)
+    return domini
+
+async def get_dashboard(db: AsyncSession, filters: ClienteFilters) -> dict:
+    """
+    Calcola gli istogrammi della Dashboard con due query GROUP BY GROUPING SETS
+    (clienti e polizze) e li memorizza nella cache per chiave di filtro normalizzata.
+    """
+    key = filters.cache_key()
+    cached = dashboard_cache.get(key)
+    if cached is not None:
+        return cached
+
+    clienti = await _clienti_histograms(db, filters)
+    polizze = await _polizze_totals(db, filters)
+
+    def _counts(values: dict, sort_by_count: bool = False) -> list:
+        items = [(label, count) for label, count in values.items() if label is not None]
+        items.sort(key=(lambda item: -item[1]) if sort_by_count else (lambda item: item[0]))
+        return [{"label": str(label), "count": count} for label, count in items]
+
+    payload = {
+        "totale_clienti": sum(clienti["eta"].values()),
+        "eta": _counts(clienti["eta"]),
+        "professioni": _counts(clienti["professione"], sort_by_count=True),
+        "reddito": _binned(clienti["reddito"], REDDITO_LABELS),
+        "propensione_vita": _binned(clienti["vita"], PROPENSIONE_LABELS),
+        "propensione_danni": _binned(clienti["danni"], PROPENSIONE_LABELS),
+        "prodotti": _counts(polizze["prodotto"], sort_by_count=True),
+        "aree_di_bisogno": _counts(polizze["area"], sort_by_count=True),
+        **(await _domini(db)),
+    }
+    dashboard_cache.set(key, payload)
+    return payload
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+
+# misses whose closest cached question was at most this much below the threshold
+# (the ones a lower threshold would have turned into hits)
+MARGINE_QUASI_HIT = 0.05
+
+class SemanticAnswerCache:
+    """
+    Cache delle risposte del chatbot indicizzata sull'embedding della domanda: una domanda con
+    similarità del coseno >= threshold rispetto a una già vista riceve la risposta memorizzata.
+    Le voci scadono dopo `ttl` secondi; oltre `maxsize` viene scartata la meno usata di recente.
+    Gli embedding sono righe normalizzate di una matrice preallocata, così la ricerca è un solo
+    prodotto matrice-vettore.
+    """
+
+    def __init__(self, threshold: float, maxsize: int, ttl: Optional[float] = None):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.versione = None
+        self._lock = threading.Lock()
+        self._matrice = None
+        self._occupate = np.zeros(maxsize, dtype=bool)
+        # expiry time of each slot (inf without ttl), so expired rows are found without a Python loop
+        self._scadenze = np.full(maxsize, np.inf)
+        # slot -> (domanda, risposta, scadenza), in LRU order
+        self._voci = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.quasi_hit = 0
+
+    @staticmethod
+    def _normalizza(embedding) -> np.ndarray:
+        vettore = np.asarray(embedding, dtype=np.float32)
+        norma = np.linalg.norm(vettore)
+        return vettore / norma if norma else vettore
+
+    def _scarta(self, slot: int):
+        del self._voci[slot]
+        self._occupate[slot] = False
+
+    def _scarta_scadute(self):
+        for slot in np.flatnonzero(self._occupate & (self._scadenze <= time.time())):
+            self._scarta(int(slot))
+
+    def get(self, embedding) -> Optional[str]:
+        """Risposta memorizzata per la domanda più simile, se sopra la soglia."""
+        with self._lock:
+            # dropped before the search: an expired best match must not hide the next one above the threshold
+            self._scarta_scadute()
+            if not self._voci:
+                self.misses += 1
+                return None
+            similarita = self._matrice @ self._normalizza(embedding)
+            similarita[~self._occupate] = -1.0
+            slot = int(np.argmax(similarita))
+            migliore = float(similarita[slot])
+            if migliore >= self.threshold:
+                self._voci.move_to_end(slot)
+                self.hits += 1
+                return self._voci[slot][1]
+            if migliore >= self.threshold - MARGINE_QUASI_HIT:
+                self.quasi_hit += 1
+            self.misses += 1
+            return None
+
+    def set(self, embedding, domanda: str, risposta: str, versione: Optional[str] = None):
+        """
+        Memorizza la risposta. Con `versione` (quella dei documenti usati per generarla) la
+        risposta viene scartata se nel frattempo i documenti sono cambiati.
+        """
+        vettore = self._normalizza(embedding)
+        with self._lock:
+            if versione is not None and versione != self.versione:
+                return
+            if self._matrice is None or self._matrice.shape[1] != vettore.shape[0]:
+                self._matrice = np.zeros((self.maxsize, vettore.shape[0]), dtype=np.float32)
+                self._occupate[:] = False
+                self._voci.clear()
+            self._scarta_scadute()
+            if len(self._voci) >= self.maxsize:
+                self._scarta(next(iter(self._voci)))
+            slot = int(np.argmin(self._occupate))
+            self._matrice[slot] = vettore
+            self._occupate[slot] = True
+            scadenza = time.time() + self.ttl if self.ttl else None
+            self._voci[slot] = (domanda, risposta, scadenza)
+            self._scadenze[slot] = np.inf if scadenza is None else scadenza
+
+    def clear(self):
+        with self._lock:
+            self._svuota()
+
+    def _svuota(self):
+        self._voci.clear()
+        self._occupate[:] = False
+
+    def allinea(self, versione: str):
+        """Svuota la cache se i documenti (identificati da `versione`) sono cambiati."""
+        with self._lock:
+            # under the lock with the emptying, so a set() for the old version cannot land in between
+            if versione == self.versione:
+                return
+            precedente, self.versione = self.versione, versione
+            self._svuota()
+        if precedente is not None:
+            print("Documenti modificati: cache delle risposte svuotata.")
+
+    def stats(self) -> dict:
+        totale = self.hits + self.misses
+        return {
+            "size": len(self._voci),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / totale if totale else 0.0,
+            "quasi_hit": self.quasi_hit,
+        }
@@ -0,0 +1,82 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+K1 = 1.2
+B = 0.75
+# reciprocal rank fusion: 1 / (RRF_K + rank), dampens the weight of the very first positions
+RRF_K = 60
+
+STOPWORDS = frozenset("""
+a ad agli ai al all alla alle allo anche che chi ci come con cosa da dagli dai dal dall dalla dalle dallo
+degli dei del dell della delle dello di e ed gli ha hanno ho i il in l la le lo ma mi ne negli nei nel
+nell nella nelle nello non o per piu quale quali quando quello questa queste questi questo se si sono su
+sugli sui sul sull sulla sulle sullo tra fra un una uno
+""".split())
+
+_PAROLA = re.compile(r"[a-z0-9]+")
+_VOCALI = "aeiou"
+
+def tokenizza(testo: str) -> List[str]:
+    """
+    Termini per la ricerca testuale: minuscolo, senza accenti, elisioni e stopword italiane,
+    con la vocale finale tolta così singolare e plurale coincidono ("polizza", "polizze" -> "polizz").
+    """
+    testo = unicodedata.normalize("NFKD", testo)
+    testo = "".join(c for c in testo if not unicodedata.combining(c)).lower()
+    termini = []
+    for parola in _PAROLA.findall(testo):
+        if parola in STOPWORDS:
+            continue
+        if len(parola) > 3 and parola[-1] in _VOCALI:
+            parola = parola[:-1]
+        termini.append(parola)
+    return termini
+
+def costruisci(testi: Sequence[str]) -> Tuple[Dict[str, Tuple[int, int]], np.ndarray, np.ndarray]:
+    """
+    Indice BM25 dei testi come liste di posting contigue: per ogni termine l'intervallo
+    [inizio, fine) negli array `righe` (int32) e `pesi` (float32). Il peso è già il contributo
+    BM25 del termine al testo, quindi una ricerca è solo una somma di slice.
+    """
+    conteggi = [Counter(tokenizza(testo)) for testo in testi]
+    lunghezze = np.array([sum(c.values()) for c in conteggi], dtype=np.float32)
+    media = float(lunghezze.mean()) if len(lunghezze) and lunghezze.mean() > 0 else 1.0
+    posting: Dict[str, List[Tuple[int, int]]] = {}
+    for riga, conteggio in enumerate(conteggi):
+        for termine, tf in conteggio.items():
+            posting.setdefault(termine, []).append((riga, tf))
+
+    vocabolario, righe, pesi = {}, [], []
+    inizio = 0
+    n = len(testi)
+    for termine in sorted(posting):
+        lista = posting[termine]
+        idf = np.log(1 + (n - len(lista) + 0.5) / (len(lista) + 0.5))
+        r = np.fromiter((riga for riga, _ in lista), dtype=np.int32, count=len(lista))
+        tf = np.fromiter((tf for _, tf in lista), dtype=np.float32, count=len(lista))
+        righe.append(r)
+        pesi.append((idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lunghezze[r] / media))).astype(np.float32))
+        vocabolario[termine] = (inizio, inizio + len(lista))
+        inizio += len(lista)
+    if not righe:
+        return vocabolario, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+    return vocabolario, np.concatenate(righe), np.concatenate(pesi)
+
+def top_k(punteggi: np.ndarray, k: int) -> np.ndarray:
+    """Indici dei k punteggi più alti in ordine decrescente (argpartition, poi ordina solo i k)."""
+    k = min(k, len(punteggi))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    migliori = np.argpartition(-punteggi, k - 1)[:k]
+    return migliori[np.argsort(-punteggi[migliori], kind="stable")]
+
+def fondi_rrf(classifiche: Sequence[Sequence[int]], k: int) -> List[Tuple[int, float]]:
+    """Reciprocal rank fusion di più classifiche di righe: (riga, punteggio) dei primi k."""
+    punteggi: Dict[int, float] = {}
+    for classifica in classifiche:
+        for posizione, riga in enumerate(classifica):
+            punteggi[int(riga)] = punteggi.get(int(riga), 0.0) + 1.0 / (RRF_K + posizione + 1)
+    return sorted(punteggi.items(), key=lambda x: -x[1])[:k]
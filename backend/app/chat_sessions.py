@@ -0,0 +1,104 @@
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional, Tuple
+from app.tokens import conta_token
+
+_TAG = re.compile(r"</?\w+>")
+_FINE_FRASE = re.compile(r"(?<=[.!?])\s")
+# max characters of an answer kept in the summary of older turns
+RIASSUNTO_MAX_CARATTERI = 200
+
+class Sessione:
+    __slots__ = ("turni", "token", "riassunto", "ultimo_uso")
+
+    def __init__(self):
+        # (domanda, risposta, token) of the turns sent verbatim, oldest first
+        self.turni = deque()
+        self.token = 0
+        # one line per turn that no longer fits the budget, oldest first
+        self.riassunto = deque()
+        self.ultimo_uso = time.time()
+
+def riassumi_turno(domanda: str, risposta: str) -> str:
+    """Riga di riassunto di un turno: la domanda e la prima frase della risposta."""
+    testo = _TAG.sub("", risposta).strip()
+    prima_frase = _FINE_FRASE.split(testo, 1)[0][:RIASSUNTO_MAX_CARATTERI]
+    return f"- {domanda.strip()} → {prima_frase}"
+
+class SessionStore:
+    """
+    Conversazioni del chatbot per sessione (id scelto dal client). Al prompt vanno gli ultimi
+    turni che stanno in `token_storia` token; quelli più vecchi restano solo come righe di
+    riassunto (domanda e prima frase della risposta), entro `token_riassunto` token. Così la
+    dimensione del prompt non cresce con la lunghezza della conversazione.
+    Al massimo `maxsize` sessioni per processo: oltre viene scartata la meno usata di recente,
+    e una sessione inattiva da più di `ttl` secondi viene dimenticata.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, token_storia: int, token_riassunto: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.token_storia = token_storia
+        self.token_riassunto = token_riassunto
+        self._sessioni = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self, adesso: float):
+        # LRU order: the expired sessions are at the front
+        while self._sessioni:
+            session_id, sessione = next(iter(self._sessioni.items()))
+            if sessione.ultimo_uso + self.ttl > adesso:
+                break
+            del self._sessioni[session_id]
+
+    def storia(self, session_id: str) -> Tuple[List[dict], Optional[str]]:
+        """Messaggi della conversazione da anteporre alla domanda e ultima domanda della sessione."""
+        adesso = time.time()
+        with self._lock:
+            self._purge(adesso)
+            sessione = self._sessioni.get(session_id)
+            if sessione is None:
+                return [], None
+            sessione.ultimo_uso = adesso
+            self._sessioni.move_to_end(session_id)
+            messaggi = []
+            if sessione.riassunto:
+                messaggi.append({"role": "system", "content": "Riassunto della conversazione precedente:\n" + "\n".join(sessione.riassunto)})
+            for domanda, risposta, _ in sessione.turni:
+                messaggi.append({"role": "user", "content": domanda})
+                messaggi.append({"role": "assistant", "content": risposta})
+            ultima = sessione.turni[-1][0] if sessione.turni else None
+            return messaggi, ultima
+
+    def aggiungi(self, session_id: str, domanda: str, risposta: str):
+        """Registra un turno e riporta la storia entro il budget di token."""
+        adesso = time.time()
+        token = conta_token(domanda) + conta_token(risposta)
+        with self._lock:
+            self._purge(adesso)
+            sessione = self._sessioni.get(session_id)
+            if sessione is None:
+                if len(self._sessioni) >= self.maxsize:
+                    self._sessioni.popitem(last=False)
+                sessione = self._sessioni[session_id] = Sessione()
+            sessione.ultimo_uso = adesso
+            self._sessioni.move_to_end(session_id)
+            sessione.turni.append((domanda, risposta, token))
+            sessione.token += token
+            while sessione.token > self.token_storia and sessione.turni:
+                vecchia_domanda, vecchia_risposta, vecchi_token = sessione.turni.popleft()
+                sessione.token -= vecchi_token
+                sessione.riassunto.append(riassumi_turno(vecchia_domanda, vecchia_risposta))
+            while len(sessione.riassunto) > 1 and conta_token("\n".join(sessione.riassunto)) > self.token_riassunto:
+                sessione.riassunto.popleft()
+
+    def elimina(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessioni.pop(session_id, None) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._purge(time.time())
+            return {"sessioni": len(self._sessioni), "max_sessioni": self.maxsize, "ttl": self.ttl}
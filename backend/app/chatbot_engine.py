@@ -1,32 +1,89 @@
 import os
+import asyncio
 import hashlib
-import pickle
-from llama_index.core.chat_engine.types import ChatMode
-from llama_index.core.memory import ChatMemoryBuffer
-from llama_index.core import VectorStoreIndex, Document
+import re
+import unicodedata
+import threading
+import httpx
+from typing import AsyncIterator, NamedTuple, Optional, Tuple
 from llama_index.core import SimpleDirectoryReader
-from openai import OpenAI
-from llama_index.core import QueryBundle
+from llama_index.core.node_parser import SentenceSplitter
+from openai import OpenAI, AsyncOpenAI, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
+from app.config import (
+    OPENAI_BASE_URL, OPENAI_MAX_CONNECTIONS, OPENAI_TIMEOUT, CHATBOT_CACHE_THRESHOLD, CHATBOT_CACHE_SIZE, CHATBOT_CACHE_TTL,
+    CHATBOT_VECTOR_STORE_PATH, CHATBOT_CHUNK_SIZE, CHATBOT_CHUNK_OVERLAP, CHATBOT_EMBED_BATCH, CHATBOT_TOP_K, CHATBOT_RETRIEVER,
+    CHATBOT_SESSIONS_MAX, CHATBOT_SESSION_TTL, CHATBOT_HISTORY_TOKENS, CHATBOT_SUMMARY_TOKENS,
+    CHATBOT_CONTEXT_TOKENS, CHATBOT_CONTEXT_DEDUP, CHATBOT_COALESCE_TIMEOUT,
+)
+from app.answer_cache import SemanticAnswerCache
+from app.vector_store import VectorStore
+from app.timing import fase
+from app.chat_sessions import SessionStore
+from app.context_packing import ContextPacker
+from app.single_flight import SingleFlight
 
 load_dotenv()
 
+_SPAZI = re.compile(r"\s+")
+
+def chiave_domanda(question: str) -> str:
+    """La domanda senza differenze di maiuscole, spazi e punteggiatura finale."""
+    return _SPAZI.sub(" ", unicodedata.normalize("NFKC", question).casefold()).strip().rstrip("?!. ")
+
+class Preparazione(NamedTuple):
+    """Parte comune a tutte le risposte: la risposta in cache, oppure i messaggi per il modello."""
+    embedding: list
+    risposta: Optional[str]
+    messaggi: Optional[list]
+    # version of the documents the messages were built from: the answer is cached only if still current
+    versione: Optional[str]
+
 class AIQueryEngine:
     def __init__(self, openai_api_key: str, embedding_model: str = "text-embedding-ada-002", chat_model: str = "gpt-3.5-turbo"):
         print("Starting AI Query Engine")
 
-        self.client = OpenAI(api_key=openai_api_key)
+        # OPENAI_BASE_URL points both clients at a compatible server, e.g. benchmarks/openai_stub.py
+        self.client = OpenAI(api_key=openai_api_key, base_url=OPENAI_BASE_URL)
+        # one keep-alive connection pool shared by all async requests
+        self.async_client = AsyncOpenAI(
+            api_key=openai_api_key,
+            base_url=OPENAI_BASE_URL,
+            timeout=OPENAI_TIMEOUT,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS)
+            ),
+        )
         self.embedding_model = embedding_model
         self.chat_model = chat_model
 
         self.docs_path = os.environ.get("CHATBOT_DOCS_PATH", "./documents")
-        self.embedding_cache_path = "embeddings_cache.pkl"
+        self.vector_store_path = CHATBOT_VECTOR_STORE_PATH
+        self._sync_lock = threading.Lock()
+        self._firme = {}
+
+        self.answer_cache = SemanticAnswerCache(
+            threshold=CHATBOT_CACHE_THRESHOLD,
+            maxsize=CHATBOT_CACHE_SIZE,
+            ttl=CHATBOT_CACHE_TTL or None,
+        )
+        self.load_or_create_index()
+
+        self.contesto = ContextPacker(
+            budget=CHATBOT_CONTEXT_TOKENS,
+            max_frammenti=CHATBOT_TOP_K,
+            soglia_duplicati=CHATBOT_CONTEXT_DEDUP,
+        )
 
-        self.index = self.load_or_create_index()
+        # identical questions and embedding inputs in flight at the same time share one OpenAI call
+        self.voli = SingleFlight(timeout=CHATBOT_COALESCE_TIMEOUT)
 
-        self.memory = ChatMemoryBuffer.from_defaults(
-            llm=None,
-            token_limit=15000,
+        # conversations by session id, sent back to the model within a token budget
+        self.sessioni = SessionStore(
+            maxsize=CHATBOT_SESSIONS_MAX,
+            ttl=CHATBOT_SESSION_TTL,
+            token_storia=CHATBOT_HISTORY_TOKENS,
+            token_riassunto=CHATBOT_SUMMARY_TOKENS,
         )
 
         self.system_prompt = """
@@ -56,11 +113,6 @@ class AIQueryEngine:
         Si inizia!
         """
 
-        self.chat_engine = self.index.as_chat_engine(
-            chat_mode=ChatMode.CONTEXT,
-            memory=self.memory,
-        )
-
     def get_embedding(self, text: str) -> list:
         """Genera embedding usando OpenAI"""
         response = self.client.embeddings.create(
@@ -72,67 +124,252 @@ class AIQueryEngine:
     def hash_text(self, text: str) -> str:
         return hashlib.sha256(text.encode()).hexdigest()
 
-    def load_or_create_index(self):
-        """Carica i documenti e crea/rigenera l'indice vettoriale"""
-        documents = SimpleDirectoryReader(self.docs_path).load_data()
-        doc_texts = {doc.metadata['file_name']: doc.text for doc in documents}
+    def embed_batch(self, texts: list) -> list:
+        """Embedding di più testi con una sola richiesta, nell'ordine dei testi."""
+        response = self.client.embeddings.create(input=texts, model=self.embedding_model)
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
 
-        if os.path.exists(self.embedding_cache_path) and os.path.getsize(self.embedding_cache_path) > 0:
-            with open(self.embedding_cache_path, "rb") as f:
-                cached_data = pickle.load(f)
-            print("✅ Embedding cache loaded successfully.")
+    def load_or_create_index(self) -> VectorStore:
+        """Apre l'archivio vettoriale dei documenti e lo allinea ai file in CHATBOT_DOCS_PATH."""
+        self.index = VectorStore(self.vector_store_path)
+        if self.index.carica():
+            print(f"✅ Vector store loaded: {self.index.righe} chunks.")
         else:
-            cached_data = {"hashes": {}, "embeddings": {}}
-            print("⚠️ No cache found; generating new embeddings.")
-
-        cached_text_hashes = cached_data.get("hashes", {})
-        cached_embeddings = cached_data.get("embeddings", {})
-
-        new_embeddings = {}
-        documents_updated = 0
-
-        for file_name, text in doc_texts.items():
-            text_hash = self.hash_text(text)
-            if file_name in cached_text_hashes and cached_text_hashes[file_name] == text_hash:
-                new_embeddings[file_name] = {
-                    "embedding": cached_embeddings[file_name],
-                    "hash": cached_text_hashes[file_name]
-                }
-                print(f"🔄 {file_name}: Embedding loaded from cache.")
-            else:
-                embedding = self.get_embedding(text)
-                new_embeddings[file_name] = {
-                    "embedding": embedding,
-                    "hash": text_hash
-                }
-                documents_updated += 1
-                print(f"🆕 {file_name}: Embedding regenerated.")
-
-        with open(self.embedding_cache_path, "wb") as f:
-            pickle.dump({"hashes": {k: v["hash"] for k, v in new_embeddings.items()},
-                         "embeddings": {k: v["embedding"] for k, v in new_embeddings.items()}}, f)
-
-        print(f"📁 Total updated documents: {documents_updated}")
-
-        docs = [
-            Document(text=doc_texts[file_name], embedding=new_embeddings[file_name]["embedding"])
-            for file_name in new_embeddings
+            print("⚠️ No vector store found; generating new embeddings.")
+        self.sincronizza_documenti()
+        return self.index
+
+    def firme_documenti(self) -> dict:
+        """file -> dimensione e data di modifica: basta a capire se qualcosa è cambiato, senza leggere i file."""
+        firme = {}
+        for path in SimpleDirectoryReader(self.docs_path).input_files:
+            stat = os.stat(path)
+            firme[path.name] = f"{stat.st_size}:{stat.st_mtime_ns}"
+        return firme
+
+    def documenti_cambiati(self) -> bool:
+        return self.firme_documenti() != self._firme
+
+    def sincronizza_documenti(self) -> dict:
+        """
+        Allinea l'archivio vettoriale ai documenti: solo i file aggiunti o modificati (per hash
+        del contenuto) vengono riletti e divisi in frammenti, solo i frammenti nuovi vengono
+        inviati a OpenAI a gruppi di CHATBOT_EMBED_BATCH, e i frammenti dei file rimossi
+        vengono scartati. Il nuovo archivio sostituisce il precedente con un solo assegnamento:
+        le domande in corso finiscono sul vecchio, le successive usano il nuovo.
+        """
+        with self._sync_lock:
+            store = VectorStore(self.vector_store_path)
+            # serialises workers sharing the directory; the reload picks up what another worker wrote
+            with store.blocco():
+                store.carica()
+                indicizzati = store.documenti() if store.modello == self.embedding_model else {}
+                firme = self.firme_documenti()
+                documenti = {}
+                for name, firma in firme.items():
+                    precedente = indicizzati.get(name)
+                    if precedente and precedente[0] == firma:
+                        documenti[name] = precedente
+                    else:
+                        with open(os.path.join(self.docs_path, name), "rb") as f:
+                            documenti[name] = (firma, hashlib.sha256(f.read()).hexdigest())
+                aggiunti = [name for name in documenti if name not in indicizzati]
+                modificati = [name for name in documenti if name in indicizzati and indicizzati[name][1] != documenti[name][1]]
+                rimossi = [name for name in indicizzati if name not in documenti]
+                nuovi_vettori = {}
+
+                # stores written before the keyword index existed are rewritten once, with the same vectors
+                senza_bm25 = store.righe > 0 and store.bm25 is None
+                if not aggiunti and not modificati and not rimossi and not senza_bm25:
+                    print(f"📁 Documents unchanged: {len(documenti)}")
+                else:
+                    da_leggere = set(aggiunti + modificati)
+                    frammenti = store.frammenti(name for name in documenti if name not in da_leggere)
+                    splitter = SentenceSplitter(chunk_size=CHATBOT_CHUNK_SIZE, chunk_overlap=CHATBOT_CHUNK_OVERLAP)
+                    posizioni = {}
+                    paths = [os.path.join(self.docs_path, name) for name in sorted(da_leggere)]
+                    letti = SimpleDirectoryReader(input_files=paths).load_data() if paths else []
+                    for doc in letti:
+                        name = doc.metadata["file_name"]
+                        for testo in splitter.split_text(doc.text):
+                            posizioni[name] = posizioni.get(name, -1) + 1
+                            frammenti.append((name, posizioni[name], self.hash_text(testo), testo))
+
+                    noti = store.righe_per_hash() if store.modello == self.embedding_model else {}
+                    da_calcolare = list(dict.fromkeys(h for _, _, h, _ in frammenti if h not in noti))
+                    testi = {h: testo for _, _, h, testo in frammenti}
+                    for i in range(0, len(da_calcolare), CHATBOT_EMBED_BATCH):
+                        gruppo = da_calcolare[i:i + CHATBOT_EMBED_BATCH]
+                        nuovi_vettori.update(zip(gruppo, self.embed_batch([testi[h] for h in gruppo])))
+
+                    versione = self.hash_text(self.embedding_model + "".join(sorted(f"{k}:{v[1]}" for k, v in documenti.items())))
+                    store.scrivi(self.embedding_model, versione, documenti, frammenti, nuovi_vettori)
+                    print(f"🆕 Documents added: {len(aggiunti)}, changed: {len(modificati)}, removed: {len(rimossi)}, new embeddings: {len(nuovi_vettori)}")
+                    print(f"📁 Total chunks: {store.righe}")
+
+            self.index = store
+            self._firme = firme
+            # cached answers are only valid for the documents they were generated from
+            self.answer_cache.allinea(store.versione)
+            return {
+                "aggiunti": aggiunti,
+                "modificati": modificati,
+                "rimossi": rimossi,
+                "nuovi_embedding": len(nuovi_vettori),
+                "frammenti": store.righe,
+                "versione": store.versione,
+            }
+
+    def retrieve_context(self, question: str, query_embedding: list) -> str:
+        """Testo dei frammenti più vicini alla domanda, senza ripetizioni ed entro il budget di token."""
+        # twice the chunks that fit the prompt: the spares replace the ones dropped as duplicates
+        risultati = self.index.cerca(query_embedding, 2 * CHATBOT_TOP_K, testo=question, metodo=CHATBOT_RETRIEVER)
+        return self.contesto.impacchetta(risultati)
+
+    def build_messages(self, question: str, context: str, storia: Optional[list] = None) -> list:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            *(storia or []),
+            {"role": "user", "content": f"Contesto: {context}\n\nDomanda: {question}"}
         ]
-        print(f"📁 Total documents loaded: {len(docs)}")
-        return VectorStoreIndex.from_documents(docs, show_progress=True)
 
-    def query(self, question: str) -> str:
+    def storia(self, session_id: Optional[str]) -> Tuple[list, str]:
+        """
+        Messaggi precedenti della sessione e testo da usare per la ricerca: in una conversazione
+        avviata è la domanda precedente più quella attuale, così "e quanto costa?" trova ancora
+        i documenti del prodotto di cui si parlava.
+        """
+        if not session_id:
+            return [], None
+        return self.sessioni.storia(session_id)
+
+    def _prepara(self, question: str, ricerca: str, storia: list, query_embedding: list) -> Preparazione:
+        """Cerca la risposta in cache, altrimenti recupera il contesto e compone i messaggi."""
+        # answers to follow-up questions depend on the conversation: they are neither read from nor written to the cache
+        if not storia:
+            with fase("cache"):
+                cached = self.answer_cache.get(query_embedding)
+            if cached is not None:
+                return Preparazione(query_embedding, cached, None, None)
+        versione = self.index.versione
+        with fase("retrieval"):
+            context = self.retrieve_context(ricerca, query_embedding)
+        with fase("prompt"):
+            messages = self.build_messages(question, context, storia)
+        return Preparazione(query_embedding, None, messages, versione)
+
+    async def _aprepara(self, question: str, ricerca: str, storia: list) -> Preparazione:
+        """Come _prepara, con l'embedding dal client asincrono; la ricerca gira in un thread per non bloccare l'event loop."""
+        with fase("embedding"):
+            query_embedding = await self.aget_embedding(ricerca)
+        return await asyncio.to_thread(self._prepara, question, ricerca, storia, query_embedding)
+
+    def _memorizza(self, preparazione: Preparazione, question: str, storia: list, answer: str):
+        # documents may be reloaded while the answer is generated: the cache drops it if they were
+        if not storia:
+            self.answer_cache.set(preparazione.embedding, question, answer, preparazione.versione)
+
+    def query(self, question: str, session_id: Optional[str] = None) -> str:
         """Esegue una query al chatbot e restituisce la risposta."""
-        query_embedding = self.get_embedding(question)
-        query_bundle = QueryBundle(query_str=question, embedding=query_embedding)
-        results = self.index.as_retriever().retrieve(query_bundle)
-        context = " ".join([node.text for node in results])
-        response = self.client.chat.completions.create(
-            model=self.chat_model,
-            messages=[
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": f"Contesto: {context}\n\nDomanda: {question}"}
-            ]
+        storia, ultima_domanda = self.storia(session_id)
+        ricerca = f"{ultima_domanda}\n{question}" if ultima_domanda else question
+        with fase("embedding"):
+            query_embedding = self.get_embedding(ricerca)
+        preparazione = self._prepara(question, ricerca, storia, query_embedding)
+        answer = preparazione.risposta
+        if answer is None:
+            with fase("completion"):
+                response = self.client.chat.completions.create(
+                    model=self.chat_model,
+                    messages=preparazione.messaggi
+                )
+            answer = response.choices[0].message.content
+            self._memorizza(preparazione, question, storia, answer)
+        if session_id:
+            self.sessioni.aggiungi(session_id, question, answer)
+        return answer
+
+    async def aget_embedding(self, text: str) -> list:
+        """Come get_embedding, con il client asincrono."""
+        return await self.voli.esegui(("embedding", text), lambda: self._aget_embedding(text))
+
+    async def _aget_embedding(self, text: str) -> list:
+        response = await self.async_client.embeddings.create(
+            input=text,
+            model=self.embedding_model
         )
-        return response.choices[0].message.content
+        return response.data[0].embedding
+
+    async def aquery(self, question: str, session_id: Optional[str] = None) -> str:
+        """Come query, senza bloccare l'event loop durante le chiamate a OpenAI."""
+        storia, ultima_domanda = self.storia(session_id)
+        if storia:
+            answer = await self._arispondi(question, f"{ultima_domanda}\n{question}", storia)
+        else:
+            # answers to a question without history can be shared, like the ones in the cache
+            answer = await self.voli.esegui(("risposta", chiave_domanda(question)), lambda: self._arispondi(question, question, storia))
+        if session_id:
+            self.sessioni.aggiungi(session_id, question, answer)
+        return answer
+
+    async def _arispondi(self, question: str, ricerca: str, storia: list) -> str:
+        preparazione = await self._aprepara(question, ricerca, storia)
+        if preparazione.risposta is not None:
+            return preparazione.risposta
+        with fase("completion"):
+            response = await self.async_client.chat.completions.create(
+                model=self.chat_model,
+                messages=preparazione.messaggi
+            )
+        answer = response.choices[0].message.content
+        self._memorizza(preparazione, question, storia, answer)
+        return answer
+
+    async def astream(self, question: str, session_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Restituisce la risposta un frammento alla volta, man mano che il modello la genera.
+        Una risposta presente in cache arriva in un solo frammento; chi fa la stessa domanda
+        mentre la risposta è in corso la riceve dall'inizio, senza una nuova chiamata.
+        """
+        storia, ultima_domanda = self.storia(session_id)
+        if storia:
+            frammenti = self._astream(question, f"{ultima_domanda}\n{question}", storia)
+        else:
+            frammenti = self.voli.trasmetti(("risposta", chiave_domanda(question)), lambda: self._astream(question, question, storia))
+        parti = []
+        async for parte in frammenti:
+            parti.append(parte)
+            yield parte
+        # only complete answers become part of the conversation
+        if session_id:
+            self.sessioni.aggiungi(session_id, question, "".join(parti))
 
+    async def _astream(self, question: str, ricerca: str, storia: list) -> AsyncIterator[str]:
+        preparazione = await self._aprepara(question, ricerca, storia)
+        if preparazione.risposta is not None:
+            yield preparazione.risposta
+            return
+        # until the first byte of the answer
+        with fase("completion"):
+            stream = await self.async_client.chat.completions.create(
+                model=self.chat_model,
+                messages=preparazione.messaggi,
+                stream=True
+            )
+        parti = []
+        frammenti = stream.__aiter__()
+        try:
+            while True:
+                # only the wait for the model: the time the reader spends on a fragment is not counted
+                with fase("streaming"):
+                    chunk = await anext(frammenti, None)
+                if chunk is None:
+                    break
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parti.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            # closes the HTTP response also when the client goes away mid-answer
+            await stream.close()
+        # only complete answers are cached
+        self._memorizza(preparazione, question, storia, "".join(parti))
@@ -10,3 +10,105 @@ DB_CONFIG = {
     'host': os.getenv('DB_HOST'),
     'port': os.getenv('DB_PORT')
 }
+
+# optional read replica for the read-only listings (same credentials, port defaults to DB_PORT)
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST')
+DB_REPLICA_PORT = os.getenv('DB_REPLICA_PORT', DB_CONFIG['port'])
+
+# connection pool per engine and process: persistent connections, extra ones under load, seconds to
+# wait for one, seconds before a connection is replaced, liveness check on checkout
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+# asyncpg prepared statements cached per connection (0 disables, e.g. behind pgbouncer in transaction
+# mode) and server-side statement_timeout in milliseconds (0 = none)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 500))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))
+
+# SQL logging: every statement (DB_ECHO, for debugging only) or just the ones slower than DB_SLOW_QUERY_MS (0 disables)
+DB_ECHO = os.getenv('DB_ECHO', 'false').lower() in ('1', 'true', 'yes')
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 200))
+
+# cached dashboard aggregations (seconds / number of filter combinations)
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 300))
+DASHBOARD_CACHE_SIZE = int(os.getenv('DASHBOARD_CACHE_SIZE', 256))
+
+# policy/claims rollup materialized view refresh period (seconds, 0 disables the scheduler)
+ROLLUP_REFRESH_INTERVAL = int(os.getenv('ROLLUP_REFRESH_INTERVAL', 300))
+
+# assembled customer cards kept in memory by GET /clienti/{codice_cliente}/scheda
+SCHEDA_CACHE_SIZE = int(os.getenv('SCHEDA_CACHE_SIZE', 1024))
+
+# speech recognition: reusable KaldiRecognizer instances per process and wait for a free one (seconds)
+VOSK_POOL_SIZE = int(os.getenv('VOSK_POOL_SIZE', 4))
+VOSK_POOL_TIMEOUT = float(os.getenv('VOSK_POOL_TIMEOUT', 30))
+VOSK_WARMUP = os.getenv('VOSK_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+
+# voice notes: worker processes for ffmpeg/Vosk/spaCy, max unfinished jobs, seconds a finished job is kept
+VOICE_WORKERS = int(os.getenv('VOICE_WORKERS', max(1, min(4, os.cpu_count() or 1))))
+VOICE_QUEUE_SIZE = int(os.getenv('VOICE_QUEUE_SIZE', 16))
+VOICE_JOB_TTL = int(os.getenv('VOICE_JOB_TTL', 3600))
+# seconds an ffmpeg conversion may run (recognition of the decoded audio included) before it is killed
+VOICE_FFMPEG_TIMEOUT = float(os.getenv('VOICE_FFMPEG_TIMEOUT', 600))
+
+# live transcription over WebSocket: seconds without audio before the stream is closed, max length of a stream
+VOICE_STREAM_IDLE_TIMEOUT = float(os.getenv('VOICE_STREAM_IDLE_TIMEOUT', 30))
+VOICE_STREAM_MAX_SECONDS = int(os.getenv('VOICE_STREAM_MAX_SECONDS', 600))
+
+# batch voice ingestion: max audio files (zip entries included) and total size in MB per request
+VOICE_BATCH_MAX_FILES = int(os.getenv('VOICE_BATCH_MAX_FILES', 50))
+VOICE_BATCH_MAX_MB = int(os.getenv('VOICE_BATCH_MAX_MB', 200))
+
+# in-memory customer name index: reload period in seconds (0 = load once), min similarity and lead
+# over the runner-up for a fuzzy voice match
+NAME_INDEX_TTL = int(os.getenv('NAME_INDEX_TTL', 600))
+NAME_MATCH_THRESHOLD = float(os.getenv('NAME_MATCH_THRESHOLD', 0.6))
+NAME_MATCH_MARGIN = float(os.getenv('NAME_MATCH_MARGIN', 0.1))
+
+# chatbot: concurrent OpenAI completions, requests allowed to wait for a slot and how long (seconds)
+CHATBOT_MAX_CONCURRENT = int(os.getenv('CHATBOT_MAX_CONCURRENT', 8))
+CHATBOT_MAX_QUEUE = int(os.getenv('CHATBOT_MAX_QUEUE', 32))
+CHATBOT_QUEUE_TIMEOUT = float(os.getenv('CHATBOT_QUEUE_TIMEOUT', 30))
+# OpenAI-compatible endpoint (unset = api.openai.com), e.g. http://127.0.0.1:8090/v1 for benchmarks/openai_stub.py
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+# shared HTTP connection pool and request timeout (seconds) of the async OpenAI client
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', 20))
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 60))
+
+# chatbot answer cache: min cosine similarity between questions, max answers kept, seconds an answer stays valid (0 = no expiry)
+CHATBOT_CACHE_THRESHOLD = float(os.getenv('CHATBOT_CACHE_THRESHOLD', 0.95))
+CHATBOT_CACHE_SIZE = int(os.getenv('CHATBOT_CACHE_SIZE', 1000))
+CHATBOT_CACHE_TTL = int(os.getenv('CHATBOT_CACHE_TTL', 86400))
+
+# chatbot vector store: directory of the chunk embeddings, chunk size and overlap in tokens,
+# chunks per embedding request and chunks passed to the model as context
+CHATBOT_VECTOR_STORE_PATH = os.getenv('CHATBOT_VECTOR_STORE_PATH', './vector_store')
+CHATBOT_CHUNK_SIZE = int(os.getenv('CHATBOT_CHUNK_SIZE', 512))
+CHATBOT_CHUNK_OVERLAP = int(os.getenv('CHATBOT_CHUNK_OVERLAP', 64))
+CHATBOT_EMBED_BATCH = int(os.getenv('CHATBOT_EMBED_BATCH', 100))
+CHATBOT_TOP_K = int(os.getenv('CHATBOT_TOP_K', 4))
+# chatbot retrieval backend: dense (embeddings), bm25 (keywords) or hybrid (both, rank-fused)
+CHATBOT_RETRIEVER = os.getenv('CHATBOT_RETRIEVER', 'hybrid')
+# seconds between checks of the chatbot documents for added, changed or removed files (0 disables the watcher)
+CHATBOT_DOCS_POLL_INTERVAL = float(os.getenv('CHATBOT_DOCS_POLL_INTERVAL', 30))
+
+# load the chatbot and the voice models in the background right after startup (otherwise on first use)
+AI_WARMUP = os.getenv('AI_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+
+# chatbot conversations: sessions kept per process, idle seconds before one is forgotten, tokens of
+# recent turns sent verbatim and tokens of the summary of older turns
+CHATBOT_SESSIONS_MAX = int(os.getenv('CHATBOT_SESSIONS_MAX', 1000))
+CHATBOT_SESSION_TTL = int(os.getenv('CHATBOT_SESSION_TTL', 1800))
+CHATBOT_HISTORY_TOKENS = int(os.getenv('CHATBOT_HISTORY_TOKENS', 1500))
+CHATBOT_SUMMARY_TOKENS = int(os.getenv('CHATBOT_SUMMARY_TOKENS', 300))
+
+# chatbot prompt context: max tokens of retrieved text and shared-shingle fraction above which
+# two chunks count as duplicates
+CHATBOT_CONTEXT_TOKENS = int(os.getenv('CHATBOT_CONTEXT_TOKENS', 1500))
+CHATBOT_CONTEXT_DEDUP = float(os.getenv('CHATBOT_CONTEXT_DEDUP', 0.8))
+
+# chatbot: max seconds of an OpenAI call shared by identical concurrent questions
+CHATBOT_COALESCE_TIMEOUT = float(os.getenv('CHATBOT_COALESCE_TIMEOUT', 120))
@@ -0,0 +1,107 @@
+import re
+import threading
+import unicodedata
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.tokens import conta_token, tronca
+
+_PAROLA = re.compile(r"\w+")
+# words per shingle: long enough that two chunks only share many of them when they repeat the same text
+LUNGHEZZA_SHINGLE = 3
+SEPARATORE = "\n\n"
+
+_statistiche: ContextVar[Optional[dict]] = ContextVar("contesto", default=None)
+
+def misura_contesto() -> dict:
+    """Inizia a raccogliere le statistiche del contesto della richiesta corrente."""
+    statistiche = {}
+    _statistiche.set(statistiche)
+    return statistiche
+
+def shingle(testo: str) -> frozenset:
+    testo = unicodedata.normalize("NFKD", testo)
+    parole = _PAROLA.findall("".join(c for c in testo if not unicodedata.combining(c)).lower())
+    if len(parole) < LUNGHEZZA_SHINGLE:
+        return frozenset([" ".join(parole)])
+    return frozenset(" ".join(parole[i:i + LUNGHEZZA_SHINGLE]) for i in range(len(parole) - LUNGHEZZA_SHINGLE + 1))
+
+class ContextPacker:
+    """
+    Compone il contesto del prompt dai frammenti trovati: li ordina per punteggio, scarta quelli
+    che ripetono un frammento già scelto (frazione di shingle in comune >= `soglia_duplicati`,
+    rispetto al più corto dei due), e aggiunge i restanti finché stanno in `budget` token, al massimo
+    `max_frammenti`. Un primo frammento più lungo del budget viene troncato, così il contesto
+    non resta mai vuoto.
+    """
+
+    def __init__(self, budget: int, max_frammenti: int, soglia_duplicati: float):
+        self.budget = budget
+        self.max_frammenti = max_frammenti
+        self.soglia_duplicati = soglia_duplicati
+        self._lock = threading.Lock()
+        self.richieste = 0
+        self.token = 0
+        self.token_risparmiati = 0
+        self.duplicati = 0
+
+    def _duplicato(self, candidato: frozenset, scelti: List[frozenset]) -> bool:
+        if not candidato:
+            return True
+        # overlap over the shorter of the two, so a chunk that contains a chosen one also counts
+        return any(len(candidato & s) >= self.soglia_duplicati * min(len(candidato), len(s)) for s in scelti)
+
+    def impacchetta(self, risultati: Sequence[Tuple[float, str, str]]) -> str:
+        """Testo del contesto dai risultati della ricerca, (punteggio, file, testo)."""
+        ordinati = sorted(risultati, key=lambda r: r[0], reverse=True)
+        token_frammenti = [conta_token(testo) for _, _, testo in ordinati]
+        # what joining the top results as they are would have cost
+        token_originali = sum(token_frammenti[:self.max_frammenti])
+
+        parti, shingle_scelti = [], []
+        usati = duplicati = 0
+        token_separatore = conta_token(SEPARATORE)
+        for (_, _, testo), n_token in zip(ordinati, token_frammenti):
+            if len(parti) >= self.max_frammenti:
+                break
+            candidato = shingle(testo)
+            if self._duplicato(candidato, shingle_scelti):
+                duplicati += 1
+                continue
+            costo = n_token + (token_separatore if parti else 0)
+            if usati + costo > self.budget:
+                if parti:
+                    # a shorter, lower-ranked chunk may still fit
+                    continue
+                testo = tronca(testo, self.budget)
+                costo = conta_token(testo)
+            parti.append(testo)
+            shingle_scelti.append(candidato)
+            usati += costo
+
+        statistiche: Dict[str, int] = {
+            "frammenti": len(parti),
+            "duplicati": duplicati,
+            "token": usati,
+            "token_risparmiati": max(token_originali - usati, 0),
+        }
+        richiesta = _statistiche.get()
+        if richiesta is not None:
+            richiesta.update(statistiche)
+        with self._lock:
+            self.richieste += 1
+            self.token += usati
+            self.token_risparmiati += statistiche["token_risparmiati"]
+            self.duplicati += duplicati
+        return SEPARATORE.join(parti)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "max_frammenti": self.max_frammenti,
+                "richieste": self.richieste,
+                "token_medi": self.token / self.richieste if self.richieste else 0.0,
+                "token_risparmiati": self.token_risparmiati,
+                "token_risparmiati_medi": self.token_risparmiati / self.richieste if self.richieste else 0.0,
+                "duplicati": self.duplicati,
+            }
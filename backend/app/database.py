@@ -1,12 +1,118 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from app.config import DB_CONFIG
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.config import (
+    DB_CONFIG, DB_ECHO, DB_SLOW_QUERY_MS, DB_REPLICA_HOST, DB_REPLICA_PORT,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    DB_STATEMENT_CACHE_SIZE, DB_STATEMENT_TIMEOUT_MS,
+)
+from app.metrics import query_db, attesa_pool_db, Indicatore
+from app.timing import aggiungi_fasi
 
-DATABASE_URL = f"postgresql+asyncpg://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}"
+def database_url(host: str, port: str) -> str:
+    # prepared statements are cached by SQLAlchemy's asyncpg adapter, sized from the URL
+    return (
+        f"postgresql+asyncpg://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{host}:{port}/{DB_CONFIG['dbname']}"
+        f"?prepared_statement_cache_size={DB_STATEMENT_CACHE_SIZE}"
+    )
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+DATABASE_URL = database_url(DB_CONFIG['host'], DB_CONFIG['port'])
+
+class PoolMisurato(AsyncAdaptedQueuePool):
+    """Pool di connessioni che registra quanto si attende per ottenerne una e quanti attendono."""
+
+    nome = "primary"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_attesa = 0
+
+    def recreate(self):
+        # called on dispose(), e.g. after the database restarted: the new pool keeps the name
+        pool = super().recreate()
+        pool.nome = self.nome
+        return pool
+
+    def connect(self):
+        start = time.perf_counter()
+        self.in_attesa += 1
+        try:
+            return super().connect()
+        finally:
+            self.in_attesa -= 1
+            attesa_pool_db.osserva(time.perf_counter() - start, pool=self.nome)
+
+def _inizio_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inizio_query", []).append(time.perf_counter())
+
+def _fine_query(conn, cursor, statement, parameters, context, executemany):
+    durata = time.perf_counter() - conn.info["inizio_query"].pop()
+    query_db.osserva(durata, operation=statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "")
+    aggiungi_fasi({"db": durata})
+    if DB_SLOW_QUERY_MS > 0 and durata * 1000 >= DB_SLOW_QUERY_MS:
+        # parameters are left out: they can hold customer data
+        print(f"Query lenta ({durata * 1000:.0f} ms): {' '.join(statement.split())[:1000]}")
+
+def _errore_query(context):
+    # the statement failed: after_cursor_execute will not run for it
+    if context.connection is not None and context.connection.info.get("inizio_query"):
+        context.connection.info["inizio_query"].pop()
+
+def crea_engine(url: str, nome: str) -> AsyncEngine:
+    """Engine con il profilo di pool e connessione di app.config e le metriche delle query."""
+    server_settings = {"application_name": f"vita-sicura-{nome}"}
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        server_settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
+    engine = create_async_engine(
+        url,
+        echo=DB_ECHO,
+        poolclass=PoolMisurato,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        # asyncpg's own cache too, so that 0 really disables server-side prepared statements
+        connect_args={"statement_cache_size": DB_STATEMENT_CACHE_SIZE, "server_settings": server_settings},
+    )
+    engine.pool.nome = nome
+    event.listen(engine.sync_engine, "before_cursor_execute", _inizio_query)
+    event.listen(engine.sync_engine, "after_cursor_execute", _fine_query)
+    event.listen(engine.sync_engine, "handle_error", _errore_query)
+    return engine
+
+engine = crea_engine(DATABASE_URL, "primary")
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+# read-only listings go to the replica when there is one; anything that must see a write that
+# just happened (customer card, notes) stays on the primary
+engine_lettura = crea_engine(database_url(DB_REPLICA_HOST, DB_REPLICA_PORT), "replica") if DB_REPLICA_HOST else engine
+async_session_lettura = sessionmaker(engine_lettura, expire_on_commit=False, class_=AsyncSession)
+
+def _stato_pool() -> dict:
+    valori = {}
+    for e in {engine, engine_lettura}:
+        pool = e.pool
+        valori[(pool.nome, "in_uso")] = pool.checkedout()
+        valori[(pool.nome, "libere")] = pool.checkedin()
+        valori[(pool.nome, "in_attesa")] = pool.in_attesa
+        valori[(pool.nome, "massimo")] = pool.size() + DB_MAX_OVERFLOW
+    return valori
+
+Indicatore(
+    "vita_db_pool_connections",
+    "Connessioni del pool del database: in uso, libere, richieste in attesa e massimo (pool_size + max_overflow).",
+    ("pool", "state"),
+    _stato_pool,
+)
+
 async def get_db():
     async with async_session() as session:
         yield session
+
+async def get_db_lettura():
+    """Sessione per le sole letture, sulla replica se configurata (DB_REPLICA_HOST)."""
+    async with async_session_lettura() as session:
+        yield session
@@ -0,0 +1,2 @@
+class CodaPienaError(Exception):
+    """Il numero massimo di elaborazioni in corso o in attesa è stato raggiunto."""
@@ -0,0 +1,172 @@
+import base64
+import json
+from typing import List, Optional, Tuple
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import or_, and_, tuple_
+from app.models import Cliente
+
+# columns the client tables can be sorted on; codice_cliente is always the tie-break
+SORTABLE_COLUMNS = {
+    "codice_cliente": Cliente.codice_cliente,
+    "nome": Cliente.nome,
+    "cognome": Cliente.cognome,
+    "eta": Cliente.eta,
+    "luogo_di_residenza": Cliente.luogo_di_residenza,
+    "professione": Cliente.professione,
+    "reddito": Cliente.reddito,
+}
+
+class ClienteFilters(BaseModel):
+    q: Optional[str] = None
+    eta_min: Optional[int] = None
+    eta_max: Optional[int] = None
+    professione: List[str] = []
+    reddito: List[str] = []
+    prop_vita: List[str] = []
+    prop_danni: List[str] = []
+    agenzia: List[str] = []
+    zona: List[str] = []
+
+    def cache_key(self) -> str:
+        """Chiave normalizzata: l'ordine dei valori nei filtri non conta."""
+        data = {k: sorted(v) if isinstance(v, list) else v for k, v in self.dict().items()}
+        if data["q"]:
+            data["q"] = data["q"].strip().lower()
+        return json.dumps(data, sort_keys=True)
+
+def get_cliente_filters(
+    q: Optional[str] = Query(None, description="Ricerca per nome, cognome o codice cliente"),
+    eta_min: Optional[int] = Query(None, ge=0, le=120),
+    eta_max: Optional[int] = Query(None, ge=0, le=120),
+    professione: List[str] = Query([]),
+    reddito: List[str] = Query([], description="Fasce di reddito nel formato '20000-40000' o '120000-+'"),
+    prop_vita: List[str] = Query([], description="Intervalli di propensione vita nel formato '0.21 - 0.40'"),
+    prop_danni: List[str] = Query([], description="Intervalli di propensione danni nel formato '0.21 - 0.40'"),
+    agenzia: List[str] = Query([]),
+    zona: List[str] = Query([]),
+) -> ClienteFilters:
+    return ClienteFilters(
+        q=q,
+        eta_min=eta_min,
+        eta_max=eta_max,
+        professione=professione,
+        reddito=reddito,
+        prop_vita=prop_vita,
+        prop_danni=prop_danni,
+        agenzia=agenzia,
+        zona=zona,
+    )
+
+def parse_range(label: str) -> Tuple[float, Optional[float]]:
+    """
+    Converte un'etichetta di fascia ('20000-40000', '120000-+', '0.21 - 0.40')
+    nella coppia (minimo incluso, massimo escluso). Il massimo è None se la fascia è aperta.
+    """
+    parts = [p.strip() for p in label.split("-")]
+    if len(parts) != 2:
+        raise HTTPException(status_code=400, detail=f"Intervallo non valido: '{label}'")
+    try:
+        low = float(parts[0])
+        high = None if parts[1] == "+" else float(parts[1])
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Intervallo non valido: '{label}'")
+    return low, high
+
+def _ranges_clause(column, labels: List[str]):
+    clauses = []
+    for label in labels:
+        low, high = parse_range(label)
+        if high is None:
+            clauses.append(column >= low)
+        else:
+            clauses.append(and_(column >= low, column < high))
+    return or_(*clauses)
+
+def apply_cliente_filters(stmt, filters: ClienteFilters):
+    """Aggiunge allo statement le condizioni WHERE corrispondenti ai filtri."""
+    if filters.q:
+        term = filters.q.strip()
+        pattern = f"%{term}%"
+        conditions = [Cliente.nome.ilike(pattern), Cliente.cognome.ilike(pattern)]
+        if term.isdigit():
+            conditions.append(Cliente.codice_cliente == int(term))
+        stmt = stmt.where(or_(*conditions))
+    if filters.eta_min is not None:
+        stmt = stmt.where(Cliente.eta >= filters.eta_min)
+    if filters.eta_max is not None:
+        stmt = stmt.where(Cliente.eta <= filters.eta_max)
+    if filters.professione:
+        stmt = stmt.where(Cliente.professione.in_(filters.professione))
+    if filters.reddito:
+        stmt = stmt.where(_ranges_clause(Cliente.reddito, filters.reddito))
+    if filters.prop_vita:
+        stmt = stmt.where(_ranges_clause(Cliente.propensione_acquisto_prodotti_vita, filters.prop_vita))
+    if filters.prop_danni:
+        stmt = stmt.where(_ranges_clause(Cliente.propensione_acquisto_prodotti_danni, filters.prop_danni))
+    if filters.agenzia:
+        stmt = stmt.where(Cliente.agenzia.in_(filters.agenzia))
+    if filters.zona:
+        stmt = stmt.where(Cliente.zona_di_residenza.in_(filters.zona))
+    return stmt
+
+def parse_order_by(order_by: str):
+    """
+    Restituisce (colonna, discendente) a partire da 'reddito' o '-reddito'.
+    """
+    descending = order_by.startswith("-")
+    name = order_by.lstrip("-")
+    if name not in SORTABLE_COLUMNS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Ordinamento non supportato: '{name}'. Valori ammessi: {', '.join(SORTABLE_COLUMNS)}"
+        )
+    return SORTABLE_COLUMNS[name], descending
+
+def encode_cursor(sort_value, codice_cliente: int) -> str:
+    raw = json.dumps([sort_value, codice_cliente]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        sort_value, codice_cliente = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursore non valido")
+    return sort_value, codice_cliente
+
+def apply_keyset(stmt, order_by: str, cursor: Optional[str], limit: Optional[int]):
+    """
+    Ordina per (colonna, codice_cliente) e, se presente un cursore, riparte dalla riga successiva.
+    I clienti senza valore nella colonna vengono dopo gli altri in ordine crescente e prima in
+    ordine decrescente, come nell'indice composto. Restituisce i passi da eseguire in ordine
+    finché la pagina non è piena: ognuno è un confronto tra tuple o una ricerca dei NULL,
+    servibili dall'indice senza rileggere le righe delle pagine precedenti.
+    Ogni passo legge una riga in più del limite per sapere se esiste una pagina successiva.
+    """
+    column, descending = parse_order_by(order_by)
+    codice = Cliente.codice_cliente
+    if column is codice:
+        if cursor:
+            _, codice_cliente = decode_cursor(cursor)
+            stmt = stmt.where(codice < codice_cliente if descending else codice > codice_cliente)
+        passi = [stmt.order_by(codice.desc() if descending else codice.asc())]
+    else:
+        ordine_valori = [column.desc(), codice.desc()] if descending else [column.asc(), codice.asc()]
+        valori = stmt.where(column.is_not(None)).order_by(*ordine_valori)
+        null = stmt.where(column.is_(None)).order_by(codice.desc() if descending else codice.asc())
+        if not cursor:
+            passi = [null, valori] if descending else [valori, null]
+        else:
+            sort_value, codice_cliente = decode_cursor(cursor)
+            key = tuple_(column, codice)
+            if sort_value is None:
+                # the cursor is among the NULLs: the rest of them, then (descending) every value
+                null = null.where(codice < codice_cliente if descending else codice > codice_cliente)
+                passi = [null, valori] if descending else [null]
+            elif descending:
+                passi = [valori.where(key < (sort_value, codice_cliente))]
+            else:
+                passi = [valori.where(key > (sort_value, codice_cliente)), null]
+    if limit is not None:
+        passi = [passo.limit(limit + 1) for passo in passi]
+    return passi, column
@@ -0,0 +1,191 @@
+import asyncio
+import contextvars
+import multiprocessing
+import time
+import uuid
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Optional
+from app.errors import CodaPienaError
+from app.timing import aggiungi_fasi, esegui_con_fasi, misura_fasi, osserva_fasi
+
+class Job:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.creato_il = time.time()
+        self.completato_il = None
+        self.risultato = None
+        self.errore = None
+        # class of the failure, to tell bad input (ValueError) from internal errors
+        self.tipo_errore = None
+        self.future = None
+
+    @property
+    def stato(self) -> str:
+        if self.errore is not None:
+            return "errore"
+        if self.completato_il is not None:
+            return "completato"
+        if self.future is not None and (self.future.running() or self.future.done()):
+            return "in_elaborazione"
+        return "in_coda"
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "stato": self.stato,
+            "creato_il": self.creato_il,
+            "completato_il": self.completato_il,
+            "errore": self.errore,
+        }
+
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+class JobQueue:
+    """
+    Coda di elaborazioni con un pool di processi limitato. Il lavoro CPU-bound gira nei
+    processi del pool (run_in_pool), così l'event loop resta libero; oltre max_pending
+    elaborazioni non concluse le nuove richieste vengono rifiutate.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, ttl: float, initializer: Optional[Callable] = None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.initializer = initializer
+        self._executor = None
+        self._jobs = {}
+        self._tasks = set()
+        self._active = 0
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: workers must not inherit the event loop, open sockets or threads of the server
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer,
+            )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run_in_pool(self, fn: Callable, *args):
+        """
+        Esegue fn(*args) in un processo del pool senza bloccare l'event loop. Le fasi misurate
+        nel processo (ffmpeg, vosk, spacy) si sommano a quelle della richiesta o del job.
+        """
+        future = self.executor.submit(esegui_con_fasi, fn, *args)
+        job = _current_job.get()
+        if job is not None:
+            job.future = future
+        risultato, fasi = await asyncio.wrap_future(future)
+        aggiungi_fasi(fasi)
+        return risultato
+
+    def _reserve(self, posti: int = 1):
+        if self._active + posti > self.max_pending:
+            raise CodaPienaError(f"Troppe elaborazioni in corso ({self._active}), riprovare più tardi.")
+        self._active += posti
+
+    async def run(self, work: Callable[[], Awaitable], posti: int = 1):
+        """
+        Esegue un'elaborazione e ne attende il risultato, rispettando il limite della coda.
+        `posti` è il numero di chiamate a run_in_pool che il lavoro tiene in corso insieme.
+        """
+        self._reserve(posti)
+        try:
+            return await work()
+        finally:
+            self._active -= posti
+
+    def submit(self, work: Callable[[], Awaitable]) -> Job:
+        """Accoda un'elaborazione e restituisce subito il job da interrogare."""
+        self._purge()
+        self._reserve()
+        job = Job()
+        self._jobs[job.id] = job
+
+        async def _run():
+            _current_job.set(job)
+            # the job outlives the request that submitted it: its stages are recorded on their own
+            fasi = misura_fasi()
+            try:
+                job.risultato = await work()
+            except Exception as e:
+                job.errore = str(e)
+                job.tipo_errore = type(e)
+            finally:
+                job.completato_il = time.time()
+                self._active -= 1
+                osserva_fasi(fasi)
+
+        task = asyncio.create_task(_run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def _purge(self):
+        limite = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.completato_il and j.completato_il < limite]:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        return {"workers": self.max_workers, "attivi": self._active, "max_in_coda": self.max_pending, "job": len(self._jobs)}
+
+class LimiteConcorrenza:
+    """
+    Al massimo max_concurrent elaborazioni contemporanee nell'event loop (ad esempio chiamate a un
+    servizio esterno); fino a max_waiting richieste attendono un posto per al più `timeout` secondi,
+    oltre vengono rifiutate con CodaPienaError.
+    """
+
+    def __init__(self, max_concurrent: int, max_waiting: int, timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._in_attesa = 0
+        self._attivi = 0
+
+    def verifica(self):
+        """Rifiuta subito la richiesta se la coda d'attesa è già piena."""
+        if self._semaphore.locked() and self._in_attesa >= self.max_waiting:
+            raise CodaPienaError(f"Troppe richieste in attesa ({self._in_attesa}), riprovare più tardi.")
+
+    async def acquire(self):
+        if not self._semaphore.locked():
+            # a free slot is taken without suspending
+            await self._semaphore.acquire()
+        else:
+            self.verifica()
+            self._in_attesa += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                raise CodaPienaError("Tempo di attesa esaurito, riprovare più tardi.")
+            finally:
+                self._in_attesa -= 1
+        self._attivi += 1
+
+    def release(self):
+        self._attivi -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {"attivi": self._attivi, "in_attesa": self._in_attesa, "max_attivi": self.max_concurrent, "max_in_attesa": self.max_waiting}
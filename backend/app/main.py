@@ -1,13 +1,48 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse
-from app.routers import clienti, chatbot, voice_assistant, notes, polizze, status
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.routers import clienti, chatbot, voice_assistant, notes, polizze, status, dashboard, export, metrics
+from app.rollups import ensure_rollups, rollup_scheduler
+from app.readiness import warmup
+from app.timing import MetricheMiddleware
+from app.config import ROLLUP_REFRESH_INTERVAL, AI_WARMUP, CHATBOT_DOCS_POLL_INTERVAL
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(default_response_class=ORJSONResponse)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await ensure_rollups()
+    except Exception as e:
+        print(f"Impossibile creare la vista dei rollup: {e}")
+    background_tasks = []
+    if ROLLUP_REFRESH_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(rollup_scheduler()))
+    if AI_WARMUP:
+        # chatbot and voice models load after startup, the API serves requests meanwhile
+        background_tasks.append(asyncio.create_task(warmup()))
+    if CHATBOT_DOCS_POLL_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(chatbot.docs_watcher()))
+    yield
+    for task in background_tasks:
+        task.cancel()
+    voice_assistant.voice_jobs.shutdown()
+    if chatbot.chat_engine.stato == "pronto":
+        await chatbot.chat_engine.valore.async_client.close()
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+app.add_middleware(MetricheMiddleware)
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_esaurito(request: Request, exc: PoolTimeoutError):
+    # every pool connection stayed busy for DB_POOL_TIMEOUT seconds
+    return ORJSONResponse(status_code=503, content={"detail": "Database occupato, riprovare più tardi."}, headers={"Retry-After": "5"})
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,6 +50,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(clienti.router)
@@ -22,4 +58,7 @@ app.include_router(chatbot.router)
 app.include_router(voice_assistant.router)
 app.include_router(notes.router)
 app.include_router(polizze.router)
-app.include_router(status.router)
\ No newline at end of file
+app.include_router(status.router)
+app.include_router(dashboard.router)
+app.include_router(export.router)
+app.include_router(metrics.router)
\ No newline at end of file
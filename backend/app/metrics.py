@@ -0,0 +1,107 @@
+import bisect
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# seconds: from a cached lookup to a long voice note
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registro: list = []
+
+def _etichette(nomi: Sequence[str], valori: Tuple[str, ...], extra: str = "") -> str:
+    coppie = [f'{nome}="{_escape(valore)}"' for nome, valore in zip(nomi, valori)]
+    if extra:
+        coppie.append(extra)
+    return "{" + ",".join(coppie) + "}" if coppie else ""
+
+def _escape(valore: str) -> str:
+    return str(valore).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _numero(valore: float) -> str:
+    return "+Inf" if valore == float("inf") else repr(float(valore))
+
+class Istogramma:
+    """
+    Istogramma in formato Prometheus, per processo: conteggi cumulativi per bucket, somma e
+    numero delle osservazioni per ogni combinazione di etichette.
+    """
+
+    def __init__(self, nome: str, descrizione: str, etichette: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        self.nome = nome
+        self.descrizione = descrizione
+        self.etichette = tuple(etichette)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket (non-cumulative, last one is +Inf), sum]
+        self._serie: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def osserva(self, valore: float, **etichette):
+        chiave = tuple(str(etichette.get(nome, "")) for nome in self.etichette)
+        posizione = bisect.bisect_left(self.buckets, valore)
+        with self._lock:
+            serie = self._serie.get(chiave)
+            if serie is None:
+                serie = self._serie[chiave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][posizione] += 1
+            serie[1] += valore
+
+    def esporta(self) -> List[str]:
+        righe = [f"# HELP {self.nome} {self.descrizione}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            serie = [(chiave, list(conteggi), somma) for chiave, (conteggi, somma) in self._serie.items()]
+        for chiave, conteggi, somma in sorted(serie):
+            cumulato = 0
+            for limite, conteggio in zip(self.buckets + (float("inf"),), conteggi):
+                cumulato += conteggio
+                le = 'le="' + _numero(limite) + '"'
+                righe.append(f"{self.nome}_bucket{_etichette(self.etichette, chiave, le)} {cumulato}")
+            righe.append(f"{self.nome}_sum{_etichette(self.etichette, chiave)} {_numero(somma)}")
+            righe.append(f"{self.nome}_count{_etichette(self.etichette, chiave)} {cumulato}")
+        return righe
+
+class Indicatore:
+    """
+    Gauge in formato Prometheus letto al momento dell'esportazione: `leggi()` restituisce il
+    valore per ogni combinazione di etichette.
+    """
+
+    def __init__(self, nome: str, descrizione: str, etichette: Sequence[str], leggi: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.nome = nome
+        self.descrizione = descrizione
+        self.etichette = tuple(etichette)
+        self.leggi = leggi
+        _registro.append(self)
+
+    def esporta(self) -> List[str]:
+        righe = [f"# HELP {self.nome} {self.descrizione}", f"# TYPE {self.nome} gauge"]
+        for chiave, valore in sorted(self.leggi().items()):
+            righe.append(f"{self.nome}{_etichette(self.etichette, chiave)} {_numero(valore)}")
+        return righe
+
+def esporta() -> str:
+    """Tutte le metriche del processo nel formato testuale di Prometheus."""
+    righe = []
+    for metrica in _registro:
+        righe.extend(metrica.esporta())
+    return "\n".join(righe) + "\n"
+
+richieste_http = Istogramma(
+    "vita_http_request_duration_seconds",
+    "Durata delle richieste HTTP, fino all'ultimo byte della risposta.",
+    ("method", "route", "status"),
+)
+fasi_richiesta = Istogramma(
+    "vita_stage_duration_seconds",
+    "Tempo speso in ogni fase di una richiesta o di un job (OpenAI, ffmpeg, Vosk, spaCy, ...).",
+    ("stage",),
+)
+query_db = Istogramma(
+    "vita_db_query_duration_seconds",
+    "Durata delle istruzioni SQL, per tipo di istruzione.",
+    ("operation",),
+)
+attesa_pool_db = Istogramma(
+    "vita_db_pool_checkout_seconds",
+    "Attesa per ottenere una connessione dal pool del database.",
+    ("pool",),
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import ARRAY 
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -6,7 +6,20 @@ Base = declarative_base()
 
 class Cliente(Base):
     __tablename__ = 'clienti'
-    __table_args__ = {'schema': 'vitasicura_schema'}
+    # composite indexes (sort column, codice_cliente) back the keyset pagination of GET /clienti
+    __table_args__ = (
+        Index('ix_clienti_nome_codice', 'nome', 'codice_cliente'),
+        Index('ix_clienti_cognome_codice', 'cognome', 'codice_cliente'),
+        Index('ix_clienti_eta_codice', 'eta', 'codice_cliente'),
+        Index('ix_clienti_residenza_codice', 'luogo_di_residenza', 'codice_cliente'),
+        Index('ix_clienti_professione_codice', 'professione', 'codice_cliente'),
+        Index('ix_clienti_reddito_codice', 'reddito', 'codice_cliente'),
+        Index('ix_clienti_agenzia', 'agenzia'),
+        Index('ix_clienti_zona', 'zona_di_residenza'),
+        # case-insensitive name lookup of the voice assistant
+        Index('ix_clienti_lower_nome_cognome', text('lower(nome)'), text('lower(cognome)')),
+        {'schema': 'vitasicura_schema'},
+    )
 
     codice_cliente = Column(Integer, primary_key=True, index=True)
     nome = Column(String(50))
@@ -0,0 +1,313 @@
+import asyncio
+import heapq
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.future import select
+from app.database import async_session
+from app.models import Cliente
+from app.config import NAME_INDEX_TTL, NAME_MATCH_THRESHOLD, NAME_MATCH_MARGIN
+
+# Italian spelling -> sound, applied in order: soft c/g/sc before e/i, gl/gn, silent h,
+# hard c/ch/k/q, foreign letters; uppercase letters mark the rewritten sounds
+_REGOLE_FONETICHE = [
+    (re.compile(r"sci(?=[aou])|sc(?=[ei])"), "S"),
+    (re.compile(r"ci(?=[aou])|c(?=[ei])"), "C"),
+    (re.compile(r"gi(?=[aou])|g(?=[ei])"), "G"),
+    (re.compile(r"gl(?=i)"), "L"),
+    (re.compile(r"gn"), "N"),
+    (re.compile(r"ch|c|k|q"), "k"),
+    (re.compile(r"gh"), "g"),
+    (re.compile(r"h"), ""),
+    (re.compile(r"x"), "ks"),
+    (re.compile(r"[yj]"), "i"),
+    (re.compile(r"w"), "v"),
+    # double consonants are the most frequent transcription mistake
+    (re.compile(r"(.)\1+"), r"\1"),
+]
+
+def normalizza(testo: Optional[str]) -> List[str]:
+    """Parole in minuscolo, senza accenti né caratteri diversi dalle lettere."""
+    testo = unicodedata.normalize("NFKD", testo or "")
+    testo = "".join(c for c in testo if not unicodedata.combining(c)).lower()
+    return "".join(c if c.isalpha() else " " for c in testo).split()
+
+def chiave_fonetica(parola: str) -> str:
+    """Chiave fonetica di una parola già normalizzata: 'Bianki' e 'Bianchi' hanno la stessa chiave."""
+    for regola, sostituzione in _REGOLE_FONETICHE:
+        parola = regola.sub(sostituzione, parola)
+    return parola
+
+def trigrammi(parole: List[str], prefisso: bool = False) -> Set[str]:
+    """Trigrammi delle parole; con prefisso=True l'ultima parola può essere incompleta."""
+    risultato = set()
+    for i, parola in enumerate(parole):
+        padded = f"  {parola}" if prefisso and i == len(parole) - 1 else f"  {parola} "
+        risultato.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return risultato
+
+# similarity given to a word with the same phonetic key, and minimum word similarity considered
+SIMILARITA_FONETICA = 0.9
+SIMILARITA_MINIMA = 0.4
+# most similar vocabulary words kept for each word of the query
+PAROLE_SIMILI = 10
+
+class NameIndex:
+    """
+    Indice in memoria dei nomi dei clienti per abbinare i nomi trascritti dal riconoscimento
+    vocale e per la ricerca type-ahead. Trigrammi e chiavi fonetiche sono calcolati sulle parole
+    distinte (molti clienti condividono lo stesso nome o cognome), ciascuna con la lista dei
+    clienti che la contengono. L'ordine di nome e cognome non conta.
+    """
+
+    def __init__(self):
+        self.caricato_il = None
+        self._clienti: Dict[int, Tuple[str, str]] = {}
+        self._parole_cliente: Dict[int, Tuple[str, ...]] = {}
+        self._esatti = defaultdict(set)
+        self._clienti_parola = defaultdict(set)
+        self._trigrammi = defaultdict(set)
+        self._fonetiche = defaultdict(set)
+        self._n_trigrammi: Dict[str, int] = {}
+        # updates received while a reload reads the table, re-applied after the swap
+        self._in_ricarica = False
+        self._modifiche = {}
+
+    def __len__(self):
+        return len(self._clienti)
+
+    def _aggiungi(self, codice_cliente: int, nome: Optional[str], cognome: Optional[str]):
+        parole = tuple(normalizza(f"{nome or ''} {cognome or ''}"))
+        self._clienti[codice_cliente] = (nome, cognome)
+        self._parole_cliente[codice_cliente] = parole
+        if not parole:
+            return
+        self._esatti[" ".join(parole)].add(codice_cliente)
+        for parola in parole:
+            if parola not in self._clienti_parola:
+                tri = trigrammi([parola])
+                for t in tri:
+                    self._trigrammi[t].add(parola)
+                self._fonetiche[chiave_fonetica(parola)].add(parola)
+                self._n_trigrammi[parola] = len(tri)
+            self._clienti_parola[parola].add(codice_cliente)
+
+    def _rimuovi(self, codice_cliente: int):
+        if codice_cliente not in self._clienti:
+            return
+        del self._clienti[codice_cliente]
+        parole = self._parole_cliente.pop(codice_cliente)
+        if not parole:
+            return
+        _scarta(self._esatti, " ".join(parole), codice_cliente)
+        for parola in parole:
+            _scarta(self._clienti_parola, parola, codice_cliente)
+            if parola not in self._clienti_parola:
+                # last customer with this word: drop it from the vocabulary
+                for t in trigrammi([parola]):
+                    _scarta(self._trigrammi, t, parola)
+                _scarta(self._fonetiche, chiave_fonetica(parola), parola)
+                self._n_trigrammi.pop(parola, None)
+
+    @classmethod
+    def da_righe(cls, righe: Iterable[Tuple[int, Optional[str], Optional[str]]]) -> "NameIndex":
+        """Costruisce un nuovo indice da righe (codice_cliente, nome, cognome)."""
+        nuovo = cls()
+        for codice_cliente, nome, cognome in righe:
+            nuovo._aggiungi(codice_cliente, nome, cognome)
+        return nuovo
+
+    def sostituisci(self, nuovo: "NameIndex"):
+        """Adotta il contenuto di un indice ricostruito, riapplicando le modifiche arrivate nel frattempo."""
+        self._clienti, self._parole_cliente, self._esatti = nuovo._clienti, nuovo._parole_cliente, nuovo._esatti
+        self._clienti_parola, self._trigrammi = nuovo._clienti_parola, nuovo._trigrammi
+        self._fonetiche, self._n_trigrammi = nuovo._fonetiche, nuovo._n_trigrammi
+        # replayed directly: through aggiorna() they would be recorded again while the reload is
+        # still flagged, and written back over the next reload's fresh snapshot
+        for codice_cliente, (nome, cognome) in self._modifiche.items():
+            self._rimuovi(codice_cliente)
+            self._aggiungi(codice_cliente, nome, cognome)
+        self._modifiche = {}
+        self.caricato_il = time.time()
+
+    def carica(self, righe: Iterable[Tuple[int, Optional[str], Optional[str]]]):
+        self.sostituisci(NameIndex.da_righe(righe))
+
+    def aggiorna(self, codice_cliente: int, nome: Optional[str], cognome: Optional[str]):
+        """Aggiornamento incrementale dopo la modifica di nome o cognome di un cliente."""
+        if self._in_ricarica:
+            self._modifiche[codice_cliente] = (nome, cognome)
+        self._rimuovi(codice_cliente)
+        self._aggiungi(codice_cliente, nome, cognome)
+
+    def cliente(self, codice_cliente: int) -> Optional[Tuple[str, str]]:
+        return self._clienti.get(codice_cliente)
+
+    def _parole_simili(self, parola: str, prefisso: bool) -> Tuple[Dict[str, float], Set[str]]:
+        """
+        Parole del vocabolario simili a `parola` con la loro similarità (da 0 a 1) e l'insieme
+        di quelle con la stessa chiave fonetica. Con prefisso=True conta la quota dei trigrammi
+        digitati presenti nella parola, così 'ros' trova 'rossi'.
+        """
+        richiesti = trigrammi([parola], prefisso=prefisso)
+        comuni = Counter()
+        for t in richiesti:
+            comuni.update(self._trigrammi.get(t, ()))
+        if prefisso:
+            simili = {p: n / len(richiesti) for p, n in comuni.items()}
+        else:
+            simili = {p: 2 * n / (len(richiesti) + self._n_trigrammi[p]) for p, n in comuni.items()}
+        fonetiche = set() if prefisso else set(self._fonetiche.get(chiave_fonetica(parola), ()))
+        for p in fonetiche:
+            simili[p] = max(simili.get(p, 0), SIMILARITA_FONETICA)
+        migliori = heapq.nlargest(PAROLE_SIMILI, ((s, p) for p, s in simili.items() if s >= SIMILARITA_MINIMA))
+        return {p: s for s, p in migliori}, fonetiche
+
+    def _punteggi(self, parole: List[str], prefisso: bool, per_combinazione: Optional[int] = None):
+        """
+        Punteggio dei clienti candidati: somma delle similarità delle parole cercate divisa per il
+        numero di parole (della ricerca o del cliente, il maggiore). I candidati sono i clienti che
+        contengono una combinazione di parole simili, una per parola cercata: le intersezioni tra
+        insiemi evitano di visitare tutti i clienti con un nome comune. Con per_combinazione si
+        considerano solo i primi N codici di ogni combinazione (ricerca type-ahead).
+        """
+        simili = [self._parole_simili(p, prefisso and i == len(parole) - 1) for i, p in enumerate(parole)]
+        combinazioni = [(0.0, None)]
+        for parole_simili, _ in simili:
+            nuove = []
+            for totale, clienti in combinazioni:
+                for parola, similarita in parole_simili.items():
+                    candidati = self._clienti_parola[parola]
+                    if clienti is not None:
+                        candidati = clienti & candidati
+                    if candidati:
+                        nuove.append((totale + similarita, candidati))
+            combinazioni = nuove
+
+        punteggi = {}
+        for totale, clienti in combinazioni:
+            if per_combinazione is not None and len(clienti) > per_combinazione:
+                clienti = heapq.nsmallest(per_combinazione, clienti)
+            for codice_cliente in clienti:
+                punteggio = totale / max(len(parole), len(self._parole_cliente[codice_cliente]))
+                if punteggio > punteggi.get(codice_cliente, 0):
+                    punteggi[codice_cliente] = punteggio
+        return punteggi, [f for _, f in simili]
+
+    def _fonetico(self, codice_cliente: int, fonetiche: List[Set[str]]) -> bool:
+        parole_cliente = self._parole_cliente[codice_cliente]
+        return all(any(p in f for p in parole_cliente) for f in fonetiche)
+
+    def cerca(self, testo: str, limit: int = 10, prefisso: bool = False) -> List[dict]:
+        """
+        Clienti più simili al testo, ordinati per punteggio (da 0 a 1).
+        Con prefisso=True l'ultima parola è trattata come l'inizio di un nome (ricerca type-ahead).
+        """
+        parole = normalizza(testo)
+        if not parole:
+            return []
+        punteggi, fonetiche = self._punteggi(parole, prefisso, per_combinazione=limit)
+        migliori = heapq.nlargest(limit, punteggi, key=lambda c: (punteggi[c], -c))
+        return [
+            {
+                "codice_cliente": codice_cliente,
+                "nome": self._clienti[codice_cliente][0],
+                "cognome": self._clienti[codice_cliente][1],
+                "punteggio": round(punteggi[codice_cliente], 3),
+                "fonetico": not prefisso and self._fonetico(codice_cliente, fonetiche),
+            }
+            for codice_cliente in migliori
+        ]
+
+    def abbina(self, nome: Optional[str], cognome: Optional[str]) -> Optional[int]:
+        """
+        codice_cliente del cliente indicato da nome e cognome trascritti, tollerando errori di
+        trascrizione; None se non c'è un candidato abbastanza simile e nettamente migliore degli altri.
+        Senza nome o senza cognome vale solo la corrispondenza esatta.
+        A parità di nome e cognome vale il codice_cliente più basso.
+        """
+        parole = normalizza(f"{nome or ''} {cognome or ''}")
+        if not parole:
+            return None
+        esatta = " ".join(parole)
+        if esatta in self._esatti:
+            return min(self._esatti[esatta])
+        # a first name or a surname alone would attach the note to whoever shares it
+        if not normalizza(nome) or not normalizza(cognome):
+            return None
+        punteggi, fonetiche = self._punteggi(parole, prefisso=False)
+        # homonyms count as one candidate: the runner-up must be a different name
+        per_nome = {}
+        for codice_cliente, punteggio in punteggi.items():
+            chiave = self._parole_cliente[codice_cliente]
+            if punteggio > per_nome.get(chiave, (-1, None))[0]:
+                per_nome[chiave] = (punteggio, codice_cliente)
+        if not per_nome:
+            return None
+        candidati = heapq.nlargest(2, per_nome.items(), key=lambda item: item[1][0])
+        chiave, (punteggio, codice_cliente) = candidati[0]
+        secondo = candidati[1][1] if len(candidati) > 1 else None
+        if punteggio < NAME_MATCH_THRESHOLD:
+            return None
+        # a phonetic match wins over a runner-up that is not one, however close its score
+        fonetico = self._fonetico(codice_cliente, fonetiche) and not (secondo and self._fonetico(secondo[1], fonetiche))
+        if secondo and not fonetico and punteggio - secondo[0] < NAME_MATCH_MARGIN:
+            return None
+        return min(self._esatti[" ".join(chiave)])
+
+    def stats(self) -> dict:
+        return {
+            "clienti": len(self._clienti),
+            "parole": len(self._clienti_parola),
+            "trigrammi": len(self._trigrammi),
+            "caricato_il": self.caricato_il,
+        }
+
+def _scarta(indice: dict, chiave, valore):
+    valori = indice.get(chiave)
+    if valori is not None:
+        valori.discard(valore)
+        if not valori:
+            del indice[chiave]
+
+name_index = NameIndex()
+_caricamento = asyncio.Lock()
+_ricarica_task = None
+
+async def carica_name_index():
+    """Legge nome e cognome di tutti i clienti e ricostruisce l'indice."""
+    name_index._in_ricarica = True
+    try:
+        async with async_session() as session:
+            result = await session.execute(select(Cliente.codice_cliente, Cliente.nome, Cliente.cognome))
+            righe = result.all()
+        # build off the event loop, swap on it
+        name_index.sostituisci(await asyncio.to_thread(NameIndex.da_righe, righe))
+        print(f"Indice dei nomi caricato: {len(name_index)} clienti")
+    finally:
+        name_index._in_ricarica = False
+
+async def get_name_index() -> NameIndex:
+    """
+    Indice caricato alla prima richiesta; oltre NAME_INDEX_TTL secondi viene ricaricato
+    in background (per i clienti inseriti fuori dall'applicazione) continuando a servire quello attuale.
+    """
+    global _ricarica_task
+    if name_index.caricato_il is None:
+        async with _caricamento:
+            if name_index.caricato_il is None:
+                await carica_name_index()
+    elif NAME_INDEX_TTL and time.time() - name_index.caricato_il > NAME_INDEX_TTL and _ricarica_task is None:
+        async def _ricarica():
+            global _ricarica_task
+            try:
+                await carica_name_index()
+            except Exception as e:
+                print(f"Ricarica dell'indice dei nomi fallita: {e}")
+                name_index.caricato_il = time.time()
+            finally:
+                _ricarica_task = None
+        _ricarica_task = asyncio.create_task(_ricarica())
+    return name_index
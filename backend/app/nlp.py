@@ -0,0 +1,81 @@
+import threading
+from typing import Iterable, List
+from app.timing import fase
+
+SPACY_MODEL = "it_core_news_md"
+# only the entity recognizer is needed to read PER entities
+EXCLUDED_COMPONENTS = ["parser", "lemmatizer", "tagger", "morphologizer", "attribute_ruler"]
+
+_nlp = None
+_nlp_lock = threading.Lock()
+
+def get_nlp():
+    """Pipeline NER condivisa dal processo, caricata alla prima richiesta."""
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                # imported on first use: loading spaCy takes seconds and is not needed at startup
+                import spacy
+                try:
+                    _nlp = spacy.load(SPACY_MODEL, exclude=EXCLUDED_COMPONENTS)
+                except Exception:
+                    raise RuntimeError(f"Modello spaCy '{SPACY_MODEL}' non trovato. Assicurati di aver eseguito: python -m spacy download {SPACY_MODEL}")
+    return _nlp
+
+def pulisci_testo(testo: str) -> str:
+    """Se il testo contiene più oggetti JSON, si prende il primo."""
+    if "},{" in testo:
+        testo = testo.split("},{")[0] + "}"
+    elif "}{" in testo:
+        testo = testo.split("}{")[0] + "}"
+    return testo
+
+def _informazioni_da_doc(doc, testo: str) -> dict:
+    nome = None
+    cognome = None
+    nota = None
+
+    for ent in doc.ents:
+        if ent.label_ == "PER":
+            splitted = ent.text.split()
+            if not nome and len(splitted) > 0:
+                nome = splitted[0].capitalize()
+                if len(splitted) > 1:
+                    cognome = splitted[1].capitalize()
+            else:
+                if not cognome:
+                    cognome = ent.text.capitalize()
+
+    lower_text = testo.lower()
+    if "nota:" in lower_text:
+        start_idx = lower_text.find("nota:")
+        nota = testo[start_idx + len("nota:"):].strip()
+    elif " con nota " in lower_text:
+        start_idx = lower_text.find(" con nota ")
+        nota = testo[start_idx + len(" con nota "):].strip()
+    else:
+        nota = testo.strip()
+
+    return {"nome": nome, "cognome": cognome, "nota": nota}
+
+def estrai_informazioni_chiave(testo: str) -> dict:
+    """
+    Estrae informazioni chiave (nome, cognome e nota) dal testo trascritto usando spaCy.
+    Se il testo contiene più oggetti JSON, si prende il primo.
+    Cerca il marker "nota:" o la sequenza " con nota ".
+    In assenza di marker, l'intera trascrizione viene usata come nota.
+    """
+    testo = pulisci_testo(testo)
+    nlp = get_nlp()
+    with fase("spacy"):
+        doc = nlp(testo)
+    return _informazioni_da_doc(doc, testo)
+
+def estrai_informazioni_batch(testi: Iterable[str], batch_size: int = 32) -> List[dict]:
+    """Come estrai_informazioni_chiave, ma elabora molte trascrizioni insieme con nlp.pipe."""
+    testi = [pulisci_testo(testo) for testo in testi]
+    nlp = get_nlp()
+    with fase("spacy"):
+        docs = list(nlp.pipe(testi, batch_size=batch_size))
+    return [_informazioni_da_doc(doc, testo) for doc, testo in zip(docs, testi)]
@@ -0,0 +1,96 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import String, func, insert, literal, tuple_
+from sqlalchemy.future import select
+from app.database import async_session
+from app.models import Cliente, Note
+from app.name_index import NameIndex, get_name_index
+
+NOTA_MAX_LENGTH = Note.__table__.c.nota.type.length
+
+def chiave_nome(nome: Optional[str], cognome: Optional[str]) -> Tuple[str, str]:
+    """Chiave case-insensitive usata per abbinare nome e cognome trascritti ai clienti."""
+    return (nome or "").lower(), (cognome or "").lower()
+
+async def risolvi_clienti(coppie: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+    """
+    Risolve con una sola query tutte le coppie (nome, cognome), già in minuscolo.
+    A parità di nome e cognome vale il codice_cliente più basso.
+    """
+    coppie = list(set(coppie))
+    if not coppie:
+        return {}
+    nome, cognome = func.lower(Cliente.nome), func.lower(Cliente.cognome)
+    stmt = (
+        select(nome, cognome, func.min(Cliente.codice_cliente))
+        .where(tuple_(nome, cognome).in_(coppie))
+        .group_by(nome, cognome)
+    )
+    async with async_session() as session:
+        result = await session.execute(stmt)
+    return {(n, c): codice for n, c, codice in result.all()}
+
+async def inserisci_note(righe: List[dict]):
+    """Inserisce tutte le note (codice_cliente, nome, cognome, nota) in un'unica transazione."""
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(insert(Note), righe)
+
+async def _inserisci_per_nome(nome: str, cognome: str, nota: str) -> Optional[int]:
+    """INSERT ... SELECT ... RETURNING sul nome esatto (case-insensitive); None se nessun cliente corrisponde."""
+    cliente = (
+        select(
+            Cliente.codice_cliente,
+            literal(nome, String),
+            literal(cognome, String),
+            literal(nota, String),
+        )
+        .where(func.lower(Cliente.nome) == func.lower(literal(nome, String)))
+        .where(func.lower(Cliente.cognome) == func.lower(literal(cognome, String)))
+        .order_by(Cliente.codice_cliente)
+        .limit(1)
+    )
+    stmt = (
+        insert(Note)
+        .from_select(["codice_cliente", "nome", "cognome", "nota"], cliente)
+        .returning(Note.codice_cliente)
+    )
+    async with async_session() as session:
+        async with session.begin():
+            return (await session.execute(stmt)).scalar()
+
+async def inserisci_nota(informazioni: dict) -> int:
+    """
+    Individua il cliente con l'indice dei nomi, che tollera gli errori di trascrizione, e inserisce
+    la nota con una sola istruzione. nome e cognome in `informazioni` vengono sostituiti con quelli
+    del cliente abbinato. Se l'indice non trova il cliente (ad esempio perché inserito da poco) si
+    ricorre a INSERT ... SELECT sul nome esatto. Restituisce il codice_cliente.
+    """
+    nome, cognome, nota = informazioni["nome"], informazioni["cognome"], informazioni["nota"]
+    if nota and len(nota) > NOTA_MAX_LENGTH:
+        raise ValueError(f"Nota troppo lunga ({len(nota)} caratteri, massimo {NOTA_MAX_LENGTH}).")
+
+    indice = await get_name_index()
+    codice_cliente = indice.abbina(nome, cognome)
+    if codice_cliente is not None:
+        nome, cognome = indice.cliente(codice_cliente)
+        async with async_session() as session:
+            async with session.begin():
+                await session.execute(
+                    insert(Note).values(codice_cliente=codice_cliente, nome=nome, cognome=cognome, nota=nota)
+                )
+        informazioni.update(nome=nome, cognome=cognome)
+        return codice_cliente
+
+    codice_cliente = await _inserisci_per_nome(nome, cognome, nota)
+    if codice_cliente is None:
+        raise ValueError(messaggio_cliente_non_trovato(indice, nome, cognome))
+    return codice_cliente
+
+def messaggio_cliente_non_trovato(indice: NameIndex, nome: Optional[str], cognome: Optional[str]) -> str:
+    messaggio = f"Nessun cliente trovato con nome '{nome}' e cognome '{cognome}'"
+    candidati = indice.cerca(f"{nome or ''} {cognome or ''}", limit=3)
+    if candidati:
+        messaggio += ". Forse: " + ", ".join(
+            f"{c['nome']} {c['cognome']} ({c['codice_cliente']})" for c in candidati
+        )
+    return messaggio
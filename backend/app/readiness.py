@@ -0,0 +1,78 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Callable, Dict
+
+class SottosistemaNonDisponibile(Exception):
+    """Il sottosistema non è stato inizializzato perché l'avvio è fallito."""
+
+class Sottosistema:
+    """
+    Componente pesante (modelli, indici, client esterni) inizializzato in modo pigro: `init` gira
+    una sola volta, al primo get() oppure nel warm-up in background dopo l'avvio, in un thread se
+    sincrona, così né l'import dell'app né l'event loop restano bloccati. Se l'avvio fallisce
+    l'errore compare in /status e la richiesta successiva riprova.
+    """
+
+    def __init__(self, nome: str, init: Callable[[], Any]):
+        self.nome = nome
+        self.init = init
+        self.valore = None
+        self.errore = None
+        self.avviato_il = None
+        self.durata = None
+        self._task = None
+        sottosistemi[nome] = self
+
+    @property
+    def stato(self) -> str:
+        if self._task is None:
+            return "non_avviato"
+        if not self._task.done():
+            return "in_avvio"
+        return "errore" if self.errore is not None else "pronto"
+
+    async def _inizializza(self):
+        self.avviato_il = time.time()
+        self.errore = None
+        try:
+            if inspect.iscoroutinefunction(self.init):
+                self.valore = await self.init()
+            else:
+                self.valore = await asyncio.to_thread(self.init)
+            print(f"{self.nome} pronto in {time.time() - self.avviato_il:.1f} s")
+            return self.valore
+        except Exception as e:
+            self.errore = str(e) or type(e).__name__
+            print(f"Avvio di {self.nome} fallito: {self.errore}")
+            raise
+        finally:
+            self.durata = time.time() - self.avviato_il
+
+    def avvia(self) -> asyncio.Task:
+        """Avvia l'inizializzazione se non è già in corso o conclusa con successo."""
+        if self._task is None or self.stato == "errore":
+            self._task = asyncio.create_task(self._inizializza())
+        return self._task
+
+    async def get(self):
+        """Il componente inizializzato; attende l'avvio in corso, SottosistemaNonDisponibile se fallisce."""
+        if self.stato == "pronto":
+            return self.valore
+        try:
+            # shield: a client that goes away must not cancel the start shared with other requests
+            return await asyncio.shield(self.avvia())
+        except Exception as e:
+            raise SottosistemaNonDisponibile(f"{self.nome} non disponibile: {e}")
+
+    def stats(self) -> dict:
+        return {"stato": self.stato, "errore": self.errore, "secondi_avvio": self.durata}
+
+sottosistemi: Dict[str, Sottosistema] = {}
+
+async def warmup():
+    """Inizializza tutti i sottosistemi in parallelo; gli errori restano in /status."""
+    await asyncio.gather(*(s.avvia() for s in sottosistemi.values()), return_exceptions=True)
+
+def readiness() -> dict:
+    return {nome: s.stats() for nome, s in sottosistemi.items()}
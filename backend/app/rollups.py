@@ -0,0 +1,128 @@
+import asyncio
+from sqlalchemy import column, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.config import ROLLUP_REFRESH_INTERVAL
+from app.database import async_session
+
+# one row per (prodotto, area_di_bisogno): the per-product and per-area totals are sums of these rows
+CREATE_ROLLUP_SQL = [
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS vitasicura_schema.polizze_rollup AS
+    WITH p AS (
+        SELECT prodotto, area_di_bisogno,
+               count(*) AS numero_polizze,
+               coalesce(sum(premio_ricorrente), 0) AS premio_ricorrente,
+               coalesce(sum(premio_unico), 0) AS premio_unico,
+               coalesce(sum(capitale_rivalutato), 0) AS capitale_rivalutato
+        FROM vitasicura_schema.polizze
+        GROUP BY prodotto, area_di_bisogno
+    ), r AS (
+        SELECT prodotto, area_di_bisogno, count(*) AS numero_reclami_info
+        FROM vitasicura_schema.reclami_info
+        GROUP BY prodotto, area_di_bisogno
+    ), s AS (
+        SELECT prodotto, area_di_bisogno, count(*) AS numero_sinistri
+        FROM vitasicura_schema.sinistri
+        GROUP BY prodotto, area_di_bisogno
+    ), k AS (
+        SELECT prodotto, area_di_bisogno FROM p
+        UNION SELECT prodotto, area_di_bisogno FROM r
+        UNION SELECT prodotto, area_di_bisogno FROM s
+    )
+    SELECT k.prodotto, k.area_di_bisogno,
+           coalesce(p.numero_polizze, 0) AS numero_polizze,
+           coalesce(p.premio_ricorrente, 0) AS premio_ricorrente,
+           coalesce(p.premio_unico, 0) AS premio_unico,
+           coalesce(p.capitale_rivalutato, 0) AS capitale_rivalutato,
+           coalesce(r.numero_reclami_info, 0) AS numero_reclami_info,
+           coalesce(s.numero_sinistri, 0) AS numero_sinistri,
+           now() AS aggiornato_al
+    FROM k
+    LEFT JOIN p ON p.prodotto IS NOT DISTINCT FROM k.prodotto AND p.area_di_bisogno IS NOT DISTINCT FROM k.area_di_bisogno
+    LEFT JOIN r ON r.prodotto IS NOT DISTINCT FROM k.prodotto AND r.area_di_bisogno IS NOT DISTINCT FROM k.area_di_bisogno
+    LEFT JOIN s ON s.prodotto IS NOT DISTINCT FROM k.prodotto AND s.area_di_bisogno IS NOT DISTINCT FROM k.area_di_bisogno
+    """,
+    # REFRESH ... CONCURRENTLY needs a unique index and keeps the view readable while it runs
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_polizze_rollup
+    ON vitasicura_schema.polizze_rollup (prodotto, area_di_bisogno)
+    """,
+]
+
+# arbitrary key: only one worker at a time refreshes the view
+ROLLUP_LOCK_KEY = 72_001
+
+polizze_rollup = table(
+    "polizze_rollup",
+    column("prodotto"),
+    column("area_di_bisogno"),
+    column("numero_polizze"),
+    column("premio_ricorrente"),
+    column("premio_unico"),
+    column("capitale_rivalutato"),
+    column("numero_reclami_info"),
+    column("numero_sinistri"),
+    column("aggiornato_al"),
+    schema="vitasicura_schema",
+)
+
+METRICHE = [
+    "numero_polizze",
+    "premio_ricorrente",
+    "premio_unico",
+    "capitale_rivalutato",
+    "numero_reclami_info",
+    "numero_sinistri",
+]
+
+async def ensure_rollups():
+    """Crea la vista materializzata e il suo indice se non esistono."""
+    async with async_session() as session:
+        for statement in CREATE_ROLLUP_SQL:
+            await session.execute(text(statement))
+        await session.commit()
+
+async def refresh_rollups() -> bool:
+    """
+    Aggiorna la vista senza bloccarne la lettura.
+    Restituisce False se un altro worker sta già eseguendo l'aggiornamento.
+    """
+    async with async_session() as session:
+        result = await session.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ROLLUP_LOCK_KEY})
+        if not result.scalar():
+            await session.rollback()
+            return False
+        await session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY vitasicura_schema.polizze_rollup"))
+        await session.commit()
+    return True
+
+async def rollup_scheduler():
+    """Task in background che aggiorna periodicamente i rollup."""
+    while True:
+        await asyncio.sleep(ROLLUP_REFRESH_INTERVAL)
+        try:
+            await refresh_rollups()
+        except Exception as e:
+            print(f"Errore durante l'aggiornamento dei rollup: {e}")
+
+def _totali(rows, key: str) -> list:
+    totals = {}
+    for row in rows:
+        label = getattr(row, key)
+        if label is None:
+            continue
+        entry = totals.setdefault(label, {"label": label, **{m: 0 for m in METRICHE}})
+        for m in METRICHE:
+            entry[m] += getattr(row, m)
+    return sorted(totals.values(), key=lambda entry: -entry["numero_polizze"])
+
+async def get_rollup(db: AsyncSession) -> dict:
+    """Totali per prodotto e per area di bisogno letti dalla vista materializzata."""
+    result = await db.execute(select(polizze_rollup))
+    rows = result.all()
+    return {
+        "prodotti": _totali(rows, "prodotto"),
+        "aree_di_bisogno": _totali(rows, "area_di_bisogno"),
+        "aggiornato_al": max((row.aggiornato_al for row in rows), default=None),
+    }
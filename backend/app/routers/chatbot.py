@@ -1,7 +1,15 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from pydantic import BaseModel, Field
 import os
-from app.chatbot_engine import AIQueryEngine
+import asyncio
+import orjson
+from typing import Optional
+from app.jobs import LimiteConcorrenza, CodaPienaError
+from app.readiness import Sottosistema, SottosistemaNonDisponibile
+from app.timing import misura_fasi, fase, server_timing
+from app.context_packing import misura_contesto
+from app.config import CHATBOT_MAX_CONCURRENT, CHATBOT_MAX_QUEUE, CHATBOT_QUEUE_TIMEOUT, CHATBOT_DOCS_POLL_INTERVAL
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,19 +18,158 @@ router = APIRouter()
 
 class ChatRequest(BaseModel):
     question: str
+    # conversation the question belongs to: the previous turns are sent to the model with it
+    session_id: Optional[str] = Field(None, max_length=64)
 
 class ChatResponse(BaseModel):
     answer: str
 
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
-chat_engine_instance = AIQueryEngine(openai_api_key=OPENAI_API_KEY)
+def crea_chat_engine():
+    """Legge i documenti e prepara l'indice: gira nel warm-up dopo l'avvio o alla prima domanda."""
+    # imported here: llama_index and openai are only needed once the chatbot starts
+    from app.chatbot_engine import AIQueryEngine
+    openai_api_key = os.environ.get("OPENAI_API_KEY")
+    if not openai_api_key:
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+    return AIQueryEngine(openai_api_key=openai_api_key)
+
+chat_engine = Sottosistema("chatbot", crea_chat_engine)
+
+chat_limiter = LimiteConcorrenza(
+    max_concurrent=CHATBOT_MAX_CONCURRENT,
+    max_waiting=CHATBOT_MAX_QUEUE,
+    timeout=CHATBOT_QUEUE_TIMEOUT,
+)
+
+def _coda_piena(e: CodaPienaError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+def _non_disponibile(e: SottosistemaNonDisponibile) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+async def get_chat_engine():
+    try:
+        return await chat_engine.get()
+    except SottosistemaNonDisponibile as e:
+        raise _non_disponibile(e)
 
 @router.post("/chatbot", response_model=ChatResponse)
-def query_chatbot(request: ChatRequest):
+async def query_chatbot(request: ChatRequest):
+    """
+    Risposta completa alla domanda. L'header Server-Timing riporta la durata di ogni fase
+    (queue, embedding, cache, retrieval, prompt, completion, serialization), X-Context-Tokens i
+    token del contesto inviato al modello e quelli risparmiati.
+    """
+    engine = await get_chat_engine()
+    fasi = misura_fasi()
+    contesto = misura_contesto()
     try:
-        answer = chat_engine_instance.query(request.question)
-        return ChatResponse(answer=answer)
+        with fase("queue"):
+            await chat_limiter.acquire()
+        try:
+            answer = await engine.aquery(request.question, request.session_id)
+        finally:
+            chat_limiter.release()
+    except CodaPienaError as e:
+        raise _coda_piena(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    with fase("serialization"):
+        risposta = ORJSONResponse(ChatResponse(answer=answer).model_dump())
+    risposta.headers["Server-Timing"] = server_timing(fasi)
+    # missing when the answer came from the cache
+    if contesto:
+        risposta.headers["X-Context-Tokens"] = f"{contesto['token']}; risparmiati={contesto['token_risparmiati']}; duplicati={contesto['duplicati']}"
+    return risposta
+
+def evento_sse(dati: dict, evento: Optional[str] = None) -> bytes:
+    """Un evento Server-Sent Events con payload JSON."""
+    intestazione = f"event: {evento}\n".encode() if evento else b""
+    return intestazione + b"data: " + orjson.dumps(dati) + b"\n\n"
+
+@router.post("/chatbot/stream")
+async def stream_chatbot(request: ChatRequest):
+    """
+    Come POST /chatbot, ma la risposta arriva come Server-Sent Events man mano che viene generata:
+    eventi `data: {"delta": ...}`, poi `event: fine` (con le statistiche del contesto in
+    `contesto`, se la risposta non viene dalla cache) oppure `event: errore` con `detail`.
+    """
+    try:
+        chat_limiter.verifica()
+    except CodaPienaError as e:
+        raise _coda_piena(e)
+    engine = await get_chat_engine()
+
+    async def eventi():
+        # the slot is taken inside the generator, so it is always released when the stream ends
+        contesto = misura_contesto()
+        try:
+            async with chat_limiter.slot():
+                async for delta in engine.astream(request.question, request.session_id):
+                    yield evento_sse({"delta": delta})
+            yield evento_sse({"contesto": contesto} if contesto else {}, "fine")
+        except Exception as e:
+            yield evento_sse({"detail": str(e)}, "errore")
+
+    return StreamingResponse(
+        eventi(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/chatbot/cache")
+async def chatbot_cache_stats():
+    """Statistiche della cache delle risposte (hit rate, quasi-hit sotto soglia) per regolare la soglia."""
+    return (await get_chat_engine()).answer_cache.stats()
+
+@router.delete("/chatbot/cache")
+async def svuota_chatbot_cache():
+    (await get_chat_engine()).answer_cache.clear()
+    return {"detail": "Cache delle risposte svuotata"}
+
+@router.get("/chatbot/contesto")
+async def chatbot_contesto_stats():
+    """Token medi del contesto inviato al modello e token risparmiati da deduplicazione e budget."""
+    return (await get_chat_engine()).contesto.stats()
+
+@router.get("/chatbot/condivisione")
+async def chatbot_condivisione_stats():
+    """Chiamate a OpenAI avviate e richieste identiche contemporanee che ne hanno condiviso il risultato."""
+    return (await get_chat_engine()).voli.stats()
+
+@router.get("/chatbot/sessioni")
+async def chatbot_sessioni_stats():
+    return (await get_chat_engine()).sessioni.stats()
+
+@router.delete("/chatbot/sessioni/{session_id}")
+async def elimina_sessione(session_id: str):
+    """Dimentica la conversazione: la domanda successiva con lo stesso id riparte da zero."""
+    if not (await get_chat_engine()).sessioni.elimina(session_id):
+        raise HTTPException(status_code=404, detail="Sessione non trovata")
+    return {"detail": "Sessione eliminata"}
+
+@router.post("/chatbot/reindex")
+async def reindicizza_documenti():
+    """
+    Allinea subito il chatbot ai documenti in CHATBOT_DOCS_PATH, ricalcolando solo i frammenti
+    dei file aggiunti o modificati; le domande in corso non vengono interrotte.
+    """
+    engine = await get_chat_engine()
+    try:
+        return await asyncio.to_thread(engine.sincronizza_documenti)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Errore durante la reindicizzazione: {e}")
+
+async def docs_watcher():
+    """Task in background che reindicizza i documenti del chatbot quando cambiano."""
+    while True:
+        await asyncio.sleep(CHATBOT_DOCS_POLL_INTERVAL)
+        # a chatbot that has not started yet will read the documents when it does
+        if chat_engine.stato != "pronto":
+            continue
+        engine = chat_engine.valore
+        try:
+            if await asyncio.to_thread(engine.documenti_cambiati):
+                await asyncio.to_thread(engine.sincronizza_documenti)
+        except Exception as e:
+            print(f"Errore durante la reindicizzazione dei documenti: {e}")
@@ -1,47 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models import Cliente, Polizza, ReclamoInfo, Sinistro
+from app.models import Cliente
 from app.schemas import (
     ClienteSchema, 
     ClienteDetailsSchema, 
-    PolizzaSchema, 
-    ReclamoInfoSchema, 
-    SinistroSchema,
+    ClienteSchedaSchema,
+    ClienteSuggerimentoSchema,
     ClienteUpdateSchema
 )
-from app.database import get_db
+from app.database import get_db, get_db_lettura
+from app.aggregations import invalidate_dashboard
+from app.scheda_cliente import get_scheda_cliente, invalidate_scheda
+from app.name_index import name_index, get_name_index
+from app.filters import ClienteFilters, get_cliente_filters, apply_cliente_filters, apply_keyset, encode_cursor
 
 router = APIRouter()
 
 @router.get("/clienti", response_model=list[ClienteSchema])
-async def get_clienti(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Cliente))
-    clienti = result.scalars().all()
+async def get_clienti(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Dimensione della pagina; senza limite restituisce tutti i clienti filtrati"),
+    cursor: Optional[str] = Query(None, description="Valore di X-Next-Cursor della pagina precedente"),
+    order_by: str = Query("codice_cliente", description="Colonna di ordinamento, prefisso '-' per l'ordine decrescente"),
+    filters: ClienteFilters = Depends(get_cliente_filters),
+    db: AsyncSession = Depends(get_db_lettura)
+):
+    """
+    Restituisce i clienti filtrati e ordinati lato server.
+    Con `limit` la lista è paginata per chiave (keyset): il cursore della pagina
+    successiva è nell'header X-Next-Cursor, assente sull'ultima pagina.
+    """
+    stmt = apply_cliente_filters(select(Cliente), filters)
+    passi, sort_column = apply_keyset(stmt, order_by, cursor, limit)
+    clienti = []
+    for passo in passi:
+        if limit is not None:
+            # NULLs and values are separate steps: stop as soon as the page (plus one row) is full
+            if len(clienti) > limit:
+                break
+            passo = passo.limit(limit + 1 - len(clienti))
+        result = await db.execute(passo)
+        clienti.extend(result.scalars().all())
+    if limit is not None and len(clienti) > limit:
+        clienti = clienti[:limit]
+        last = clienti[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(getattr(last, sort_column.key), last.codice_cliente)
     return clienti
 
+@router.get("/clienti/suggerimenti", response_model=list[ClienteSuggerimentoSchema])
+async def suggerisci_clienti(
+    q: str = Query(..., min_length=2, description="Nome e/o cognome, anche incompleti o con errori di battitura"),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Ricerca type-ahead sui nomi dei clienti, servita dall'indice in memoria."""
+    indice = await get_name_index()
+    return indice.cerca(q, limit=limit, prefisso=True)
+
 @router.get("/clienti/{codice_cliente}", response_model=ClienteDetailsSchema)
 async def get_cliente_details(codice_cliente: int, db: AsyncSession = Depends(get_db)):
-    result_cliente = await db.execute(select(Cliente).where(Cliente.codice_cliente == codice_cliente))
-    cliente = result_cliente.scalars().first()
-    if not cliente:
+    scheda = await get_scheda_cliente(db, codice_cliente)
+    if not scheda:
         raise HTTPException(status_code=404, detail="Cliente non trovato")
-    
-    result_polizze = await db.execute(select(Polizza).where(Polizza.codice_cliente == codice_cliente))
-    polizze = result_polizze.scalars().all()
+    return ORJSONResponse(content={
+        "cliente": scheda["cliente"],
+        "polizze": scheda["polizze"],
+        "reclami_info": scheda["reclami_info"],
+        "sinistri": scheda["sinistri"]
+    })
 
-    result_reclami = await db.execute(select(ReclamoInfo).where(ReclamoInfo.codice_cliente == codice_cliente))
-    reclami_info = result_reclami.scalars().all()
-
-    result_sinistri = await db.execute(select(Sinistro).where(Sinistro.codice_cliente == codice_cliente))
-    sinistri = result_sinistri.scalars().all()
-
-    return ClienteDetailsSchema(
-        cliente=ClienteSchema.from_orm(cliente),
-        polizze=[PolizzaSchema.from_orm(p) for p in polizze],
-        reclami_info=[ReclamoInfoSchema.from_orm(r) for r in reclami_info],
-        sinistri=[SinistroSchema.from_orm(s) for s in sinistri]
-    )
+@router.get("/clienti/{codice_cliente}/scheda", response_model=ClienteSchedaSchema)
+async def get_scheda(codice_cliente: int, db: AsyncSession = Depends(get_db)):
+    """
+    Scheda completa del cliente (anagrafica, polizze, reclami, sinistri e note)
+    in una sola richiesta, servita dalla cache finché il cliente o le sue note non cambiano.
+    """
+    scheda = await get_scheda_cliente(db, codice_cliente)
+    if not scheda:
+        raise HTTPException(status_code=404, detail="Cliente non trovato")
+    return ORJSONResponse(content=scheda)
 
 @router.patch("/clienti/{codice_cliente}", response_model=ClienteSchema)
 async def update_cliente(codice_cliente: int, update_data: ClienteUpdateSchema, db: AsyncSession = Depends(get_db)):
@@ -88,5 +127,9 @@ async def update_cliente(codice_cliente: int, update_data: ClienteUpdateSchema,
         cliente.reddito = update_data.reddito
 
     await db.commit()
+    invalidate_dashboard()
+    invalidate_scheda(codice_cliente)
+    if update_data.nome is not None or update_data.cognome is not None:
+        name_index.aggiorna(codice_cliente, cliente.nome, cliente.cognome)
     await db.refresh(cliente)
     return cliente
\ No newline at end of file
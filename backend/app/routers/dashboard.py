@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.aggregations import get_dashboard
+from app.database import get_db
+from app.filters import ClienteFilters, get_cliente_filters
+from app.schemas import DashboardSchema
+
+router = APIRouter()
+
+@router.get("/dashboard/clienti", response_model=DashboardSchema)
+async def get_dashboard_clienti(filters: ClienteFilters = Depends(get_cliente_filters), db: AsyncSession = Depends(get_db)):
+    """
+    Istogrammi della Dashboard clienti (età, professioni, reddito, propensioni,
+    prodotti e aree di bisogno) calcolati in SQL sugli stessi filtri di GET /clienti.
+    """
+    return await get_dashboard(db, filters)
@@ -0,0 +1,116 @@
+import csv
+import io
+import orjson
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Date, Float, Integer
+from sqlalchemy.future import select
+from app.database import async_session_lettura
+from app.models import Polizza, ReclamoInfo, Sinistro
+
+router = APIRouter()
+
+EXPORT_TABLES = {
+    "polizze": Polizza.__table__,
+    "reclami_info": ReclamoInfo.__table__,
+    "sinistri": Sinistro.__table__,
+}
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# rows fetched per round trip from the server-side cursor
+BATCH_SIZE = 5000
+
+async def stream_batches(table):
+    """
+    Legge la tabella con un cursore lato server, a blocchi di BATCH_SIZE righe,
+    senza costruire oggetti ORM: la memoria usata non dipende dalla dimensione della tabella.
+    """
+    async with async_session_lettura() as session:
+        result = await session.stream(
+            select(table).order_by(table.c.id).execution_options(yield_per=BATCH_SIZE)
+        )
+        async for partition in result.partitions():
+            yield partition
+
+async def export_ndjson(table):
+    keys = table.c.keys()
+    async for rows in stream_batches(table):
+        yield b"".join(orjson.dumps(dict(zip(keys, row))) + b"\n" for row in rows)
+
+async def export_csv(table):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(table.c.keys())
+    yield buffer.getvalue()
+    async for rows in stream_batches(table):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+def arrow_schema(table):
+    import pyarrow as pa
+
+    def arrow_type(sql_type):
+        if isinstance(sql_type, Integer):
+            return pa.int64()
+        if isinstance(sql_type, Float):
+            return pa.float64()
+        if isinstance(sql_type, Date):
+            return pa.date32()
+        return pa.string()
+
+    return pa.schema([(c.name, arrow_type(c.type)) for c in table.columns])
+
+async def export_arrow(table):
+    import pyarrow as pa
+
+    schema = arrow_schema(table)
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+    async for rows in stream_batches(table):
+        columns = list(zip(*rows))
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        )
+        writer.write_batch(batch)
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    writer.close()
+    yield sink.getvalue()
+
+EXPORTERS = {
+    "ndjson": export_ndjson,
+    "csv": export_csv,
+    "arrow": export_arrow,
+}
+
+@router.get("/export/{tabella}")
+async def export_tabella(tabella: str, formato: str = Query("ndjson", description="ndjson, csv oppure arrow")):
+    """
+    Esporta per intero polizze, reclami_info o sinistri in streaming:
+    il primo blocco parte appena il database restituisce le prime righe.
+    """
+    if tabella not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"Tabella non esportabile: '{tabella}'")
+    if formato not in EXPORTERS:
+        raise HTTPException(status_code=400, detail=f"Formato non supportato: '{formato}'. Valori ammessi: {', '.join(EXPORTERS)}")
+    if formato == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Esportazione Arrow non disponibile: installare pyarrow")
+
+    estensione = {"ndjson": "ndjson", "csv": "csv", "arrow": "arrows"}[formato]
+    return StreamingResponse(
+        EXPORTERS[formato](EXPORT_TABLES[tabella]),
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="{tabella}.{estensione}"'}
+    )
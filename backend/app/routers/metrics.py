@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.metrics import esporta
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """Istogrammi di richieste, fasi, query e pool del database nel formato di Prometheus."""
+    return PlainTextResponse(esporta(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -4,6 +4,7 @@ from sqlalchemy.future import select
 from app.models import Note
 from app.database import get_db
 from app.schemas import NoteSchema, NoteCreateSchema
+from app.scheda_cliente import invalidate_scheda
 
 router = APIRouter()
 
@@ -21,6 +22,7 @@ async def delete_note(id_nota: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Nota non trovata")
     await db.delete(note)
     await db.commit()
+    invalidate_scheda(note.codice_cliente)
     return {"detail": "Nota eliminata con successo"}
 
 @router.post("/clienti/{codice_cliente}/note", response_model=NoteSchema)
@@ -33,5 +35,6 @@ async def create_note(codice_cliente: int, payload: NoteCreateSchema, db: AsyncS
     )
     db.add(new_note)
     await db.commit()
+    invalidate_scheda(codice_cliente)
     await db.refresh(new_note)
     return new_note
\ No newline at end of file
@@ -2,25 +2,41 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models import Polizza, ReclamoInfo, Sinistro
-from app.schemas import PolizzaSchema, ReclamoInfoSchema, SinistroSchema
-from app.database import get_db
+from app.schemas import PolizzaSchema, ReclamoInfoSchema, SinistroSchema, PolizzeRollupSchema
+from app.database import get_db_lettura
+from app.rollups import get_rollup, refresh_rollups
 
 router = APIRouter()
 
 @router.get("/polizze", response_model=list[PolizzaSchema])
-async def get_polizze(db: AsyncSession = Depends(get_db)):
+async def get_polizze(db: AsyncSession = Depends(get_db_lettura)):
     result = await db.execute(select(Polizza))
     polizze = result.scalars().all()
     return polizze
 
+@router.get("/polizze/rollup", response_model=PolizzeRollupSchema)
+async def get_polizze_rollup(db: AsyncSession = Depends(get_db_lettura)):
+    """
+    Polizze, premi, capitale rivalutato, reclami e sinistri aggregati per prodotto
+    e per area di bisogno, letti dalla vista materializzata polizze_rollup.
+    """
+    return await get_rollup(db)
+
+@router.post("/polizze/rollup/refresh")
+async def refresh_polizze_rollup():
+    aggiornato = await refresh_rollups()
+    if not aggiornato:
+        raise HTTPException(status_code=409, detail="Aggiornamento dei rollup già in corso")
+    return {"detail": "Rollup aggiornati con successo"}
+
 @router.get("/reclami_info", response_model=list[ReclamoInfoSchema])
-async def get_reclami_info(db: AsyncSession = Depends(get_db)):
+async def get_reclami_info(db: AsyncSession = Depends(get_db_lettura)):
     result = await db.execute(select(ReclamoInfo))
     reclami = result.scalars().all()
     return reclami
 
 @router.get("/sinistri", response_model=list[SinistroSchema])
-async def get_sinistri(db: AsyncSession = Depends(get_db)):
+async def get_sinistri(db: AsyncSession = Depends(get_db_lettura)):
     result = await db.execute(select(Sinistro))
     sinistri = result.scalars().all()
     return sinistri
@@ -1,7 +1,17 @@
 from fastapi import APIRouter
+from app.readiness import readiness
 
 router = APIRouter()
 
 @router.get("/status")
 async def get_status():
-    return {"status": "ok"}
+    """
+    L'API risponde appena avviata; `sottosistemi` riporta lo stato di chatbot e riconoscimento
+    vocale (non_avviato, in_avvio, pronto, errore), inizializzati in background.
+    """
+    sottosistemi = readiness()
+    return {
+        "status": "ok",
+        "pronto": all(s["stato"] == "pronto" for s in sottosistemi.values()),
+        "sottosistemi": sottosistemi,
+    }
@@ -1,189 +1,266 @@
+import io
 import os
 import wave
+import asyncio
+import zipfile
+import tempfile
+import threading
 import subprocess
-import psycopg2
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import Iterable, Iterator, List, Optional, Tuple
+from fastapi import APIRouter, UploadFile, File, HTTPException, WebSocket
+from sqlalchemy.exc import SQLAlchemyError
 from fastapi.responses import JSONResponse
-from vosk import Model, KaldiRecognizer
-import spacy
 import json
+from app.vosk_pool import vosk_pool, SAMPLE_RATE
+from app.nlp import estrai_informazioni_chiave, estrai_informazioni_batch, get_nlp
+from app.note_vocali import NOTA_MAX_LENGTH, chiave_nome, risolvi_clienti, inserisci_note, inserisci_nota, messaggio_cliente_non_trovato
+from app.name_index import get_name_index
+from app.scheda_cliente import invalidate_scheda
+from app.jobs import JobQueue, CodaPienaError
+from app.readiness import Sottosistema, SottosistemaNonDisponibile
+from app.timing import fase, misura_fasi, osserva_fasi
+from app.config import (
+    VOICE_WORKERS, VOICE_QUEUE_SIZE, VOICE_JOB_TTL, VOICE_FFMPEG_TIMEOUT, VOICE_STREAM_IDLE_TIMEOUT, VOICE_STREAM_MAX_SECONDS,
+    VOICE_BATCH_MAX_FILES, VOICE_BATCH_MAX_MB, VOSK_WARMUP
+)
 
 router = APIRouter()
 
-def convert_m4a_to_wav(input_path: str, output_path: str):
+# 4000 frames of 16-bit mono PCM per AcceptWaveform call
+CHUNK_BYTES = 8000
+# decode anything ffmpeg understands from stdin to raw 16 kHz mono s16le on stdout
+FFMPEG_PCM = ["ffmpeg", "-loglevel", "error", "-i", "{input}", "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"]
+# bytes of ffmpeg's stderr kept for the error message
+FFMPEG_STDERR_BYTES = 4096
+# memory-backed directory for the rare inputs ffmpeg cannot read from a pipe
+RAM_TMPDIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+def pcm_da_wav_conforme(contents: bytes) -> Optional[bytes]:
     """
-    Converte un file audio da M4A a WAV a 16kHz mono utilizzando ffmpeg.
+    Se il file è un WAV PCM mono, 16 kHz, 16 bit restituisce direttamente i campioni,
+    altrimenti None e l'audio va convertito con ffmpeg.
     """
-    command = ["ffmpeg", "-y", "-i", input_path, "-ac", "1", "-ar", "16000", output_path]
-    print("Esecuzione comando ffmpeg per M4A:", " ".join(command))
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout_decoded = result.stdout.decode("utf-8")
-    stderr_decoded = result.stderr.decode("utf-8")
-    print("ffmpeg stdout:", stdout_decoded)
-    print("ffmpeg stderr:", stderr_decoded)
-    if result.returncode != 0:
-        raise ValueError(f"Errore durante la conversione con ffmpeg: {stderr_decoded}")
+    try:
+        with wave.open(io.BytesIO(contents), "rb") as wf:
+            params = wf.getparams()
+            print(f"Parametri file WAV: canali={params.nchannels}, framerate={params.framerate} Hz, sampwidth={params.sampwidth} bytes, nframes={params.nframes}")
+            if (params.nchannels, params.framerate, params.sampwidth, params.comptype) == (1, SAMPLE_RATE, 2, "NONE"):
+                return wf.readframes(params.nframes)
+    except (wave.Error, EOFError):
+        pass
+    return None
 
-def assicurati_audio_conforme(input_path: str, output_path: str) -> str:
+def moov_dopo_mdat(contents: bytes) -> bool:
     """
-    Controlla se un file audio WAV è mono e a 16kHz.
-    Se non lo è, lo converte in WAV conforme usando ffmpeg.
-    Restituisce il percorso del file conforme.
+    True per i file MP4/M4A con l'indice (atomo moov) in coda, dopo i dati audio:
+    ffmpeg non può leggerli da una pipe perché deve poter tornare indietro nel file.
     """
-    try:
-        wf = wave.open(input_path, "rb")
-        channels = wf.getnchannels()
-        framerate = wf.getframerate()
-        wf.close()
-        print(f"Verifica file WAV: canali={channels}, framerate={framerate} Hz")
-    except Exception as e:
-        raise ValueError(f"Errore nell'aprire il file audio: {e}")
-    
-    if channels == 1 and framerate == 16000:
-        return input_path
-    else:
-        command = ["ffmpeg", "-y", "-i", input_path, "-ac", "1", "-ar", "16000", output_path]
-        print("Esecuzione comando ffmpeg per rendere il WAV conforme:", " ".join(command))
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode != 0:
-            error_message = result.stderr.decode("utf-8")
-            raise ValueError(f"Errore durante la conversione con ffmpeg: {error_message}")
-        return output_path
-
-def riconosci_audio_vosk(audio_path: str, model_path: str) -> str:
-    """Riconosce il testo parlato da un file audio WAV usando Vosk."""
-    if not os.path.exists(model_path):
-        raise ValueError(f"Modello non trovato: {model_path}")
-    if not os.path.exists(audio_path):
-        raise ValueError(f"File audio non trovato: {audio_path}")
-    
-    print("Caricamento del modello Vosk...")
-    model = Model(model_path)
-    
-    try:
-        wf = wave.open(audio_path, "rb")
-    except Exception as e:
-        raise ValueError(f"Errore durante l'apertura del file WAV: {e}")
-    
-    channels = wf.getnchannels()
-    framerate = wf.getframerate()
-    sampwidth = wf.getsampwidth()
-    nframes = wf.getnframes()
-    print(f"Parametri file WAV: canali={channels}, framerate={framerate} Hz, sampwidth={sampwidth} bytes, nframes={nframes}")
-    
-    if channels != 1 or framerate != 16000:
-        raise ValueError("Il file audio deve essere mono (1 canale) e a 16 kHz.")
-    
-    recognizer = KaldiRecognizer(model, framerate)
-    testo_trascritto = ""
-    while True:
-        data = wf.readframes(4000)
-        if len(data) == 0:
+    if contents[4:8] != b"ftyp":
+        return False
+    offset = 0
+    while offset + 8 <= len(contents):
+        size = int.from_bytes(contents[offset:offset + 4], "big")
+        tipo = contents[offset + 4:offset + 8]
+        if tipo == b"moov":
+            return False
+        if tipo == b"mdat":
+            return True
+        if size == 1:
+            size = int.from_bytes(contents[offset + 8:offset + 16], "big")
+        if size < 8:
             break
-        if recognizer.AcceptWaveform(data):
-            result = recognizer.Result()
-            print(f"Risultato intermedio: {result}")
-            # Estrai il campo "text" dal JSON
-            result_json = json.loads(result)
-            testo_trascritto += result_json.get("text", "") + " "
-    final_result = recognizer.FinalResult()
-    print(f"Risultato finale: {final_result}")
-    final_result_json = json.loads(final_result)
-    testo_trascritto += final_result_json.get("text", "")
-    return testo_trascritto.strip()
+        offset += size
+    return False
 
-def estrai_informazioni_chiave(testo: str) -> dict:
+def pcm_da_ffmpeg(contents: bytes, input_path: str = "pipe:0") -> Iterator[bytes]:
     """
-    Estrae informazioni chiave (nome, cognome e nota) dal testo trascritto usando spaCy.
-    Se il testo contiene più oggetti JSON, si prende il primo.
-    Cerca il marker "nota:" o la sequenza " con nota ".
-    In assenza di marker, l'intera trascrizione viene usata come nota.
+    Converte l'audio con ffmpeg restituendo il PCM a blocchi man mano che viene decodificato.
+    I byte vengono scritti su stdin da un thread e stderr viene letto da un altro, così nessuna
+    pipe piena blocca ffmpeg; oltre VOICE_FFMPEG_TIMEOUT secondi il processo viene terminato.
     """
-    # clean up the text
-    if "},{" in testo:
-        testo = testo.split("},{")[0] + "}"
-    elif "}{" in testo:
-        testo = testo.split("}{")[0] + "}"
-    
+    command = [arg.replace("{input}", input_path) for arg in FFMPEG_PCM]
+    print("Esecuzione comando ffmpeg:", " ".join(command))
     try:
-        nlp = spacy.load("it_core_news_md")
-    except Exception as e:
-        raise ValueError("Modello spaCy 'it_core_news_md' non trovato. Assicurati di aver eseguito: python -m spacy download it_core_news_md")
-    
-    doc = nlp(testo)
-    nome = None
-    cognome = None
-    nota = None
-
-    for ent in doc.ents:
-        if ent.label_ == "PER":
-            splitted = ent.text.split()
-            if not nome and len(splitted) > 0:
-                nome = splitted[0].capitalize()
-                if len(splitted) > 1:
-                    cognome = splitted[1].capitalize()
-            else:
-                if not cognome:
-                    cognome = ent.text.capitalize()
-    
-    lower_text = testo.lower()
-    if "nota:" in lower_text:
-        start_idx = lower_text.find("nota:")
-        nota = testo[start_idx + len("nota:"):].strip()
-    elif " con nota " in lower_text:
-        start_idx = lower_text.find(" con nota ")
-        nota = testo[start_idx + len(" con nota "):].strip()
-    else:
-        nota = testo.strip()
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg non trovato: è necessario per convertire questo formato audio.")
+
+    def scrivi_input():
+        try:
+            if input_path == "pipe:0":
+                process.stdin.write(contents)
+        except BrokenPipeError:
+            pass
+        finally:
+            process.stdin.close()
+
+    stderr_finale = bytearray()
+
+    def leggi_errori():
+        # only the tail is kept: a corrupted input can make ffmpeg write megabytes of warnings
+        for riga in process.stderr:
+            stderr_finale.extend(riga)
+            del stderr_finale[:-FFMPEG_STDERR_BYTES]
+
+    scaduto = threading.Event()
 
-    return {"nome": nome, "cognome": cognome, "nota": nota}
+    def termina():
+        scaduto.set()
+        process.kill()
 
-def recupera_codice_cliente(info: dict, conn_params: dict) -> int:
+    writer = threading.Thread(target=scrivi_input, daemon=True)
+    reader = threading.Thread(target=leggi_errori, daemon=True)
+    timer = threading.Timer(VOICE_FFMPEG_TIMEOUT, termina)
+    writer.start()
+    reader.start()
+    timer.start()
+    try:
+        while True:
+            # time spent waiting for decoded audio
+            with fase("ffmpeg"):
+                chunk = process.stdout.read(CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        if process.poll() is None and writer.is_alive():
+            process.kill()
+        writer.join()
+        process.stdout.close()
+        returncode = process.wait()
+        timer.cancel()
+        reader.join()
+        process.stderr.close()
+    if scaduto.is_set():
+        raise ValueError(f"Conversione con ffmpeg interrotta dopo {VOICE_FFMPEG_TIMEOUT:g} secondi.")
+    if returncode != 0:
+        stderr_decoded = stderr_finale.decode("utf-8", errors="replace")
+        raise ValueError(f"Errore durante la conversione con ffmpeg: {stderr_decoded}")
+
+def flusso_pcm(contents: bytes, filename: str) -> Iterator[bytes]:
     """
-    Recupera il codice_cliente dalla tabella 'clienti' usando nome e cognome in maniera case-insensitive.
+    PCM 16 kHz mono s16le a blocchi di CHUNK_BYTES, senza passare dal disco:
+    i WAV già conformi vengono letti direttamente, il resto passa da ffmpeg via pipe.
     """
-    try:
-        conn = psycopg2.connect(**conn_params)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT codice_cliente FROM vitasicura_schema.clienti WHERE lower(nome) = lower(%s) AND lower(cognome) = lower(%s);",
-            (info["nome"], info["cognome"])
-        )
-        row = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        if row:
-            return row[0]
-        else:
-            raise ValueError(f"Nessun cliente trovato con nome '{info['nome']}' e cognome '{info['cognome']}'")
-    except psycopg2.Error as e:
-        raise ValueError(f"Errore durante il recupero del codice_cliente: {e}")
+    pcm = pcm_da_wav_conforme(contents)
+    if pcm is not None:
+        print("WAV già conforme, conversione non necessaria.")
+        for i in range(0, len(pcm), CHUNK_BYTES):
+            yield pcm[i:i + CHUNK_BYTES]
+        return
 
-def genera_query_note(info: dict, codice_cliente: int) -> tuple:
+    if not moov_dopo_mdat(contents):
+        yield from pcm_da_ffmpeg(contents)
+        return
+
+    print("MP4 non ottimizzato per lo streaming: conversione da file in memoria.")
+    suffix = os.path.splitext(filename)[1] or ".m4a"
+    with tempfile.NamedTemporaryFile(dir=RAM_TMPDIR, suffix=suffix) as f:
+        f.write(contents)
+        f.flush()
+        yield from pcm_da_ffmpeg(contents, input_path=f.name)
+
+def riconosci_pcm(chunks: Iterable[bytes]) -> str:
+    """
+    Riconosce il testo parlato da un flusso PCM 16 kHz mono usando Vosk.
+    Il modello (VOSK_MODEL_PATH) è condiviso dal processo e il recognizer viene preso in prestito dal pool.
     """
-    Genera una query per inserire una nuova riga nella tabella "note".
-    Ogni riga rappresenta una nota distinta per un cliente.
+    testo_trascritto = ""
+    with vosk_pool.recognizer() as recognizer:
+        for data in chunks:
+            with fase("vosk"):
+                riconosciuto = recognizer.AcceptWaveform(data)
+            if riconosciuto:
+                result = recognizer.Result()
+                print(f"Risultato intermedio: {result}")
+                # Estrai il campo "text" dal JSON
+                result_json = json.loads(result)
+                testo_trascritto += result_json.get("text", "") + " "
+        with fase("vosk"):
+            final_result = recognizer.FinalResult()
+    print(f"Risultato finale: {final_result}")
+    final_result_json = json.loads(final_result)
+    testo_trascritto += final_result_json.get("text", "")
+    return testo_trascritto.strip()
+
+def trascrivi_audio(contents: bytes, filename: str) -> str:
+    """Trascrive un file audio, interamente in memoria. Gira in un processo del pool."""
+    print(f"Ricevuto file: {filename}, dimensione: {len(contents)} bytes")
+    print("Inizio trascrizione con Vosk...")
+    return riconosci_pcm(flusso_pcm(contents, filename))
+
+def elabora_audio(contents: bytes, filename: str) -> dict:
     """
-    query = """
-    INSERT INTO vitasicura_schema.note (codice_cliente, nome, cognome, nota)
-    VALUES (%s, %s, %s, %s);
+    Trascrive ed estrae le informazioni chiave da un file audio.
+    Gira in un processo del pool: non accede al database e segnala con ValueError gli errori
+    dovuti all'audio ricevuto, con RuntimeError quelli del server (modelli, ffmpeg).
     """
-    valori = (codice_cliente, info["nome"], info["cognome"], info["nota"])
-    return query, valori
+    trascrizione = trascrivi_audio(contents, filename)
+
+    print("Trascrizione completata, inizio estrazione informazioni...")
+    informazioni = estrai_informazioni_chiave(trascrizione)
+    print("Informazioni estratte:", informazioni)
+    return {"trascrizione": trascrizione, "informazioni": informazioni}
 
-def aggiorna_database_sicuro(query: str, valori: tuple, conn_params: dict) -> bool:
-    """Esegue una query parametrizzata sul database PostgreSQL."""
+def inizializza_worker():
+    """Carica modello Vosk e pipeline spaCy una sola volta per processo del pool."""
     try:
-        conn = psycopg2.connect(**conn_params)
-        cursor = conn.cursor()
-        cursor.execute(query, valori)
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return True
-    except psycopg2.Error as e:
+        vosk_pool.load()
+    except Exception as e:
+        print(f"Modello Vosk non caricato: {e}")
+    try:
+        get_nlp()
+    except Exception as e:
+        print(f"Modello spaCy non caricato: {e}")
+
+async def salva_nota(informazioni: dict) -> int:
+    """Inserisce la nota per il cliente indicato; RuntimeError se il database non risponde."""
+    try:
+        codice_cliente = await inserisci_nota(informazioni)
+    except SQLAlchemyError as e:
         print(f"Errore durante l'aggiornamento del database: {e}")
-        return False
+        raise RuntimeError("Errore durante l'aggiornamento del database.")
+    print(f"Nota salvata per il cliente {codice_cliente}")
+    invalidate_scheda(codice_cliente)
+    return codice_cliente
+
+voice_jobs = JobQueue(
+    max_workers=VOICE_WORKERS,
+    max_pending=VOICE_QUEUE_SIZE,
+    ttl=VOICE_JOB_TTL,
+    initializer=inizializza_worker,
+)
+
+def verifica_worker():
+    """Eseguita in un processo del pool: errore se i modelli non sono stati caricati."""
+    vosk_pool.ensure_model()
+    get_nlp()
+
+async def avvia_voice_workers():
+    # one call per worker, so that every process of the pool is spawned and loads its models
+    await asyncio.gather(*(voice_jobs.run_in_pool(verifica_worker) for _ in range(voice_jobs.max_workers)))
+
+# Vosk model of the server process (live transcription) and the process pool of the uploads
+vosk_stream = Sottosistema("vosk", lambda: vosk_pool.ensure_model(warmup=VOSK_WARMUP))
+voice_workers = Sottosistema("voice_workers", avvia_voice_workers)
+
+async def elabora_nota_vocale(contents: bytes, filename: str) -> dict:
+    """Trascrizione nel pool di processi, poi salvataggio della nota."""
+    elaborazione = await voice_jobs.run_in_pool(elabora_audio, contents, filename)
+    await salva_nota(elaborazione["informazioni"])
+    return {**elaborazione, "database_aggiornato": True}
+
+def _coda_piena(e: CodaPienaError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+def _errore_elaborazione(e: Exception) -> HTTPException:
+    # only problems with the audio or its content are the client's fault
+    if isinstance(e, CodaPienaError):
+        return _coda_piena(e)
+    if isinstance(e, ValueError):
+        return HTTPException(status_code=400, detail=str(e))
+    print(f"Errore durante l'elaborazione della nota vocale: {e!r}")
+    return HTTPException(status_code=500, detail=str(e) or type(e).__name__)
 
 @router.post("/assistente-vocale")
 async def assistente_vocale(file: UploadFile = File(...)):
@@ -193,81 +270,269 @@ async def assistente_vocale(file: UploadFile = File(...)):
     e inserisce una nuova riga nella tabella "note".
     Restituisce trascrizione, informazioni estratte e lo stato dell'aggiornamento.
     """
-    print(f"Ricevuto file: {file.filename}")
     contents = await file.read()
-    print(f"Dimensione file: {len(contents)} bytes")
-    
-    temp_file_path = f"temp_{file.filename}"
-    with open(temp_file_path, "wb") as f:
-        f.write(contents)
-    
-    # Se il file è in formato M4A, convertilo in WAV
-    if file.filename.lower().endswith(".m4a"):
-        wav_file_path = f"temp_{os.path.splitext(file.filename)[0]}.wav"
+    try:
+        risultato = await voice_jobs.run(lambda: elabora_nota_vocale(contents, file.filename))
+    except Exception as e:
+        raise _errore_elaborazione(e)
+    return JSONResponse(content=risultato)
+
+def espandi_archivi(caricati: List[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+    """
+    Sostituisce gli archivi .zip con i file audio che contengono e applica i limiti
+    VOICE_BATCH_MAX_FILES e VOICE_BATCH_MAX_MB (controllati prima di decomprimere).
+    """
+    max_bytes = VOICE_BATCH_MAX_MB * 1024 * 1024
+    totale = 0
+    audio = []
+    for nome, contents in caricati:
+        if not nome.lower().endswith(".zip"):
+            totale += len(contents)
+            audio.append((nome, contents))
+            continue
         try:
-            print("Avvio conversione M4A -> WAV...")
-            convert_m4a_to_wav(temp_file_path, wav_file_path)
-            print("Conversione M4A -> WAV completata.")
-        except Exception as e:
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-            raise HTTPException(status_code=400, detail=str(e))
-        os.remove(temp_file_path)
-        audio_path = wav_file_path
-    else:
-        audio_path = temp_file_path
+            archivio = zipfile.ZipFile(io.BytesIO(contents))
+        except zipfile.BadZipFile:
+            raise ValueError(f"Archivio zip non valido: {nome}")
+        with archivio:
+            for info in archivio.infolist():
+                base = os.path.basename(info.filename)
+                if info.is_dir() or not base or base.startswith(".") or info.filename.startswith("__MACOSX/"):
+                    continue
+                totale += info.file_size
+                if totale > max_bytes:
+                    break
+                audio.append((f"{nome}/{info.filename}", archivio.read(info)))
+        if totale > max_bytes:
+            break
+    if totale > max_bytes:
+        raise ValueError(f"Dimensione complessiva oltre il limite di {VOICE_BATCH_MAX_MB} MB.")
+    if not audio:
+        raise ValueError("Nessun file audio ricevuto.")
+    if len(audio) > VOICE_BATCH_MAX_FILES:
+        raise ValueError(f"Troppi file ({len(audio)}): il limite per richiesta è {VOICE_BATCH_MAX_FILES}.")
+    return audio
+
+async def elabora_batch(audio: List[Tuple[str, bytes]], parallele: int) -> dict:
+    """
+    Trascrive i file nel pool di processi, al più `parallele` alla volta (i posti riservati nella
+    coda), estrae le informazioni con nlp.pipe, abbina i clienti con l'indice dei nomi (una sola
+    query per quelli non trovati) e inserisce tutte le note in un'unica transazione.
+    Restituisce l'esito di ogni file.
+    """
+    posti = asyncio.Semaphore(parallele)
+
+    async def trascrivi(nome: str, contents: bytes) -> str:
+        async with posti:
+            return await voice_jobs.run_in_pool(trascrivi_audio, contents, nome)
+
+    esiti = await asyncio.gather(*(trascrivi(nome, contents) for nome, contents in audio), return_exceptions=True)
+    report = [{"file": nome, "stato": "errore"} for nome, _ in audio]
+    trascritti = []
+    for voce, esito in zip(report, esiti):
+        if isinstance(esito, Exception):
+            voce["errore"] = str(esito) or type(esito).__name__
+        elif not esito:
+            voce.update(trascrizione=esito, errore="Nessun parlato riconosciuto.")
+        else:
+            voce["trascrizione"] = esito
+            trascritti.append(voce)
+
+    if trascritti:
+        informazioni = await voice_jobs.run_in_pool(estrai_informazioni_batch, [v["trascrizione"] for v in trascritti])
+        for voce, info in zip(trascritti, informazioni):
+            voce["informazioni"] = info
+        indice = await get_name_index()
+        abbinati = [indice.abbina(info["nome"], info["cognome"]) for info in informazioni]
+        # customers the index does not know yet: one exact lookup for all of them
+        codici = await risolvi_clienti(
+            chiave_nome(info["nome"], info["cognome"])
+            for info, codice_cliente in zip(informazioni, abbinati)
+            if codice_cliente is None and info["nome"] and info["cognome"]
+        )
+
+        da_salvare = []
+        for voce, codice_cliente in zip(trascritti, abbinati):
+            info = voce["informazioni"]
+            if codice_cliente is not None:
+                nome, cognome = indice.cliente(codice_cliente)
+                info.update(nome=nome, cognome=cognome)
+            elif info["nome"] and info["cognome"]:
+                codice_cliente = codici.get(chiave_nome(info["nome"], info["cognome"]))
+            if codice_cliente is None:
+                voce["errore"] = messaggio_cliente_non_trovato(indice, info["nome"], info["cognome"])
+            elif len(info["nota"]) > NOTA_MAX_LENGTH:
+                voce["errore"] = f"Nota troppo lunga ({len(info['nota'])} caratteri, massimo {NOTA_MAX_LENGTH})."
+            else:
+                voce["codice_cliente"] = codice_cliente
+                da_salvare.append(voce)
+
+        if da_salvare:
+            try:
+                await inserisci_note([
+                    {"codice_cliente": v["codice_cliente"], **v["informazioni"]} for v in da_salvare
+                ])
+            except SQLAlchemyError as e:
+                print(f"Errore durante l'inserimento delle note: {e}")
+                for voce in da_salvare:
+                    voce["errore"] = "Errore durante l'aggiornamento del database."
+            else:
+                for voce in da_salvare:
+                    voce["stato"] = "salvata"
+                for codice_cliente in {v["codice_cliente"] for v in da_salvare}:
+                    invalidate_scheda(codice_cliente)
 
-    # Check if the audio is compliant
+    salvate = sum(1 for voce in report if voce["stato"] == "salvata")
+    return {"totale": len(report), "salvate": salvate, "errori": len(report) - salvate, "file": report}
+
+@router.post("/assistente-vocale/batch")
+async def assistente_vocale_batch(files: List[UploadFile] = File(...)):
+    """
+    Elabora in un'unica richiesta più note vocali, caricate come file separati e/o archivi zip.
+    Gli errori sui singoli file non interrompono gli altri e sono riportati nell'esito.
+    """
+    caricati = [(file.filename or "audio", await file.read()) for file in files]
     try:
-        fixed_wav_path = f"fixed_{os.path.basename(audio_path)}"
-        audio_path = assicurati_audio_conforme(audio_path, fixed_wav_path)
-        print(f"Audio conforme: {audio_path}")
-    except Exception as e:
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
+        audio = await asyncio.to_thread(espandi_archivi, caricati)
+    except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    
+    # one queue slot per file transcribed at the same time; a batch larger than the queue takes all of it
+    posti = min(len(audio), voice_jobs.max_pending)
     try:
-        print("Inizio trascrizione con Vosk...")
-        VOSK_MODEL_PATH = os.environ.get("VOSK_MODEL_PATH")
-        trascrizione = riconosci_audio_vosk(audio_path, VOSK_MODEL_PATH)
+        return await voice_jobs.run(lambda: elabora_batch(audio, posti), posti=posti)
     except Exception as e:
-        print("Errore durante la trascrizione:", e)
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-    
-    print("Trascrizione completata, inizio estrazione informazioni...")
-    informazioni = estrai_informazioni_chiave(trascrizione)
-    print("Informazioni estratte:", informazioni)
-    
-    conn_params = {
-        "host": os.environ.get("DB_HOST"),
-        "database": os.environ.get("DB_NAME"),
-        "user": os.environ.get("DB_USER"),
-        "password": os.environ.get("DB_PASSWORD")
-    }
-    
+        raise _errore_elaborazione(e)
+
+@router.post("/assistente-vocale/jobs", status_code=202)
+async def invia_nota_vocale(file: UploadFile = File(...)):
+    """
+    Accoda l'elaborazione di una nota vocale e restituisce subito l'identificativo del job,
+    da interrogare con GET /assistente-vocale/jobs/{job_id}.
+    """
+    contents = await file.read()
     try:
-        codice_cliente = recupera_codice_cliente(informazioni, conn_params)
-        print(f"Codice cliente recuperato: {codice_cliente}")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    
-    query, valori = genera_query_note(informazioni, codice_cliente)
-    print("Query generata:", query)
-    print("Valori:", valori)
-    aggiornato = aggiorna_database_sicuro(query, valori, conn_params)
-    print("Stato aggiornamento database:", aggiornato)
-    
-    if not aggiornato:
-        raise HTTPException(status_code=500, detail="Errore durante l'aggiornamento del database.")
-    
-    return JSONResponse(content={
-        "trascrizione": trascrizione,
-        "informazioni": informazioni,
-        "database_aggiornato": aggiornato
-    })
+        job = voice_jobs.submit(lambda: elabora_nota_vocale(contents, file.filename))
+    except CodaPienaError as e:
+        raise _coda_piena(e)
+    return job.to_dict()
+
+@router.get("/assistente-vocale/jobs/{job_id}")
+async def stato_nota_vocale(job_id: str):
+    job = voice_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job non trovato")
+    return job.to_dict()
+
+@router.get("/assistente-vocale/jobs/{job_id}/risultato")
+async def risultato_nota_vocale(job_id: str):
+    job = voice_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job non trovato")
+    if job.stato == "errore":
+        raise HTTPException(status_code=400 if issubclass(job.tipo_errore, ValueError) else 500, detail=job.errore)
+    if job.stato != "completato":
+        raise HTTPException(status_code=409, detail="Elaborazione non ancora completata")
+    return job.risultato
+
+# end of recording sent by the client as a text frame
+FINE_STREAM = "fine"
+
+async def _invia(websocket: WebSocket, messaggio: dict) -> bool:
+    """Invia un messaggio JSON; False se il client si è già disconnesso."""
+    try:
+        await websocket.send_json(messaggio)
+        return True
+    except Exception:
+        return False
+
+@router.websocket("/assistente-vocale/stream")
+async def assistente_vocale_stream(websocket: WebSocket):
+    """
+    Trascrizione in tempo reale: il client invia frame binari PCM 16 bit, mono, 16 kHz
+    mentre registra e riceve i risultati parziali (PartialResult) e i segmenti riconosciuti
+    (Result). Alla chiusura dello stream (messaggio "fine" o disconnessione) vengono estratte
+    le informazioni chiave e salvata la nota.
+    """
+    await websocket.accept()
+    # the stream is not an HTTP request: its stages are recorded here when it ends
+    fasi = misura_fasi()
+    try:
+        await vosk_stream.get()
+        recognizer, generazione = await asyncio.to_thread(vosk_pool.acquire)
+    except (RuntimeError, CodaPienaError, SottosistemaNonDisponibile) as e:
+        await _invia(websocket, {"tipo": "errore", "dettaglio": str(e)})
+        await websocket.close(code=1013)
+        return
+
+    segmenti = []
+    ultimo_parziale = ""
+    byte_massimi = VOICE_STREAM_MAX_SECONDS * SAMPLE_RATE * 2
+    byte_ricevuti = 0
+    connesso = True
+    try:
+        while True:
+            try:
+                messaggio = await asyncio.wait_for(websocket.receive(), timeout=VOICE_STREAM_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                break
+            if messaggio["type"] == "websocket.disconnect":
+                connesso = False
+                break
+            if messaggio.get("text") is not None:
+                if messaggio["text"].strip().lower() == FINE_STREAM:
+                    break
+                continue
+            data = messaggio.get("bytes")
+            if not data:
+                continue
+            byte_ricevuti += len(data)
+            # decoding releases the GIL: a thread keeps the event loop responsive
+            with fase("vosk"):
+                riconosciuto = await asyncio.to_thread(recognizer.AcceptWaveform, data)
+            if riconosciuto:
+                testo = json.loads(recognizer.Result()).get("text", "")
+                ultimo_parziale = ""
+                if testo:
+                    segmenti.append(testo)
+                    connesso = await _invia(websocket, {"tipo": "risultato", "testo": testo})
+            else:
+                parziale = json.loads(recognizer.PartialResult()).get("partial", "")
+                if parziale != ultimo_parziale:
+                    ultimo_parziale = parziale
+                    connesso = await _invia(websocket, {"tipo": "parziale", "testo": parziale})
+            if not connesso or byte_ricevuti >= byte_massimi:
+                break
+        with fase("vosk"):
+            finale = json.loads(await asyncio.to_thread(recognizer.FinalResult)).get("text", "")
+        if finale:
+            segmenti.append(finale)
+    finally:
+        vosk_pool.release(recognizer, generazione)
+
+    trascrizione = " ".join(segmenti).strip()
+    print(f"Trascrizione in streaming completata: {trascrizione}")
+    risposta = {"tipo": "finale", "trascrizione": trascrizione}
+    # 1013 (try again later) when the voice queue is full
+    codice_chiusura = 1000
+    if not trascrizione:
+        risposta.update({"tipo": "errore", "dettaglio": "Nessun parlato riconosciuto."})
+    else:
+        try:
+            # the extraction runs in the pool like an upload, and counts against the same queue
+            informazioni = await voice_jobs.run(lambda: voice_jobs.run_in_pool(estrai_informazioni_chiave, trascrizione))
+            risposta["informazioni"] = informazioni
+            await salva_nota(informazioni)
+            risposta["database_aggiornato"] = True
+        except CodaPienaError as e:
+            risposta.update({"tipo": "errore", "dettaglio": str(e), "database_aggiornato": False})
+            codice_chiusura = 1013
+        except (ValueError, RuntimeError) as e:
+            risposta.update({"tipo": "errore", "dettaglio": str(e), "database_aggiornato": False})
+
+    osserva_fasi(fasi)
+    if connesso:
+        await _invia(websocket, risposta)
+        try:
+            await websocket.close(code=codice_chiusura)
+        except Exception:
+            pass
@@ -0,0 +1,61 @@
+import orjson
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import LRUCache
+from app.config import SCHEDA_CACHE_SIZE
+from app.schemas import ClienteSchedaSchema
+
+# the whole customer card in one statement: each related table is folded into a JSON array
+SCHEDA_CLIENTE_SQL = text("""
+    SELECT
+        row_to_json(c) AS cliente,
+        (SELECT coalesce(json_agg(p ORDER BY p.id), '[]'::json)
+           FROM vitasicura_schema.polizze p WHERE p.codice_cliente = c.codice_cliente) AS polizze,
+        (SELECT coalesce(json_agg(r ORDER BY r.id), '[]'::json)
+           FROM vitasicura_schema.reclami_info r WHERE r.codice_cliente = c.codice_cliente) AS reclami_info,
+        (SELECT coalesce(json_agg(s ORDER BY s.id), '[]'::json)
+           FROM vitasicura_schema.sinistri s WHERE s.codice_cliente = c.codice_cliente) AS sinistri,
+        (SELECT coalesce(json_agg(n ORDER BY n.id_nota), '[]'::json)
+           FROM vitasicura_schema.note n WHERE n.codice_cliente = c.codice_cliente) AS note
+    FROM vitasicura_schema.clienti c
+    WHERE c.codice_cliente = :codice_cliente
+""")
+
+scheda_cache = LRUCache(maxsize=SCHEDA_CACHE_SIZE)
+# bumped on every invalidation, so a read that started before a write cannot repopulate the cache;
+# one counter for all customers: a write elsewhere only skips caching the reads in flight
+_generazione = 0
+
+def invalidate_scheda(codice_cliente: int):
+    """Da chiamare dopo ogni scrittura su un cliente o sulle sue note."""
+    global _generazione
+    _generazione += 1
+    scheda_cache.invalidate(codice_cliente)
+
+def _decode(value):
+    # asyncpg returns json columns as text
+    return orjson.loads(value) if isinstance(value, (str, bytes)) else value
+
+async def get_scheda_cliente(db: AsyncSession, codice_cliente: int) -> Optional[dict]:
+    """
+    Restituisce cliente, polizze, reclami_info, sinistri e note del cliente,
+    dalla cache se presente. None se il cliente non esiste.
+    La scheda è già validata e serializzata da ClienteSchedaSchema, una volta sola prima di
+    entrare in cache: gli endpoint la restituiscono così com'è.
+    """
+    cached = scheda_cache.get(codice_cliente)
+    if cached is not None:
+        return cached
+
+    generazione = _generazione
+    result = await db.execute(SCHEDA_CLIENTE_SQL, {"codice_cliente": codice_cliente})
+    row = result.mappings().first()
+    if row is None:
+        return None
+    scheda = {key: _decode(value) for key, value in row.items()}
+    # same fields, types and exclusions as the response_model, without paying for it on every hit
+    scheda = ClienteSchedaSchema.model_validate(scheda).model_dump(mode="json")
+    if _generazione == generazione:
+        scheda_cache.set(codice_cliente, scheda)
+    return scheda
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import date
+from datetime import date, datetime
 
 class ClienteSchema(BaseModel):
     codice_cliente: int
@@ -82,9 +82,9 @@ class ClienteDetailsSchema(BaseModel):
 class NoteSchema(BaseModel):
     id_nota: int
     codice_cliente: int
-    nome: str
-    cognome: str
-    nota: str
+    nome: Optional[str] = None
+    cognome: Optional[str] = None
+    nota: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -107,4 +107,43 @@ class ClienteUpdateSchema(BaseModel):
 
     class Config:
         orm_mode = True
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+class BucketSchema(BaseModel):
+    label: str
+    count: int
+
+class DashboardSchema(BaseModel):
+    totale_clienti: int
+    eta: List[BucketSchema]
+    professioni: List[BucketSchema]
+    reddito: List[BucketSchema]
+    propensione_vita: List[BucketSchema]
+    propensione_danni: List[BucketSchema]
+    prodotti: List[BucketSchema]
+    aree_di_bisogno: List[BucketSchema]
+    eta_min: Optional[int] = None
+    eta_max: Optional[int] = None
+    professioni_disponibili: List[str] = []
+
+class RollupSchema(BaseModel):
+    label: str
+    numero_polizze: int
+    premio_ricorrente: float
+    premio_unico: float
+    capitale_rivalutato: float
+    numero_reclami_info: int
+    numero_sinistri: int
+
+class PolizzeRollupSchema(BaseModel):
+    prodotti: List[RollupSchema]
+    aree_di_bisogno: List[RollupSchema]
+    aggiornato_al: Optional[datetime] = None
+
+class ClienteSchedaSchema(ClienteDetailsSchema):
+    note: List[NoteSchema]
+
+class ClienteSuggerimentoSchema(BaseModel):
+    codice_cliente: int
+    nome: Optional[str] = None
+    cognome: Optional[str] = None
+    punteggio: float
@@ -0,0 +1,116 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+from app.timing import fase
+
+class Trasmissione:
+    """Frammenti di una risposta in streaming, letti da tutte le richieste che la condividono."""
+
+    def __init__(self):
+        self.parti: List[str] = []
+        self.finita = False
+        self.errore: Optional[BaseException] = None
+        self._cambiata = asyncio.Event()
+
+    def _segnala(self):
+        # a fresh event per change: readers wait on the one current when they caught up
+        self._cambiata.set()
+        self._cambiata = asyncio.Event()
+
+    def aggiungi(self, parte: str):
+        self.parti.append(parte)
+        self._segnala()
+
+    def chiudi(self, errore: Optional[BaseException] = None):
+        self.finita = True
+        self.errore = errore
+        self._segnala()
+
+    async def leggi(self) -> AsyncIterator[str]:
+        """Tutti i frammenti dall'inizio, poi quelli nuovi man mano che arrivano."""
+        i = 0
+        while True:
+            while i < len(self.parti):
+                yield self.parti[i]
+                i += 1
+            if self.finita:
+                if self.errore is not None:
+                    raise self.errore
+                return
+            await self._cambiata.wait()
+
+class SingleFlight:
+    """
+    Richieste identiche contemporanee condividono una sola chiamata: la prima avvia il lavoro,
+    le altre con la stessa chiave ne attendono il risultato (o l'errore). La chiamata gira in un
+    task separato, quindi un client che si disconnette non la interrompe per gli altri, e dura al
+    massimo `timeout` secondi. A chiamata conclusa la chiave si libera: nessun risultato viene
+    conservato, quello è compito della cache.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._voli: Dict[Hashable, asyncio.Task] = {}
+        self._trasmissioni: Dict[Hashable, Trasmissione] = {}
+        self.chiamate = 0
+        self.condivise = 0
+
+    def _libera(self, chiave: Hashable):
+        def callback(task: asyncio.Task):
+            self._voli.pop(chiave, None)
+            # retrieved here as well, in case every waiter went away before the call ended
+            if not task.cancelled():
+                task.exception()
+        return callback
+
+    async def esegui(self, chiave: Hashable, crea: Callable[[], Awaitable], timeout: Optional[float] = None):
+        """Risultato di `crea()`, chiamata una sola volta per tutte le richieste con la stessa chiave."""
+        task = self._voli.get(chiave)
+        if task is None:
+            self.chiamate += 1
+            task = asyncio.create_task(asyncio.wait_for(crea(), timeout or self.timeout))
+            self._voli[chiave] = task
+            task.add_done_callback(self._libera(chiave))
+            # shield: cancelling one waiter must not cancel the call shared with the others
+            return await asyncio.shield(task)
+        self.condivise += 1
+        with fase("coalesced"):
+            return await asyncio.shield(task)
+
+    async def trasmetti(self, chiave: Hashable, crea: Callable[[], AsyncIterator[str]], timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Come esegui, per un flusso di frammenti: chi arriva dopo riceve anche quelli già prodotti."""
+        trasmissione = self._trasmissioni.get(chiave)
+        if trasmissione is None:
+            self.chiamate += 1
+            trasmissione = self._trasmissioni[chiave] = Trasmissione()
+
+            async def produci():
+                async for parte in crea():
+                    trasmissione.aggiungi(parte)
+
+            async def esegui():
+                try:
+                    await asyncio.wait_for(produci(), timeout or self.timeout)
+                    trasmissione.chiudi()
+                except asyncio.CancelledError:
+                    trasmissione.chiudi(RuntimeError("Risposta interrotta"))
+                    raise
+                except Exception as e:
+                    trasmissione.chiudi(e)
+                finally:
+                    self._trasmissioni.pop(chiave, None)
+
+            self._voli[("trasmissione", chiave)] = task = asyncio.create_task(esegui())
+            task.add_done_callback(self._libera(("trasmissione", chiave)))
+        else:
+            self.condivise += 1
+        async for parte in trasmissione.leggi():
+            yield parte
+
+    def stats(self) -> dict:
+        totale = self.chiamate + self.condivise
+        return {
+            "in_corso": len(self._voli),
+            "chiamate": self.chiamate,
+            "condivise": self.condivise,
+            "quota_condivisa": self.condivise / totale if totale else 0.0,
+        }
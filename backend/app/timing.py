@@ -0,0 +1,85 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+from app.metrics import fasi_richiesta, richieste_http
+
+_fasi: ContextVar[Optional[Dict[str, float]]] = ContextVar("fasi", default=None)
+
+def misura_fasi() -> Dict[str, float]:
+    """Inizia a raccogliere la durata (secondi) delle fasi della richiesta corrente."""
+    fasi = {}
+    _fasi.set(fasi)
+    return fasi
+
+def aggiungi_fasi(durate: Dict[str, float]):
+    """Somma alle fasi della richiesta corrente quelle misurate altrove (un processo del pool)."""
+    fasi = _fasi.get()
+    if fasi is not None:
+        for nome, durata in durate.items():
+            fasi[nome] = fasi.get(nome, 0.0) + durata
+
+def osserva_fasi(fasi: Dict[str, float]):
+    """Registra nell'istogramma delle metriche il tempo di ogni fase di una richiesta conclusa."""
+    for nome, durata in fasi.items():
+        fasi_richiesta.osserva(durata, stage=nome)
+
+@contextmanager
+def fase(nome: str):
+    """Somma la durata del blocco alla fase `nome` della richiesta corrente, se è misurata."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        fasi = _fasi.get()
+        if fasi is not None:
+            fasi[nome] = fasi.get(nome, 0.0) + time.perf_counter() - start
+
+def esegui_con_fasi(fn: Callable, *args):
+    """Esegue fn(*args) in un processo del pool e restituisce (risultato, fasi misurate)."""
+    fasi = misura_fasi()
+    return fn(*args), fasi
+
+def server_timing(fasi: Dict[str, float]) -> str:
+    """Valore dell'header Server-Timing, con le durate in millisecondi."""
+    return ", ".join(f"{nome};dur={durata * 1000:.2f}" for nome, durata in fasi.items())
+
+class MetricheMiddleware:
+    """
+    Middleware ASGI che misura ogni richiesta HTTP fino all'ultimo byte della risposta (anche in
+    streaming) e ne registra la durata per metodo, route e stato, insieme alle fasi raccolte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        fasi = {}
+        token = _fasi.set(fasi)
+        stato = 500
+
+        async def send_misurato(messaggio):
+            nonlocal stato
+            if messaggio["type"] == "http.response.start":
+                stato = messaggio["status"]
+            await send(messaggio)
+
+        try:
+            await self.app(scope, receive, send_misurato)
+        finally:
+            route = scope.get("route")
+            # the route template, not the path: /clienti/{codice_cliente} is one series
+            richieste_http.osserva(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "non_trovata"),
+                status=stato,
+            )
+            osserva_fasi(fasi)
+            # a route that measures its own stages (Server-Timing) replaces the collection
+            if _fasi.get() is not fasi:
+                osserva_fasi(_fasi.get())
+            _fasi.reset(token)
@@ -0,0 +1,37 @@
+import threading
+
+# rough tokens per character of Italian text for cl100k_base, used when tiktoken is not available
+CARATTERI_PER_TOKEN = 3.5
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    # not installed or the encoding file cannot be downloaded: estimate from length
+                    _encoding = False
+    return _encoding
+
+def conta_token(testo: str) -> int:
+    """Token del testo per i modelli OpenAI in uso (cl100k_base con tiktoken, altrimenti una stima)."""
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(testo, disallowed_special=()))
+    return int(len(testo) / CARATTERI_PER_TOKEN) + 1
+
+def tronca(testo: str, max_token: int) -> str:
+    """I primi `max_token` token del testo."""
+    if max_token <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding:
+        token = encoding.encode(testo, disallowed_special=())
+        return testo if len(token) <= max_token else encoding.decode(token[:max_token])
+    return testo[:int(max_token * CARATTERI_PER_TOKEN)]
@@ -0,0 +1,239 @@
+import fcntl
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app import bm25
+
+TABELLA = "frammenti.sqlite"
+
+class VectorStore:
+    """
+    Archivio su disco degli embedding dei frammenti dei documenti del chatbot.
+
+    I vettori (normalizzati) stanno in una matrice float32 grezza aperta con np.memmap, quindi
+    il caricamento non legge i vettori e la memoria occupata è quella delle pagine toccate.
+    Una tabella SQLite contiene per ogni riga della matrice file, posizione, hash e testo del
+    frammento, più l'hash di ogni documento per capire cosa è cambiato dall'ultimo avvio.
+    Accanto ai vettori c'è un indice BM25 dei testi (posting in due array .npy, anch'essi mappati
+    in memoria, e tabella dei termini), per la ricerca per parole chiave e quella ibrida.
+    Ogni riscrittura crea nuovi file e sostituisce la tabella con os.replace, così chi
+    legge vede sempre una versione completa.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.matrice: Optional[np.ndarray] = None
+        # (righe, pesi) of the BM25 postings, None for stores written before the text index existed
+        self.bm25: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.modello = None
+        self.versione = None
+        self._conn = None
+        # connection -> cerca() calls still using it; a replaced connection is closed by the last one
+        self._lettori: Dict[sqlite3.Connection, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def righe(self) -> int:
+        return 0 if self.matrice is None else self.matrice.shape[0]
+
+    def carica(self) -> bool:
+        """Apre l'archivio esistente; False se manca o è incompleto."""
+        percorso = os.path.join(self.directory, TABELLA)
+        if not os.path.exists(percorso):
+            return False
+        conn = sqlite3.connect(percorso, check_same_thread=False)
+        meta = dict(conn.execute("SELECT chiave, valore FROM meta"))
+        righe, dim = int(meta["righe"]), int(meta["dim"])
+        matrice = None
+        if righe:
+            file_matrice = os.path.join(self.directory, meta["matrice"])
+            if not os.path.exists(file_matrice) or os.path.getsize(file_matrice) != righe * dim * 4:
+                conn.close()
+                return False
+            matrice = np.memmap(file_matrice, dtype=np.float32, mode="r", shape=(righe, dim))
+        indice_bm25 = None
+        if "bm25" in meta:
+            prefisso = os.path.join(self.directory, meta["bm25"])
+            if os.path.exists(f"{prefisso}-righe.npy") and os.path.exists(f"{prefisso}-pesi.npy"):
+                indice_bm25 = (np.load(f"{prefisso}-righe.npy", mmap_mode="r"), np.load(f"{prefisso}-pesi.npy", mmap_mode="r"))
+        with self._lock:
+            precedente = self._conn
+            self._conn, self.matrice, self.bm25 = conn, matrice, indice_bm25
+            self.modello, self.versione = meta["modello"], meta["versione"]
+            # a concurrent cerca() still reading from the previous connection closes it when done
+            if precedente is not None and precedente not in self._lettori:
+                precedente.close()
+        return True
+
+    @contextmanager
+    def _lettura(self):
+        """(matrice, connessione, indice BM25) attuali; la connessione resta aperta fino alla fine del blocco."""
+        with self._lock:
+            conn = self._conn
+            if conn is not None:
+                self._lettori[conn] = self._lettori.get(conn, 0) + 1
+            stato = (self.matrice, conn, self.bm25)
+        try:
+            yield stato
+        finally:
+            if conn is not None:
+                with self._lock:
+                    self._lettori[conn] -= 1
+                    if not self._lettori[conn]:
+                        del self._lettori[conn]
+                        if conn is not self._conn:
+                            conn.close()
+
+    @contextmanager
+    def blocco(self):
+        """Lock esclusivo sulla directory, condiviso tra i processi che usano lo stesso archivio."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def documenti(self) -> Dict[str, Tuple[str, str]]:
+        """file -> (firma, hash) dei documenti indicizzati."""
+        if self._conn is None:
+            return {}
+        with self._lock:
+            return {file: (firma, hash_) for file, firma, hash_ in self._conn.execute("SELECT file, firma, hash FROM documenti")}
+
+    def frammenti(self, files: Iterable[str]) -> List[Tuple[str, int, str, str]]:
+        """(file, posizione, hash, testo) dei frammenti già indicizzati dei file indicati."""
+        files = list(files)
+        if self._conn is None or not files:
+            return []
+        segnaposto = ",".join("?" * len(files))
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT file, posizione, hash, testo FROM frammenti WHERE file IN ({segnaposto}) ORDER BY riga", files
+            ).fetchall()
+
+    def righe_per_hash(self) -> Dict[str, int]:
+        if self._conn is None:
+            return {}
+        with self._lock:
+            return dict(self._conn.execute("SELECT hash, min(riga) FROM frammenti GROUP BY hash"))
+
+    def scrivi(self, modello: str, versione: str, documenti: Dict[str, Tuple[str, str]],
+               frammenti: List[Tuple[str, int, str, str]], nuovi_vettori: Dict[str, list]):
+        """
+        Riscrive l'archivio con `frammenti` (file, posizione, hash, testo). Il vettore di ogni
+        frammento viene da `nuovi_vettori` (hash -> embedding) o, se manca, dalla riga con lo
+        stesso hash dell'archivio attuale.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        esistenti = self.righe_per_hash() if modello == self.modello else {}
+        dim = len(next(iter(nuovi_vettori.values()))) if nuovi_vettori else (self.matrice.shape[1] if self.matrice is not None else 0)
+
+        generazione = uuid.uuid4().hex
+        nome_matrice = f"vettori-{generazione}.f32"
+        nome_bm25 = f"bm25-{generazione}"
+        vocabolario, posting_righe, posting_pesi = bm25.costruisci([testo for _, _, _, testo in frammenti])
+        np.save(os.path.join(self.directory, f"{nome_bm25}-righe.npy"), posting_righe)
+        np.save(os.path.join(self.directory, f"{nome_bm25}-pesi.npy"), posting_pesi)
+        if frammenti:
+            # written row by row: the old and new matrices are never fully in memory
+            matrice = np.memmap(os.path.join(self.directory, nome_matrice), dtype=np.float32, mode="w+", shape=(len(frammenti), dim))
+            for riga, (_, _, hash_, _) in enumerate(frammenti):
+                if hash_ in nuovi_vettori:
+                    vettore = np.asarray(nuovi_vettori[hash_], dtype=np.float32)
+                    norma = np.linalg.norm(vettore)
+                    matrice[riga] = vettore / norma if norma else vettore
+                else:
+                    matrice[riga] = self.matrice[esistenti[hash_]]
+            matrice.flush()
+            del matrice
+
+        temporanea = os.path.join(self.directory, TABELLA + ".tmp")
+        if os.path.exists(temporanea):
+            os.remove(temporanea)
+        conn = sqlite3.connect(temporanea)
+        with conn:
+            conn.execute("CREATE TABLE meta (chiave TEXT PRIMARY KEY, valore TEXT)")
+            conn.execute("CREATE TABLE documenti (file TEXT PRIMARY KEY, firma TEXT, hash TEXT)")
+            conn.execute("CREATE TABLE frammenti (riga INTEGER PRIMARY KEY, file TEXT, posizione INTEGER, hash TEXT, testo TEXT)")
+            conn.execute("CREATE INDEX ix_frammenti_file ON frammenti (file)")
+            conn.execute("CREATE INDEX ix_frammenti_hash ON frammenti (hash)")
+            conn.execute("CREATE TABLE termini (termine TEXT PRIMARY KEY, inizio INTEGER, fine INTEGER)")
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("modello", modello), ("versione", versione), ("righe", str(len(frammenti))),
+                ("dim", str(dim)), ("matrice", nome_matrice), ("bm25", nome_bm25),
+            ])
+            conn.executemany("INSERT INTO termini VALUES (?, ?, ?)", [(t, i, f) for t, (i, f) in vocabolario.items()])
+            conn.executemany("INSERT INTO documenti VALUES (?, ?, ?)", [(f, firma, h) for f, (firma, h) in documenti.items()])
+            conn.executemany("INSERT INTO frammenti VALUES (?, ?, ?, ?, ?)", [(riga, *frammento) for riga, frammento in enumerate(frammenti)])
+        conn.close()
+        os.replace(temporanea, os.path.join(self.directory, TABELLA))
+        self.carica()
+
+        # files of previous versions; an open memmap keeps working after the file is removed
+        for nome in os.listdir(self.directory):
+            if nome.startswith(("vettori-", "bm25-")) and generazione not in nome:
+                os.remove(os.path.join(self.directory, nome))
+
+    def _denso(self, matrice: np.ndarray, embedding, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        vettore = np.asarray(embedding, dtype=np.float32)
+        norma = np.linalg.norm(vettore)
+        similarita = matrice @ (vettore / norma if norma else vettore)
+        migliori = bm25.top_k(similarita, n)
+        return migliori, similarita[migliori]
+
+    def _testuale(self, conn, indice_bm25, n_righe: int, testo: str, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        termini = list(set(bm25.tokenizza(testo)))
+        if indice_bm25 is None or not termini:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        with self._lock:
+            intervalli = conn.execute(
+                f"SELECT inizio, fine FROM termini WHERE termine IN ({','.join('?' * len(termini))})", termini
+            ).fetchall()
+        posting_righe, posting_pesi = indice_bm25
+        punteggi = np.zeros(n_righe, dtype=np.float32)
+        for inizio, fine in intervalli:
+            # a term occurs once per posting list, so the fancy-index += does not lose updates
+            punteggi[posting_righe[inizio:fine]] += posting_pesi[inizio:fine]
+        migliori = bm25.top_k(punteggi, n)
+        migliori = migliori[punteggi[migliori] > 0]
+        return migliori, punteggi[migliori]
+
+    def cerca(self, embedding, k: int, testo: Optional[str] = None, metodo: str = "dense") -> List[Tuple[float, str, str]]:
+        """
+        I `k` frammenti più pertinenti: (punteggio, file, testo). `metodo` è "dense" (similarità
+        del coseno con l'embedding), "bm25" (parole chiave di `testo`) o "hybrid" (le due
+        classifiche fuse con reciprocal rank fusion, così un nome di prodotto citato alla
+        lettera viene trovato anche quando l'embedding lo mette in secondo piano).
+        """
+        with self._lettura() as (matrice, conn, indice_bm25):
+            return self._cerca(matrice, conn, indice_bm25, embedding, k, testo, metodo)
+
+    def _cerca(self, matrice, conn, indice_bm25, embedding, k: int, testo: Optional[str], metodo: str) -> List[Tuple[float, str, str]]:
+        if matrice is None:
+            return []
+        if metodo == "dense" or not testo:
+            migliori, punteggi = self._denso(matrice, embedding, k)
+        elif metodo == "bm25":
+            migliori, punteggi = self._testuale(conn, indice_bm25, len(matrice), testo, k)
+        elif metodo == "hybrid":
+            candidati = max(4 * k, 20)
+            densi, _ = self._denso(matrice, embedding, candidati)
+            testuali, _ = self._testuale(conn, indice_bm25, len(matrice), testo, candidati)
+            fusi = bm25.fondi_rrf([densi, testuali], k)
+            migliori = np.array([riga for riga, _ in fusi], dtype=np.int64)
+            punteggi = np.array([punteggio for _, punteggio in fusi], dtype=np.float32)
+        else:
+            raise ValueError(f"Metodo di ricerca non valido: {metodo}")
+        if not len(migliori):
+            return []
+        with self._lock:
+            testi = dict((riga, (file, contenuto)) for riga, file, contenuto in conn.execute(
+                f"SELECT riga, file, testo FROM frammenti WHERE riga IN ({','.join('?' * len(migliori))})", [int(r) for r in migliori]
+            ))
+        return [(float(p), *testi[int(r)]) for r, p in zip(migliori, punteggi)]
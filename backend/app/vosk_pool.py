@@ -0,0 +1,120 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Optional
+from app.config import VOSK_POOL_SIZE, VOSK_POOL_TIMEOUT, VOSK_WARMUP
+from app.errors import CodaPienaError
+
+SAMPLE_RATE = 16000
+
+class VoskModelPool:
+    """
+    Modello Vosk caricato una sola volta per processo e pool limitato di KaldiRecognizer
+    riutilizzabili. Se VOSK_MODEL_PATH cambia, il nuovo modello sostituisce il precedente
+    e i recognizer creati sul vecchio modello vengono scartati al rilascio.
+    """
+
+    def __init__(self, size: int = VOSK_POOL_SIZE, timeout: float = VOSK_POOL_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self.model = None
+        self.model_path = None
+        self._generation = 0
+        self._created = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._load_lock = threading.RLock()
+        # limits recognizers in use, so that concurrent uploads wait instead of allocating more
+        self._slots = threading.BoundedSemaphore(size)
+
+    def load(self, model_path: Optional[str] = None, warmup: bool = VOSK_WARMUP):
+        """Carica (o ricarica) il modello; da chiamare all'avvio, fuori dall'event loop."""
+        model_path = model_path or os.environ.get("VOSK_MODEL_PATH")
+        if not model_path or not os.path.exists(model_path):
+            raise RuntimeError(f"Modello non trovato: {model_path}")
+        # imported here: the library is only needed once the model is actually loaded
+        from vosk import Model
+        with self._load_lock:
+            print(f"Caricamento del modello Vosk da {model_path}...")
+            model = Model(model_path)
+            with self._lock:
+                self.model = model
+                self.model_path = model_path
+                self._generation += 1
+                self._created = 0
+                self._idle = queue.LifoQueue()
+        if warmup:
+            self._warmup()
+
+    def _warmup(self):
+        # one second of silence: pages in the model and initialises the decoding graph
+        with self.recognizer() as recognizer:
+            recognizer.AcceptWaveform(b"\x00\x00" * SAMPLE_RATE)
+            recognizer.FinalResult()
+
+    def _needs_load(self, model_path: Optional[str]) -> bool:
+        return self.model is None or bool(model_path and model_path != self.model_path)
+
+    def ensure_model(self, warmup: bool = False):
+        """Carica il modello se non è ancora caricato o se VOSK_MODEL_PATH è cambiato."""
+        model_path = os.environ.get("VOSK_MODEL_PATH")
+        if self._needs_load(model_path):
+            with self._load_lock:
+                if self._needs_load(model_path):
+                    self.load(model_path, warmup=warmup)
+
+    def acquire(self):
+        """
+        Prende un KaldiRecognizer a 16 kHz dal pool, attendendo al massimo `timeout` secondi.
+        Restituisce (recognizer, generazione) da passare a release().
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise CodaPienaError("Riconoscimento vocale occupato, riprovare più tardi.")
+        try:
+            self.ensure_model()
+            # the idle queue belongs to the generation: load() swaps both under the lock
+            with self._lock:
+                model, generation, idle = self.model, self._generation, self._idle
+            try:
+                recognizer = idle.get_nowait()
+            except queue.Empty:
+                from vosk import KaldiRecognizer
+                recognizer = KaldiRecognizer(model, SAMPLE_RATE)
+                with self._lock:
+                    if generation == self._generation:
+                        self._created += 1
+        except Exception:
+            self._slots.release()
+            raise
+        return recognizer, generation
+
+    def release(self, recognizer, generation: int):
+        """Restituisce il recognizer; quelli creati su un modello sostituito vengono scartati."""
+        try:
+            with self._lock:
+                if generation == self._generation:
+                    recognizer.Reset()
+                    self._idle.put(recognizer)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def recognizer(self):
+        """Presta un KaldiRecognizer a 16 kHz e lo restituisce al pool al termine."""
+        recognizer, generation = self.acquire()
+        try:
+            yield recognizer
+        finally:
+            self.release(recognizer, generation)
+
+    def stats(self) -> dict:
+        return {
+            "model_path": self.model_path,
+            "loaded": self.model is not None,
+            "size": self.size,
+            "created": self._created,
+            "idle": self._idle.qsize(),
+        }
+
+vosk_pool = VoskModelPool()
@@ -0,0 +1,57 @@
+"""
+Micro-benchmark della cache semantica delle risposte del chatbot (app.answer_cache).
+
+Misura la latenza di get() al crescere delle voci in cache (embedding a 1536 dimensioni,
+come text-embedding-ada-002) e simula un flusso di domande ripetute con piccole variazioni
+per mostrare l'hit rate alle diverse soglie.
+
+Uso (dalla cartella backend):
+    python -m benchmarks.bench_answer_cache --dim 1536 --queries 2000
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from app.answer_cache import SemanticAnswerCache
+
+def _us(samples):
+    return f"media {statistics.mean(samples) * 1e6:8.1f} µs  p95 {sorted(samples)[int(len(samples) * 0.95) - 1] * 1e6:8.1f} µs"
+
+def bench_lookup(dim: int, size: int, queries: int, rng: np.random.Generator):
+    cache = SemanticAnswerCache(threshold=0.95, maxsize=size)
+    for i in range(size):
+        cache.set(rng.standard_normal(dim), f"domanda {i}", f"risposta {i}")
+    samples = []
+    for _ in range(queries):
+        embedding = rng.standard_normal(dim)
+        start = time.perf_counter()
+        cache.get(embedding)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def simula_hit_rate(dim: int, queries: int, threshold: float, rng: np.random.Generator):
+    # 50 recurring questions, each asked with small wording changes (noise on the embedding)
+    argomenti = rng.standard_normal((50, dim))
+    cache = SemanticAnswerCache(threshold=threshold, maxsize=1000)
+    for _ in range(queries):
+        base = argomenti[rng.integers(len(argomenti))]
+        embedding = base + rng.standard_normal(dim) * np.linalg.norm(base) * rng.uniform(0.05, 0.4) / np.sqrt(dim)
+        if cache.get(embedding) is None:
+            cache.set(embedding, "domanda", "risposta")
+    return cache.stats()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(42)
+
+    for size in (100, 1000, 5000):
+        print(f"get() con {size:5d} voci       : {_us(bench_lookup(args.dim, size, min(args.queries, 500), rng))}")
+    for threshold in (0.90, 0.95, 0.98):
+        stats = simula_hit_rate(args.dim, args.queries, threshold, rng)
+        print(f"soglia {threshold:.2f}: hit rate {stats['hit_rate']:.1%}, voci {stats['size']}, quasi-hit {stats['quasi_hit']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark di carico del chatbot (POST /chatbot) senza rete: le chiamate a OpenAI vanno al
+server locale di benchmarks.openai_stub, avviato in un processo se non si passa --openai-url.
+
+Invia --requests domande con --concurrency richieste contemporanee e riporta p50/p95/p99 per
+fase, letti dall'header Server-Timing (queue, embedding, cache, retrieval, prompt, completion,
+serialization), più la latenza end-to-end vista dal client, il throughput e i token medi del
+contesto inviato al modello (header X-Context-Tokens). Senza --url l'app
+gira nello stesso processo (solo il router del chatbot, nessun database) con un archivio
+vettoriale temporaneo costruito dai documenti in --docs.
+
+Con --max-p95-ms termina con codice 1 se il p95 end-to-end supera la soglia, per la CI.
+
+Uso (dalla cartella backend):
+    python -m benchmarks.bench_chatbot --requests 200 --concurrency 8 --completion-ms 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+FASI = ["queue", "embedding", "cache", "retrieval", "prompt", "completion", "serialization"]
+
+def leggi_server_timing(header: str) -> dict:
+    fasi = {}
+    for voce in filter(None, (v.strip() for v in header.split(","))):
+        nome, _, durata = voce.partition(";dur=")
+        fasi[nome] = float(durata)
+    return fasi
+
+def leggi_token_contesto(header: str) -> tuple:
+    """(token inviati, token risparmiati) da X-Context-Tokens."""
+    token, _, resto = header.partition(";")
+    valori = dict(v.strip().split("=") for v in resto.split(";") if "=" in v)
+    return int(token), int(valori.get("risparmiati", 0))
+
+def percentili(valori: list) -> str:
+    if not valori:
+        return "-"
+    p50, p95, p99 = np.percentile(valori, [50, 95, 99])
+    return f"p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  p99 {p99:8.1f} ms"
+
+async def carico(client, richieste: int, concorrenza: int):
+    fasi = {nome: [] for nome in FASI}
+    totali, errori, token_contesto = [], {}, []
+    contatore = iter(range(richieste))
+
+    async def utente():
+        for i in contatore:
+            start = time.perf_counter()
+            # distinct questions: the benchmark measures the full pipeline, not the answer cache
+            risposta = await client.post("/chatbot", json={"question": f"Quali garanzie copre la polizza salute? ({i})"})
+            totali.append((time.perf_counter() - start) * 1000)
+            if risposta.status_code != 200:
+                errori[risposta.status_code] = errori.get(risposta.status_code, 0) + 1
+                continue
+            for nome, durata in leggi_server_timing(risposta.headers.get("server-timing", "")).items():
+                fasi.setdefault(nome, []).append(durata)
+            if "x-context-tokens" in risposta.headers:
+                token_contesto.append(leggi_token_contesto(risposta.headers["x-context-tokens"]))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(utente() for _ in range(concorrenza)))
+    return fasi, totali, errori, token_contesto, time.perf_counter() - start
+
+async def esegui(args) -> float:
+    import httpx
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=None)
+    else:
+        from fastapi import FastAPI
+        from fastapi.responses import ORJSONResponse
+        from app.routers import chatbot
+        app = FastAPI(default_response_class=ORJSONResponse)
+        app.include_router(chatbot.router)
+        start = time.perf_counter()
+        await chatbot.chat_engine.get()
+        print(f"avvio del chatbot (indicizzazione inclusa): {(time.perf_counter() - start) * 1000:.0f} ms")
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+
+    async with client:
+        # warm-up: connection pools, first-call allocations
+        await carico(client, min(args.concurrency, args.requests), args.concurrency)
+        fasi, totali, errori, token_contesto, durata = await carico(client, args.requests, args.concurrency)
+
+    print(f"{args.requests} richieste, concorrenza {args.concurrency}: {args.requests / durata:.1f} richieste/s, errori {errori or 0}")
+    for nome in FASI + sorted(set(fasi) - set(FASI)):
+        print(f"{nome:<14}: {percentili(fasi.get(nome, []))}")
+    print(f"{'end-to-end':<14}: {percentili(totali)}")
+    if token_contesto:
+        inviati, risparmiati = np.mean(token_contesto, axis=0)
+        print(f"{'contesto':<14}: {inviati:.0f} token per richiesta, {risparmiati:.0f} risparmiati")
+    return float(np.percentile(totali, 95)) if totali else float("inf")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--url", help="API già avviata (con OPENAI_BASE_URL verso lo stub); altrimenti in processo")
+    parser.add_argument("--openai-url", help="server compatibile OpenAI già avviato; altrimenti benchmarks.openai_stub in un processo")
+    parser.add_argument("--docs", default="./documents")
+    parser.add_argument("--embedding-ms", type=float, default=20)
+    parser.add_argument("--completion-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--max-p95-ms", type=float, help="soglia del p95 end-to-end oltre la quale il benchmark fallisce")
+    args = parser.parse_args()
+
+    stub = None
+    with tempfile.TemporaryDirectory() as directory:
+        if not args.url:
+            openai_url = args.openai_url
+            if not openai_url:
+                from benchmarks.openai_stub import avvia_processo
+                stub, openai_url = avvia_processo(args.embedding_ms, args.completion_ms, args.token_ms, args.tokens)
+            # read by app.config, so set before the chatbot router is imported
+            os.environ.update({
+                "OPENAI_BASE_URL": openai_url,
+                "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "stub") if args.openai_url else "stub",
+                "CHATBOT_DOCS_PATH": args.docs,
+                "CHATBOT_VECTOR_STORE_PATH": directory,
+            })
+        try:
+            p95 = asyncio.run(esegui(args))
+        finally:
+            if stub is not None:
+                stub.terminate()
+
+    if args.max_p95_ms is not None and p95 > args.max_p95_ms:
+        print(f"p95 end-to-end {p95:.1f} ms oltre la soglia di {args.max_p95_ms:.1f} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Micro-benchmark dell'indice dei nomi dei clienti (app.name_index).
+
+Genera clienti sintetici, costruisce l'indice e misura la latenza di abbina() su nomi
+trascritti con errori tipici del riconoscimento vocale, di cerca() per il type-ahead e,
+come riferimento, di una scansione lineare con difflib.
+
+Uso (dalla cartella backend):
+    python -m benchmarks.bench_name_index --clienti 50000 --queries 500
+"""
+import argparse
+import difflib
+import random
+import statistics
+import time
+from app.name_index import NameIndex
+
+NOMI = [
+    "Mario", "Giuseppe", "Luca", "Francesco", "Alessandro", "Andrea", "Giovanni", "Marco", "Matteo", "Lorenzo",
+    "Giulia", "Francesca", "Chiara", "Sara", "Anna", "Martina", "Federica", "Giorgia", "Valentina", "Cristina",
+]
+COGNOMI = [
+    "Rossi", "Russo", "Ferrari", "Esposito", "Bianchi", "Romano", "Colombo", "Ricci", "Marino", "Greco",
+    "Bruno", "Gallo", "Conti", "De Luca", "Mancini", "Costa", "Giordano", "Rizzo", "Lombardi", "Moretti",
+    "Barbieri", "Fontana", "Santoro", "Mariani", "Rinaldi", "Caruso", "Ferrara", "Galli", "Martini", "Leone",
+    "Longo", "Gentile", "Martinelli", "Vitale", "Lombardo", "Serra", "Coppola", "De Santis", "D'Angelo", "Marchetti",
+    "Parisi", "Villa", "Conte", "Ferraro", "Ferri", "Fabbri", "Bianco", "Marini", "Grasso", "Valentini",
+    "Messina", "Sala", "De Angelis", "Gatti", "Pellegrini", "Palumbo", "Sanna", "Farina", "Rizzi", "Monti",
+    "Cattaneo", "Morelli", "Amato", "Silvestri", "Mazza", "Testa", "Grassi", "Pellegrino", "Carbone", "Giuliani",
+    "Benedetti", "Barone", "Rossetti", "Caputo", "Montanari", "Guerra", "Palmieri", "Bernardi", "Martino", "Fiore",
+]
+
+# spelling mistakes typical of the speech recognizer on names
+ERRORI = [
+    lambda s: s.replace("ss", "s", 1),
+    lambda s: s.replace("chi", "ki", 1),
+    lambda s: s.replace("cc", "c", 1),
+    lambda s: s.replace("zz", "z", 1),
+    lambda s: s.replace("C", "K", 1),
+    lambda s: s.replace("gi", "ge", 1),
+    lambda s: s[:-1] + "o" if s.endswith("i") else s,
+]
+
+def genera_clienti(n: int, rng: random.Random):
+    # surnames get a numeric-free suffix so that the benchmark is not dominated by homonyms
+    suffissi = ["", "ni", "lli", "tti", "sco", "ri", "na", "lo"]
+    return [
+        (codice, rng.choice(NOMI), rng.choice(COGNOMI) + rng.choice(suffissi))
+        for codice in range(1, n + 1)
+    ]
+
+def storpia(nome: str, rng: random.Random) -> str:
+    for errore in rng.sample(ERRORI, 2):
+        nome = errore(nome)
+    return nome.lower()
+
+def _us(samples):
+    return f"media {statistics.mean(samples) * 1e6:8.1f} µs  p95 {sorted(samples)[int(len(samples) * 0.95) - 1] * 1e6:8.1f} µs"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clienti", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    clienti = genera_clienti(args.clienti, rng)
+    start = time.perf_counter()
+    indice = NameIndex.da_righe(clienti)
+    print(f"costruzione indice ({args.clienti} clienti): {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    campione = rng.sample(clienti, args.queries)
+    richieste = [(c, storpia(nome, rng), storpia(cognome, rng)) for c, nome, cognome in campione]
+    per_nome = {}
+    for codice, nome, cognome in clienti:
+        per_nome.setdefault(f"{nome} {cognome}".lower(), codice)
+
+    samples, corretti, nessuno = [], 0, 0
+    for codice, nome, cognome in richieste:
+        start = time.perf_counter()
+        trovato = indice.abbina(nome, cognome)
+        samples.append(time.perf_counter() - start)
+        atteso = per_nome[f"{indice.cliente(codice)[0]} {indice.cliente(codice)[1]}".lower()]
+        corretti += trovato == atteso
+        nessuno += trovato is None
+    print(f"abbina() con errori         : {_us(samples)}  corretti {corretti}/{len(richieste)}, non abbinati {nessuno}")
+
+    samples = []
+    for _, nome, cognome in richieste:
+        testo = f"{nome} {cognome[:3]}"
+        start = time.perf_counter()
+        indice.cerca(testo, limit=10, prefisso=True)
+        samples.append(time.perf_counter() - start)
+    print(f"cerca() type-ahead          : {_us(samples)}")
+
+    nomi = list(per_nome)
+    samples = []
+    for _, nome, cognome in richieste[:20]:
+        start = time.perf_counter()
+        difflib.get_close_matches(f"{nome} {cognome}", nomi, n=1)
+        samples.append(time.perf_counter() - start)
+    print(f"scansione difflib (20 query): {_us(samples)}")
+
+if __name__ == "__main__":
+    main()
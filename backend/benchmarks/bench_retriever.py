@@ -0,0 +1,101 @@
+"""
+Micro-benchmark del retriever del chatbot (app.vector_store): dense, bm25 e hybrid.
+
+Genera frammenti sintetici su molti prodotti: gli embedding di prodotti della stessa categoria
+sono vicini tra loro, mentre il testo contiene il nome esatto del prodotto. Per ogni dimensione
+dell'archivio misura latenza e precisione@k (quota dei k frammenti restituiti che parlano del
+prodotto chiesto) delle tre modalità. Se LlamaIndex è installato misura anche il retriever
+VectorStoreIndex in memoria usato in precedenza, fino a --llama-max frammenti.
+
+Uso (dalla cartella backend):
+    python -m benchmarks.bench_retriever --sizes 1000 10000 100000 --dim 1536
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import numpy as np
+from app.vector_store import VectorStore
+
+CATEGORIE = ["vita", "salute", "casa", "auto", "viaggio", "risparmio", "pensione", "impresa"]
+PAROLE = [f"parola{i}" for i in range(2000)]
+
+def _us(samples):
+    return f"media {statistics.mean(samples) * 1e6:9.1f} µs  p95 {sorted(samples)[int(len(samples) * 0.95) - 1] * 1e6:9.1f} µs"
+
+def genera(n: int, dim: int, prodotti: int, rng: np.random.Generator):
+    centri_categoria = rng.standard_normal((len(CATEGORIE), dim)).astype(np.float32)
+    centri_prodotto = rng.standard_normal((prodotti, dim)).astype(np.float32)
+    nomi = [f"Polizza {CATEGORIE[p % len(CATEGORIE)].capitalize()} Formula{p}" for p in range(prodotti)]
+    prodotto = rng.integers(prodotti, size=n)
+    frammenti, vettori = [], {}
+    for riga in range(n):
+        p = int(prodotto[riga])
+        testo = f"{nomi[p]}: " + " ".join(rng.choice(PAROLE, 40))
+        # same-category products are close in embedding space, the product itself is a weaker signal
+        vettori[f"h{riga}"] = centri_categoria[p % len(CATEGORIE)] + 0.3 * centri_prodotto[p] + 0.8 * rng.standard_normal(dim).astype(np.float32)
+        frammenti.append((f"doc{p}.pdf", riga, f"h{riga}", testo))
+    domande = []
+    for p in rng.integers(prodotti, size=50):
+        p = int(p)
+        embedding = centri_categoria[p % len(CATEGORIE)] + 0.3 * centri_prodotto[p] + 0.8 * rng.standard_normal(dim).astype(np.float32)
+        domande.append((p, f"cosa copre la {nomi[p]}?", embedding))
+    return frammenti, vettori, domande
+
+def misura(cerca, domande, k: int):
+    samples, precisione = [], []
+    for p, testo, embedding in domande:
+        start = time.perf_counter()
+        risultati = cerca(embedding, testo)
+        samples.append(time.perf_counter() - start)
+        precisione.append(sum(file == f"doc{p}.pdf" for file in risultati) / k)
+    return samples, statistics.mean(precisione)
+
+def retriever_llama_index(frammenti, vettori, k: int):
+    try:
+        from llama_index.core import VectorStoreIndex, QueryBundle
+        from llama_index.core.embeddings import MockEmbedding
+        from llama_index.core.schema import TextNode
+    except ImportError:
+        return None
+    nodi = [TextNode(text=testo, embedding=vettori[h].tolist(), metadata={"file": file}) for file, _, h, testo in frammenti]
+    index = VectorStoreIndex(nodi, embed_model=MockEmbedding(embed_dim=len(next(iter(vettori.values())))))
+
+    def cerca(embedding, testo):
+        risultati = index.as_retriever(similarity_top_k=k).retrieve(QueryBundle(query_str=testo, embedding=embedding.tolist()))
+        return [r.node.metadata["file"] for r in risultati]
+    return cerca
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--per-prodotto", type=int, default=5, help="frammenti per prodotto in media")
+    parser.add_argument("--llama-max", type=int, default=10000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(42)
+
+    for n in args.sizes:
+        frammenti, vettori, domande = genera(n, args.dim, max(1, n // args.per_prodotto), rng)
+        with tempfile.TemporaryDirectory() as directory:
+            store = VectorStore(directory)
+            store.scrivi("modello", "v1", {}, frammenti, vettori)
+            print(f"--- {n} frammenti")
+            for metodo in ("dense", "bm25", "hybrid"):
+                samples, precisione = misura(
+                    lambda embedding, testo: [file for _, file, _ in store.cerca(embedding, args.k, testo=testo, metodo=metodo)],
+                    domande, args.k,
+                )
+                print(f"{metodo:<12}: {_us(samples)}  precisione@{args.k} {precisione:.2f}")
+            if n <= args.llama_max:
+                cerca = retriever_llama_index(frammenti, vettori, args.k)
+                if cerca is None:
+                    print("llama_index : non installato")
+                else:
+                    samples, precisione = misura(cerca, domande, args.k)
+                    print(f"llama_index : {_us(samples)}  precisione@{args.k} {precisione:.2f}")
+            del store
+
+if __name__ == "__main__":
+    main()
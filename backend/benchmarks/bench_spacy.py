@@ -0,0 +1,60 @@
+"""
+Micro-benchmark dell'estrazione entità sulle note vocali.
+
+Confronta il caricamento di spaCy a ogni richiesta (comportamento precedente)
+con la pipeline NER condivisa e con l'elaborazione a lotti tramite nlp.pipe.
+
+Uso (dalla cartella backend):
+    python -m benchmarks.bench_spacy --requests 20
+"""
+import argparse
+import statistics
+import time
+import spacy
+from app.nlp import SPACY_MODEL, estrai_informazioni_chiave, estrai_informazioni_batch, get_nlp
+
+TRASCRIZIONI = [
+    "aggiungi al cliente mario rossi con nota richiamare la prossima settimana per la polizza casa",
+    "nota per giulia bianchi: interessata alla polizza salute e infortuni",
+    "cliente luca verdi con nota vuole un preventivo per il piano pensionistico",
+    "anna russo nota: ha segnalato un sinistro sulla polizza auto",
+]
+
+def _ms(samples):
+    return f"media {statistics.mean(samples) * 1000:8.2f} ms  p95 {sorted(samples)[int(len(samples) * 0.95) - 1] * 1000:8.2f} ms"
+
+def bench_load_per_request(n: int):
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        nlp = spacy.load(SPACY_MODEL)
+        nlp(TRASCRIZIONI[i % len(TRASCRIZIONI)])
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def bench_cached(n: int):
+    get_nlp()
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        estrai_informazioni_chiave(TRASCRIZIONI[i % len(TRASCRIZIONI)])
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def bench_batch(n: int):
+    testi = [TRASCRIZIONI[i % len(TRASCRIZIONI)] for i in range(n)]
+    start = time.perf_counter()
+    estrai_informazioni_batch(testi)
+    return (time.perf_counter() - start) / n
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"spacy.load a ogni richiesta : {_ms(bench_load_per_request(args.requests))}")
+    print(f"pipeline NER condivisa      : {_ms(bench_cached(args.requests))}")
+    print(f"nlp.pipe, per trascrizione  : media {bench_batch(args.requests * 10) * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Micro-benchmark dell'avvio dell'API (app.main).
+
+Misura, in un interprete appena avviato, il tempo di import dell'app e quali librerie pesanti
+vengono importate, la latenza della prima richiesta (GET /status) a lifespan avviato, il tempo
+con cui ogni sottosistema (chatbot, vosk, voice_workers) diventa pronto e la latenza della
+prima richiesta al chatbot (GET /chatbot/cache, che attende l'avvio del motore).
+Usa le variabili d'ambiente del file .env come il server.
+
+Uso (dalla cartella backend):
+    python -m benchmarks.bench_startup --timeout 300
+"""
+import argparse
+import sys
+import time
+
+LIBRERIE_PESANTI = ["spacy", "vosk", "llama_index", "openai", "torch"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timeout", type=float, default=300, help="secondi massimi di attesa dei sottosistemi")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    import app.main
+    print(f"import app.main                   : {(time.perf_counter() - start) * 1000:8.0f} ms")
+    print(f"librerie pesanti importate        : {[m for m in LIBRERIE_PESANTI if m in sys.modules] or 'nessuna'}")
+
+    from fastapi.testclient import TestClient
+    start = time.perf_counter()
+    with TestClient(app.main.app) as client:
+        client.get("/status")
+        print(f"avvio + prima GET /status         : {(time.perf_counter() - start) * 1000:8.0f} ms")
+
+        inizio_attesa = time.perf_counter()
+        while time.perf_counter() - inizio_attesa < args.timeout:
+            sottosistemi = client.get("/status").json()["sottosistemi"]
+            if all(s["stato"] in ("pronto", "errore") for s in sottosistemi.values()):
+                break
+            time.sleep(0.1)
+        for nome, s in sottosistemi.items():
+            durata = f"{s['secondi_avvio']:6.1f} s" if s["secondi_avvio"] is not None else "     -  "
+            print(f"{nome:<34}: {durata}  {s['stato']}{' (' + s['errore'] + ')' if s['errore'] else ''}")
+
+        start = time.perf_counter()
+        risposta = client.get("/chatbot/cache")
+        print(f"prima GET /chatbot/cache          : {(time.perf_counter() - start) * 1000:8.0f} ms  HTTP {risposta.status_code}")
+
+if __name__ == "__main__":
+    main()
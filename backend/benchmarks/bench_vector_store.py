@@ -0,0 +1,62 @@
+"""
+Micro-benchmark dell'archivio vettoriale del chatbot (app.vector_store).
+
+Scrive un archivio con frammenti sintetici e confronta l'apertura con np.memmap con il
+caricamento dello stesso contenuto da un pickle (come faceva embeddings_cache.pkl), poi
+misura la latenza di cerca().
+
+Uso (dalla cartella backend):
+    python -m benchmarks.bench_vector_store --frammenti 20000 --dim 1536
+"""
+import argparse
+import os
+import pickle
+import statistics
+import tempfile
+import time
+import numpy as np
+from app.vector_store import VectorStore
+
+def _us(samples):
+    return f"media {statistics.mean(samples) * 1e6:8.1f} µs  p95 {sorted(samples)[int(len(samples) * 0.95) - 1] * 1e6:8.1f} µs"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frammenti", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = np.random.default_rng(42)
+
+    with tempfile.TemporaryDirectory() as directory:
+        frammenti = [(f"doc{i // 50}.pdf", i % 50, f"h{i}", f"testo del frammento {i}") for i in range(args.frammenti)]
+        vettori = {f"h{i}": rng.standard_normal(args.dim).astype(np.float32) for i in range(args.frammenti)}
+        documenti = {f"doc{i}.pdf": ("0:0", f"d{i}") for i in range(args.frammenti // 50 + 1)}
+
+        start = time.perf_counter()
+        VectorStore(directory).scrivi("modello", "v1", documenti, frammenti, vettori)
+        print(f"scrittura archivio                : {(time.perf_counter() - start) * 1000:8.0f} ms  ({args.frammenti} frammenti)")
+
+        percorso_pickle = os.path.join(directory, "embeddings_cache.pkl")
+        with open(percorso_pickle, "wb") as f:
+            pickle.dump({"hashes": {h: h for h in vettori}, "embeddings": {h: v.tolist() for h, v in vettori.items()}}, f)
+        start = time.perf_counter()
+        with open(percorso_pickle, "rb") as f:
+            pickle.load(f)
+        print(f"caricamento pickle di riferimento : {(time.perf_counter() - start) * 1000:8.0f} ms")
+
+        start = time.perf_counter()
+        store = VectorStore(directory)
+        store.carica()
+        print(f"apertura VectorStore (memmap)     : {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        samples = []
+        for _ in range(args.queries):
+            embedding = rng.standard_normal(args.dim)
+            start = time.perf_counter()
+            store.cerca(embedding, 4)
+            samples.append(time.perf_counter() - start)
+        print(f"cerca() top-4                     : {_us(samples)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Server locale compatibile con l'API OpenAI (POST /v1/embeddings e /v1/chat/completions, anche
+in streaming) per misurare il chatbot senza rete né crediti. Le latenze sono fisse e
+configurabili, gli embedding e le risposte sono deterministici (dipendono solo dal testo).
+
+Latenza di una chat completion: --completion-ms fino al primo token, poi --token-ms per ognuno
+dei --tokens token della risposta.
+
+Uso (dalla cartella backend):
+    python -m benchmarks.openai_stub --port 8090 --embedding-ms 20 --completion-ms 200 --token-ms 5
+    OPENAI_BASE_URL=http://127.0.0.1:8090/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+import orjson
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+
+def crea_app(embedding_ms: float = 20, completion_ms: float = 200, token_ms: float = 5, tokens: int = 50, dim: int = 1536) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+
+    def embedding(testo: str) -> np.ndarray:
+        seme = int.from_bytes(hashlib.sha256(testo.encode()).digest()[:8], "big")
+        vettore = np.random.default_rng(seme).standard_normal(dim).astype(np.float32)
+        return vettore / np.linalg.norm(vettore)
+
+    def frammenti_risposta(messaggi: list) -> list:
+        firma = hashlib.sha256(orjson.dumps(messaggi)).hexdigest()[:8]
+        return ["<response>"] + [f" parola{i}" for i in range(tokens - 2)] + [f" {firma}", "</response>"]
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        corpo = await request.json()
+        testi = corpo["input"] if isinstance(corpo["input"], list) else [corpo["input"]]
+        await asyncio.sleep(embedding_ms / 1000)
+        n_token = sum(len(t.split()) for t in testi)
+        corpo_risposta = {
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": embedding(t)} for i, t in enumerate(testi)],
+            "model": corpo.get("model"),
+            "usage": {"prompt_tokens": n_token, "total_tokens": n_token},
+        }
+        return Response(orjson.dumps(corpo_risposta, option=orjson.OPT_SERIALIZE_NUMPY), media_type="application/json")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        corpo = await request.json()
+        parti = frammenti_risposta(corpo["messages"])
+        base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": corpo.get("model")}
+        n_prompt = sum(len(str(m.get("content", "")).split()) for m in corpo["messages"])
+
+        if not corpo.get("stream"):
+            await asyncio.sleep((completion_ms + token_ms * (len(parti) - 1)) / 1000)
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(parti)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": n_prompt, "completion_tokens": len(parti), "total_tokens": n_prompt + len(parti)},
+            }
+
+        async def eventi():
+            await asyncio.sleep(completion_ms / 1000)
+            for i, parte in enumerate(parti):
+                if i:
+                    await asyncio.sleep(token_ms / 1000)
+                delta = {"role": "assistant", "content": parte} if i == 0 else {"content": parte}
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                yield b"data: " + orjson.dumps(chunk) + b"\n\n"
+            fine = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield b"data: " + orjson.dumps(fine) + b"\n\n"
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(eventi(), media_type="text/event-stream")
+
+    return app
+
+def avvia_processo(embedding_ms: float, completion_ms: float, token_ms: float, tokens: int, host: str = "127.0.0.1"):
+    """
+    Avvia il server in un processo separato (così non contende il GIL con l'app misurata) su una
+    porta libera; restituisce il processo da terminare e il base URL /v1.
+    """
+    with socket.socket() as s:
+        s.bind((host, 0))
+        porta = s.getsockname()[1]
+    processo = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.openai_stub", "--host", host, "--port", str(porta),
+        "--embedding-ms", str(embedding_ms), "--completion-ms", str(completion_ms),
+        "--token-ms", str(token_ms), "--tokens", str(tokens),
+    ])
+    scadenza = time.time() + 30
+    while True:
+        try:
+            socket.create_connection((host, porta), timeout=1).close()
+            return processo, f"http://{host}:{porta}/v1"
+        except OSError:
+            if processo.poll() is not None or time.time() > scadenza:
+                processo.kill()
+                raise RuntimeError("Avvio del server OpenAI locale fallito")
+            time.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--embedding-ms", type=float, default=20)
+    parser.add_argument("--completion-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+    app = crea_app(args.embedding_ms, args.completion_ms, args.token_ms, args.tokens, args.dim)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
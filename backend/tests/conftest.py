@@ -0,0 +1,5 @@
+import os
+
+# app.database builds its engine at import time; no connection is opened by these tests
+for variabile, valore in {"DB_USER": "test", "DB_PASSWORD": "test", "DB_HOST": "localhost", "DB_PORT": "5432", "DB_NAME": "test"}.items():
+    os.environ.setdefault(variabile, valore)
@@ -0,0 +1,27 @@
+from app.answer_cache import SemanticAnswerCache
+
+def test_risposta_generata_per_documenti_vecchi_non_entra_in_cache():
+    cache = SemanticAnswerCache(threshold=0.9, maxsize=4)
+    cache.allinea("v1")
+    # the documents change while the answer is being generated
+    cache.allinea("v2")
+    cache.set([1.0, 0.0], "orari?", "vecchia risposta", "v1")
+    assert cache.get([1.0, 0.0]) is None
+
+def test_risposta_della_versione_corrente_entra_in_cache():
+    cache = SemanticAnswerCache(threshold=0.9, maxsize=4)
+    cache.allinea("v1")
+    cache.set([1.0, 0.0], "orari?", "risposta", "v1")
+    assert cache.get([1.0, 0.0]) == "risposta"
+
+def test_voce_scaduta_non_nasconde_la_seconda_piu_simile(monkeypatch):
+    adesso = [1000.0]
+    monkeypatch.setattr("app.answer_cache.time.time", lambda: adesso[0])
+    cache = SemanticAnswerCache(threshold=0.9, maxsize=4, ttl=60)
+    cache.set([1.0, 0.1], "orari della sede?", "risposta vecchia")
+    adesso[0] += 30
+    cache.set([1.0, 0.3], "orari sede?", "risposta recente")
+    # the first entry, the closest to the question, expires; the second one is still valid
+    adesso[0] += 40
+    assert cache.get([1.0, 0.0]) == "risposta recente"
+    assert cache.stats()["size"] == 1
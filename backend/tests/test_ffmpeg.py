@@ -0,0 +1,24 @@
+import sys
+import pytest
+from app.routers import voice_assistant
+
+def finto_ffmpeg(monkeypatch, script: str):
+    monkeypatch.setattr(voice_assistant, "FFMPEG_PCM", [sys.executable, "-c", script])
+
+def test_molti_errori_su_stderr_non_bloccano_la_conversione(monkeypatch):
+    # more than a pipe buffer of warnings before any audio
+    finto_ffmpeg(monkeypatch, "import sys; sys.stderr.write('avviso\\n' * 50000); sys.stderr.flush(); sys.stdout.buffer.write(b'\\0' * 20000)")
+    assert sum(len(c) for c in voice_assistant.pcm_da_ffmpeg(b"audio")) == 20000
+
+def test_errore_riporta_la_coda_di_stderr(monkeypatch):
+    finto_ffmpeg(monkeypatch, "import sys; sys.stderr.write('x' * 100000 + 'formato non valido'); sys.exit(1)")
+    with pytest.raises(ValueError) as errore:
+        list(voice_assistant.pcm_da_ffmpeg(b"audio"))
+    assert str(errore.value).endswith("formato non valido")
+    assert len(str(errore.value)) < voice_assistant.FFMPEG_STDERR_BYTES + 100
+
+def test_conversione_oltre_il_limite_viene_interrotta(monkeypatch):
+    finto_ffmpeg(monkeypatch, "import time; time.sleep(30)")
+    monkeypatch.setattr(voice_assistant, "VOICE_FFMPEG_TIMEOUT", 0.5)
+    with pytest.raises(ValueError, match="interrotta"):
+        list(voice_assistant.pcm_da_ffmpeg(b"audio"))
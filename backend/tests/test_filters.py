@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+from app.filters import apply_keyset, encode_cursor
+from app.models import Cliente
+
+REDDITI = {1: 30000, 2: None, 3: 20000, 4: None, 5: 30000, 6: 10000}
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    event.listen(engine, "connect", lambda conn, _: conn.execute("ATTACH DATABASE ':memory:' AS vitasicura_schema"))
+    Cliente.__table__.create(engine)
+    with Session(engine) as session:
+        session.add_all(Cliente(codice_cliente=codice, reddito=reddito) for codice, reddito in REDDITI.items())
+        session.commit()
+        yield session
+
+def scorri(db, order_by: str, limit: int) -> list:
+    """Codici dei clienti di tutte le pagine, seguendo il cursore come fa il client."""
+    codici, cursor = [], None
+    while True:
+        passi, column = apply_keyset(select(Cliente), order_by, cursor, limit)
+        pagina = []
+        for passo in passi:
+            if len(pagina) > limit:
+                break
+            pagina += db.execute(passo.limit(limit + 1 - len(pagina))).scalars().all()
+        codici += [c.codice_cliente for c in pagina[:limit]]
+        if len(pagina) <= limit:
+            return codici
+        ultimo = pagina[limit - 1]
+        cursor = encode_cursor(getattr(ultimo, column.key), ultimo.codice_cliente)
+
+@pytest.mark.parametrize("limit", [1, 2, 4])
+def test_crescente_con_valori_null_in_fondo(db, limit):
+    assert scorri(db, "reddito", limit) == [6, 3, 1, 5, 2, 4]
+
+@pytest.mark.parametrize("limit", [1, 2, 4])
+def test_decrescente_con_valori_null_in_testa(db, limit):
+    assert scorri(db, "-reddito", limit) == [4, 2, 5, 1, 3, 6]
+
+def test_ogni_passo_usa_un_confronto_servibile_dall_indice():
+    cursore = encode_cursor(20000, 3)
+    passi, _ = apply_keyset(select(Cliente), "reddito", cursore, 2)
+    sql = [str(passo.compile(compile_kwargs={"literal_binds": True})) for passo in passi]
+    # no OR: each step is one range (or IS NULL) condition on the composite index
+    assert all(" OR " not in s for s in sql)
+    assert "(vitasicura_schema.clienti.reddito, vitasicura_schema.clienti.codice_cliente) > (20000, 3)" in sql[0]
+    assert "vitasicura_schema.clienti.reddito IS NULL" in sql[1]
@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+from app.jobs import CodaPienaError, JobQueue
+
+def test_run_riserva_un_posto_per_ogni_elaborazione_parallela():
+    coda = JobQueue(max_workers=1, max_pending=4, ttl=60)
+
+    async def scenario():
+        avviato, rilascia = asyncio.Event(), asyncio.Event()
+
+        async def lavoro():
+            avviato.set()
+            await rilascia.wait()
+
+        batch = asyncio.create_task(coda.run(lavoro, posti=3))
+        await avviato.wait()
+        with pytest.raises(CodaPienaError):
+            await coda.run(lambda: asyncio.sleep(0), posti=2)
+        await coda.run(lambda: asyncio.sleep(0))
+        rilascia.set()
+        await batch
+
+    asyncio.run(scenario())
+    assert coda.stats()["attivi"] == 0
+
+def test_job_ricorda_il_tipo_di_errore():
+    coda = JobQueue(max_workers=1, max_pending=4, ttl=60)
+
+    async def fallisce():
+        raise ValueError("audio non valido")
+
+    async def scenario():
+        job = coda.submit(fallisce)
+        await asyncio.gather(*coda._tasks)
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.stato == "errore"
+    assert job.tipo_errore is ValueError
@@ -0,0 +1,46 @@
+from app.name_index import NameIndex
+
+def test_modifica_durante_ricarica_non_sopravvive_alla_ricarica_successiva():
+    indice = NameIndex.da_righe([(1, "Marco", "Rossi")])
+
+    # the customer is renamed while a reload is reading the (older) table
+    indice._in_ricarica = True
+    indice.aggiorna(1, "Luca", "Rossi")
+    indice.sostituisci(NameIndex.da_righe([(1, "Marco", "Rossi")]))
+    indice._in_ricarica = False
+    assert indice.cliente(1) == ("Luca", "Rossi")
+    assert indice._modifiche == {}
+
+    # later the database renames the customer again: the next reload must win
+    indice._in_ricarica = True
+    indice.sostituisci(NameIndex.da_righe([(1, "Paolo", "Rossi")]))
+    indice._in_ricarica = False
+    assert indice.cliente(1) == ("Paolo", "Rossi")
+    assert indice.abbina("Paolo", "Rossi") == 1
+    assert indice.abbina("Luca", "Rossi") is None
+
+def test_modifica_fuori_ricarica_non_viene_registrata():
+    indice = NameIndex.da_righe([(1, "Marco", "Rossi")])
+    indice.aggiorna(1, "Luca", "Bianchi")
+    assert indice._modifiche == {}
+    assert indice.cerca("Luca Bianchi", limit=1)[0]["codice_cliente"] == 1
+
+def indice_clienti() -> NameIndex:
+    return NameIndex.da_righe([(1, "Mario", "Rossi"), (2, "Anna", "Bianchi"), (3, "Giulia", "Verdi"), (4, "Luca", "Russo")])
+
+def test_solo_nome_o_solo_cognome_non_abbinano_un_cliente():
+    indice = indice_clienti()
+    assert indice.abbina("Mario", None) is None
+    assert indice.abbina(None, "Rossi") is None
+    assert indice.abbina("Rossi", None) is None
+    assert indice.abbina("Anna", "") is None
+
+def test_errori_di_trascrizione_abbinano_il_cliente():
+    indice = indice_clienti()
+    assert indice.abbina("Mario", "Rosi") == 1
+    assert indice.abbina("Anna", "Bianki") == 2
+    assert indice.abbina("Rossi", "Mario") == 1
+
+def test_nome_diverso_non_abbina():
+    indice = indice_clienti()
+    assert indice.abbina("Paolo", "Neri") is None
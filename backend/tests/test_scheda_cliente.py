@@ -0,0 +1,56 @@
+import asyncio
+import json
+from app import scheda_cliente
+
+CLIENTE = {
+    "codice_cliente": 7, "nome": "Anna", "cognome": "Rossi", "eta": 41, "luogo_di_nascita": "Roma",
+    "luogo_di_residenza": "Roma", "professione": "Medico", "reddito": 50000, "reddito_familiare": 80000,
+    "numero_figli": 1, "anzianita_con_la_compagnia": 5, "stato_civile": "Sposata",
+    "numero_familiari_a_carico": 1, "reddito_stimato": 51000, "patrimonio_finanziario_stimato": 1.5,
+    "patrimonio_reale_stimato": 2.5, "consumi_stimati": 3.5, "propensione_acquisto_prodotti_vita": 0.4,
+    "propensione_acquisto_prodotti_danni": 0.6, "valore_immobiliare_medio": 4.5,
+    "probabilita_furti_stimata": 0.1, "probabilita_rapine_stimata": 0.2, "zona_di_residenza": "Centro",
+    "agenzia": "Roma 1",
+    # a column that is not part of the API
+    "codice_fiscale": "RSSNNA84A41H501X",
+}
+
+class Risultato:
+    def __init__(self, note: list):
+        self.note = note
+
+    def mappings(self):
+        return self
+
+    def first(self):
+        # json columns arrive as text from asyncpg
+        return {"cliente": json.dumps(CLIENTE), "polizze": "[]", "reclami_info": "[]", "sinistri": "[]", "note": json.dumps(self.note)}
+
+class Sessione:
+    def __init__(self, note: list = (), durante_la_lettura=None):
+        self.note = list(note)
+        self.durante_la_lettura = durante_la_lettura
+
+    async def execute(self, *args):
+        if self.durante_la_lettura:
+            self.durante_la_lettura()
+        return Risultato(self.note)
+
+def test_scheda_validata_prima_della_cache():
+    scheda_cliente.scheda_cache.invalidate(7)
+    scheda = asyncio.run(scheda_cliente.get_scheda_cliente(Sessione(), 7))
+    assert "codice_fiscale" not in scheda["cliente"]
+    assert scheda["cliente"]["reddito_stimato"] == 51000.0
+    assert scheda_cliente.scheda_cache.get(7) == scheda
+
+def test_nota_con_campi_null():
+    scheda_cliente.scheda_cache.invalidate(7)
+    nota = {"id_nota": 1, "codice_cliente": 7, "nome": None, "cognome": None, "nota": None}
+    scheda = asyncio.run(scheda_cliente.get_scheda_cliente(Sessione([nota]), 7))
+    assert scheda["note"] == [nota]
+
+def test_scrittura_durante_la_lettura_non_entra_in_cache():
+    scheda_cliente.scheda_cache.invalidate(7)
+    sessione = Sessione(durante_la_lettura=lambda: scheda_cliente.invalidate_scheda(7))
+    asyncio.run(scheda_cliente.get_scheda_cliente(sessione, 7))
+    assert scheda_cliente.scheda_cache.get(7) is None
@@ -0,0 +1,26 @@
+import sqlite3
+import pytest
+from app.vector_store import VectorStore
+
+def scrivi(store: VectorStore, versione: str):
+    frammenti = [("a.md", 0, "h1", "polizza vita"), ("a.md", 1, "h2", "polizza danni")]
+    store.scrivi("modello", versione, {"a.md": ("firma", versione)}, frammenti, {"h1": [1.0, 0.0], "h2": [0.0, 1.0]})
+
+def test_ricarica_chiude_la_connessione_precedente(tmp_path):
+    store = VectorStore(str(tmp_path))
+    scrivi(store, "v1")
+    precedente = store._conn
+    scrivi(store, "v2")
+    with pytest.raises(sqlite3.ProgrammingError):
+        precedente.execute("SELECT 1")
+    assert store.cerca([1.0, 0.0], k=1)[0][2] == "polizza vita"
+
+def test_lettura_in_corso_tiene_aperta_la_connessione_fino_alla_fine(tmp_path):
+    store = VectorStore(str(tmp_path))
+    scrivi(store, "v1")
+    with store._lettura() as (_, conn, _):
+        scrivi(store, "v2")
+        assert conn.execute("SELECT count(*) FROM frammenti").fetchone() == (2,)
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert store._lettori == {}
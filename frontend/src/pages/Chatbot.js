@@ -102,6 +102,8 @@ const Chatbot = () => {
   ]);
   const [input, setInput] = useState('');
   const messagesEndRef = useRef(null);
+  // one conversation per page load: the backend keeps its history under this id
+  const sessionId = useRef(crypto.randomUUID());
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -111,30 +113,62 @@ const Chatbot = () => {
     scrollToBottom();
   }, [messages]);
 
+  // parses the Server-Sent Events of /chatbot/stream, calling onDelta for every fragment
+  const readEventStream = async (response, onDelta) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const rawEvent of events) {
+        let eventName = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach((line) => {
+          if (line.startsWith('event: ')) eventName = line.slice(7);
+          if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        const payload = data ? JSON.parse(data) : {};
+        if (eventName === 'errore') throw new Error(payload.detail);
+        if (eventName === 'message' && payload.delta) onDelta(payload.delta);
+      }
+    }
+  };
+
   const handleSend = async () => {
     if (input.trim() === '') return;
 
-    setMessages(prev => [...prev, { sender: 'user', text: input }]);
+    const question = input;
+    setInput('');
+    setMessages(prev => [...prev, { sender: 'user', text: question }, { sender: 'bot', text: '' }]);
+    const updateBotMessage = (text) => {
+      setMessages(prev => [...prev.slice(0, -1), { sender: 'bot', text }]);
+    };
     try {
-      const response = await fetch(`${API_BASE_URL}/chatbot`, {
+      const response = await fetch(`${API_BASE_URL}/chatbot/stream`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json"
         },
-        body: JSON.stringify({ question: input })
+        body: JSON.stringify({ question, session_id: sessionId.current })
       });
       if (!response.ok) {
         throw new Error("Errore nella chiamata API");
       }
-      const data = await response.json();
-      const botResponseRaw = data.answer;
-      const botResponse = cleanBotResponse(botResponseRaw);
-      setMessages(prev => [...prev, { sender: 'bot', text: botResponse }]);
+      let botResponseRaw = '';
+      await readEventStream(response, (delta) => {
+        botResponseRaw += delta;
+        // hide a tag that is still arriving
+        updateBotMessage(cleanBotResponse(botResponseRaw.replace(/<\/?[a-z]*$/, '')));
+      });
+      updateBotMessage(cleanBotResponse(botResponseRaw));
     } catch (error) {
       console.error("Errore:", error);
-      setMessages(prev => [...prev, { sender: 'bot', text: "Si è verificato un errore con il chatbot." }]);
+      updateBotMessage("Si è verificato un errore con il chatbot.");
     }
-    setInput('');
   };
 
   const handleKeyPress = (e) => {
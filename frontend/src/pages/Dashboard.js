@@ -136,7 +136,9 @@ const handleCheckboxChange = (e, value, selectedArray, setSelectedArray) => {
 };
 
 const FilterPanel = ({
-  clienti,
+  etaMin,
+  etaMax,
+  uniqueProfessions,
   selectedAgeRange,
   setSelectedAgeRange,
   selectedProfession,
@@ -152,22 +154,19 @@ const FilterPanel = ({
   propVitaLabels,
   propDanniLabels,
 }) => {
-  const uniqueAges = [...new Set(clienti.map(cliente => cliente.eta))].sort((a, b) => a - b);
-  const uniqueProfessions = [...new Set(clienti.map(cliente => cliente.professione))].filter(Boolean);
-
   return (
     <div>
       {/* Slider per l'età */}
       <div style={{ marginBottom: '1rem' }}>
         <label><strong>Età:</strong></label>
         <br />
-        {uniqueAges.length > 0 && (
+        {etaMin != null && etaMax != null && (
           <div style={{ margin: '0 10px' }}>
             <Slider
               range
-              min={uniqueAges[0]}
-              max={uniqueAges[uniqueAges.length - 1]}
-              defaultValue={[uniqueAges[0], uniqueAges[uniqueAges.length - 1]]}
+              min={etaMin}
+              max={etaMax}
+              defaultValue={[etaMin, etaMax]}
               value={selectedAgeRange}
               onChange={setSelectedAgeRange}
             />
@@ -252,11 +251,7 @@ const FilterPanel = ({
 };
 
 const Dashboard = () => {
-  // Define the bins for the propensione ranges
-  const propVitaBins = [0, 0.21, 0.41, 0.61, 0.81, 1.01];
-  const propDanniBins = [0, 0.21, 0.41, 0.61, 0.81, 1.01];
-
-  const [clienti, setClienti] = useState([]);
+  const [stats, setStats] = useState(null);
   const [selectedAgeRange, setSelectedAgeRange] = useState(null);
   const [selectedProfession, setSelectedProfession] = useState([]);
   const [selectedIncomeBin, setSelectedIncomeBin] = useState([]);
@@ -272,101 +267,42 @@ const Dashboard = () => {
   const propVitaLabels = ['0 - 0.20', '0.21 - 0.40', '0.41 - 0.60', '0.61 - 0.80', '0.81 - 1'];
   const propDanniLabels = ['0 - 0.20', '0.21 - 0.40', '0.41 - 0.60', '0.61 - 0.80', '0.81 - 1'];
 
-  // Retrieve the clients for the main charts
+  // Retrieve the histograms computed by the backend for the selected filters
   useEffect(() => {
-    const fetchClienti = async () => {
-      try {
-        const response = await fetch(`${API_BASE_URL}/clienti`);
-        if (!response.ok) throw new Error(`HTTP error: ${response.status}`);
-        const data = await response.json();
-        setClienti(data);
-        if (data.length > 0) {
-          const ages = data.map(cliente => cliente.eta);
-          setSelectedAgeRange([Math.min(...ages), Math.max(...ages)]);
-        }
-      } catch (error) {
-        console.error("Errore nel recupero dei clienti:", error);
+    const fetchStats = async () => {
+      const params = new URLSearchParams();
+      if (selectedAgeRange) {
+        params.append('eta_min', selectedAgeRange[0]);
+        params.append('eta_max', selectedAgeRange[1]);
       }
-    };
-    fetchClienti();
-  }, []);
-
-  // Retrieve the policies for the extra charts
-  const [polizze, setPolizze] = useState([]);
-  useEffect(() => {
-    const fetchPolizze = async () => {
+      selectedProfession.forEach(p => params.append('professione', p));
+      selectedIncomeBin.forEach(b => params.append('reddito', b));
+      selectedPropRange.forEach(r => params.append('prop_vita', r));
+      selectedPropDanni.forEach(r => params.append('prop_danni', r));
       try {
-        const response = await fetch(`${API_BASE_URL}/polizze`);
+        const response = await fetch(`${API_BASE_URL}/dashboard/clienti?${params.toString()}`);
         if (!response.ok) throw new Error(`HTTP error: ${response.status}`);
         const data = await response.json();
-        setPolizze(data);
+        setStats(data);
+        if (!selectedAgeRange && data.eta_min != null && data.eta_max != null) {
+          setSelectedAgeRange([data.eta_min, data.eta_max]);
+        }
       } catch (error) {
-        console.error("Errore nel recupero delle polizze:", error);
+        console.error("Errore nel recupero delle statistiche:", error);
       }
     };
-    fetchPolizze();
-  }, []);
-
-  // Filter the clients based on the selected filters
-  const getFilteredClienti = () => {
-    let data = clienti;
-    if (selectedAgeRange) {
-      data = data.filter(cliente =>
-        cliente.eta >= selectedAgeRange[0] && cliente.eta <= selectedAgeRange[1]
-      );
-    }
-    if (selectedProfession.length > 0) {
-      data = data.filter(cliente => selectedProfession.includes(cliente.professione));
-    }
-    if (selectedIncomeBin.length > 0) {
-      data = data.filter(cliente =>
-        selectedIncomeBin.some(binStr => {
-          const parts = binStr.split('-');
-          const low = Number(parts[0]);
-          const high = parts[1] === '+' ? Infinity : Number(parts[1]);
-          return cliente.reddito >= low && (high === Infinity ? true : cliente.reddito < high);
-        })
-      );
-    }
-    if (selectedPropRange.length > 0) {
-      data = data.filter(cliente =>
-        selectedPropRange.some(rangeStr => {
-          const [lowStr, highStr] = rangeStr.split('-').map(s => s.trim());
-          const low = Number(lowStr);
-          const high = Number(highStr);
-          return Number(cliente.propensione_acquisto_prodotti_vita) >= low &&
-                 Number(cliente.propensione_acquisto_prodotti_vita) < high;
-        })
-      );
-    }
-    if (selectedPropDanni.length > 0) {
-      data = data.filter(cliente =>
-        selectedPropDanni.some(rangeStr => {
-          const [lowStr, highStr] = rangeStr.split('-').map(s => s.trim());
-          const low = Number(lowStr);
-          const high = Number(highStr);
-          return Number(cliente.propensione_acquisto_prodotti_danni) >= low &&
-                 Number(cliente.propensione_acquisto_prodotti_danni) < high;
-        })
-      );
-    }
-    return data;
-  };
+    fetchStats();
+  }, [selectedAgeRange, selectedProfession, selectedIncomeBin, selectedPropRange, selectedPropDanni]);
 
-  const filteredClienti = getFilteredClienti();
+  const bucketLabels = (key) => (stats ? stats[key].map(b => b.label) : []);
+  const bucketCounts = (key) => (stats ? stats[key].map(b => b.count) : []);
 
   // Grafico: Distribuzione Età
-  const ageCounts = {};
-  filteredClienti.forEach(cliente => {
-    ageCounts[cliente.eta] = (ageCounts[cliente.eta] || 0) + 1;
-  });
-  const uniqueAgesForChart = Object.keys(ageCounts).map(Number).sort((a, b) => a - b);
-  const ageCountsArray = uniqueAgesForChart.map(age => ageCounts[age]);
   const ageData = {
-    labels: uniqueAgesForChart || [],
+    labels: bucketLabels('eta'),
     datasets: [{
       label: 'Numero di clienti',
-      data: ageCountsArray || [],
+      data: bucketCounts('eta'),
       backgroundColor: 'rgba(75, 192, 192, 0.6)',
     }]
   };
@@ -384,16 +320,10 @@ const Dashboard = () => {
   };
 
   // Grafico: Distribuzione Professioni
-  const professionCounts = {};
-  filteredClienti.forEach(cliente => {
-    if (cliente.professione) {
-      professionCounts[cliente.professione] = (professionCounts[cliente.professione] || 0) + 1;
-    }
-  });
   const pieData = {
-    labels: Object.keys(professionCounts),
+    labels: bucketLabels('professioni'),
     datasets: [{
-      data: Object.values(professionCounts),
+      data: bucketCounts('professioni'),
       backgroundColor: [
         '#FF6384', '#36A2EB', '#FFCE56', '#8e44ad', '#2980b9',
         '#27ae60', '#e67e22', '#e74c3c', '#1abc9c', '#f1c40f', '#2ecc71'
@@ -427,23 +357,11 @@ const Dashboard = () => {
   };
 
   // Grafico: Distribuzione Reddito
-  const incomeCounts = new Array(incomeLabels.length).fill(0);
-  filteredClienti.forEach(cliente => {
-    const income = cliente.reddito;
-    const binIdx = incomeBins.findIndex((bound, idx) =>
-      idx < incomeBins.length - 1 &&
-      income >= bound &&
-      income < incomeBins[idx + 1]
-    );
-    if (binIdx !== -1) {
-      incomeCounts[binIdx]++;
-    }
-  });
   const incomeData = {
     labels: incomeLabels,
     datasets: [{
       label: 'Numero di clienti',
-      data: incomeCounts,
+      data: bucketCounts('reddito'),
       backgroundColor: 'rgba(153, 102, 255, 0.6)',
     }]
   };
@@ -472,25 +390,11 @@ const Dashboard = () => {
   };
 
   // Grafico: Distribuzione Propensione Prodotti Vita
-  const propVitaCounts = new Array(propVitaLabels.length).fill(0);
-  filteredClienti.forEach(cliente => {
-    const prop = Number(cliente.propensione_acquisto_prodotti_vita);
-    if (!isNaN(prop)) {
-      const binIdx = propVitaBins.findIndex((bound, idx) =>
-        idx < propVitaBins.length - 1 &&
-        prop >= bound &&
-        prop < propVitaBins[idx + 1]
-      );
-      if (binIdx !== -1) {
-        propVitaCounts[binIdx]++;
-      }
-    }
-  });
   const propVitaData = {
     labels: propVitaLabels,
     datasets: [{
       label: 'Prodotti Vita',
-      data: propVitaCounts,
+      data: bucketCounts('propensione_vita'),
       backgroundColor: ['#FF9F40', '#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0'],
     }]
   };
@@ -519,25 +423,11 @@ const Dashboard = () => {
   };
 
   // Grafico: Distribuzione Propensione Prodotti Danni
-  const propDanniCounts = new Array(propDanniLabels.length).fill(0);
-  filteredClienti.forEach(cliente => {
-    const prop = Number(cliente.propensione_acquisto_prodotti_danni);
-    if (!isNaN(prop)) {
-      const binIdx = propDanniBins.findIndex((bound, idx) =>
-        idx < propDanniBins.length - 1 &&
-        prop >= bound &&
-        prop < propDanniBins[idx + 1]
-      );
-      if (binIdx !== -1) {
-        propDanniCounts[binIdx]++;
-      }
-    }
-  });
   const propDanniData = {
     labels: propDanniLabels,
     datasets: [{
       label: 'Prodotti Danni',
-      data: propDanniCounts,
+      data: bucketCounts('propensione_danni'),
       backgroundColor: ['#FF6384', '#36A2EB', '#FFCE56', '#8e44ad', '#27ae60'],
     }]
   };
@@ -565,45 +455,26 @@ const Dashboard = () => {
     }
   };
 
-  // Filter the policies based on the selected clients
-  const getFilteredPolizze = () => {
-    return polizze.filter(polizza =>
-      filteredClienti.some(cliente => cliente.codice_cliente === polizza.codice_cliente)
-    );
-  };
-
-  // Aggregate data from extra policies by product and need area
-  const aggregatedProducts = {};
-  const aggregatedAreas = {};
-  getFilteredPolizze().forEach(polizza => {
-    if (polizza.prodotto) {
-      aggregatedProducts[polizza.prodotto] = (aggregatedProducts[polizza.prodotto] || 0) + 1;
-    }
-    if (polizza.area_di_bisogno) {
-      aggregatedAreas[polizza.area_di_bisogno] = (aggregatedAreas[polizza.area_di_bisogno] || 0) + 1;
-    }
-  });
-
   const productsColors = ['#FF6384', '#36A2EB', '#FFCE56', '#8e44ad', '#27ae60'];
   const areasColors = ['#FF6384', '#36A2EB', '#FFCE56'];
 
   const extraProductsData = {
-    labels: Object.keys(aggregatedProducts),
+    labels: bucketLabels('prodotti'),
     datasets: [{
       label: 'Prodotti',
-      data: Object.values(aggregatedProducts),
-      backgroundColor: Object.keys(aggregatedProducts).map((_, idx) =>
+      data: bucketCounts('prodotti'),
+      backgroundColor: bucketLabels('prodotti').map((_, idx) =>
         productsColors[idx % productsColors.length]
       )
     }]
   };
 
   const extraAreasData = {
-    labels: Object.keys(aggregatedAreas),
+    labels: bucketLabels('aree_di_bisogno'),
     datasets: [{
       label: 'Aree di bisogno',
-      data: Object.values(aggregatedAreas),
-      backgroundColor: Object.keys(aggregatedAreas).map((_, idx) =>
+      data: bucketCounts('aree_di_bisogno'),
+      backgroundColor: bucketLabels('aree_di_bisogno').map((_, idx) =>
         areasColors[idx % areasColors.length]
       )
     }]
@@ -619,9 +490,8 @@ const Dashboard = () => {
   };
 
   const resetFiltersAndExtra = () => {
-    if (clienti.length) {
-      const ages = clienti.map(cliente => cliente.eta);
-      setSelectedAgeRange([Math.min(...ages), Math.max(...ages)]);
+    if (stats && stats.eta_min != null && stats.eta_max != null) {
+      setSelectedAgeRange([stats.eta_min, stats.eta_max]);
     }
     setSelectedProfession([]);
     setSelectedIncomeBin([]);
@@ -707,7 +577,9 @@ const Dashboard = () => {
         {/* Pannello dei filtri */}
         <FilterContainer>
           <FilterPanel
-            clienti={clienti}
+            etaMin={stats ? stats.eta_min : null}
+            etaMax={stats ? stats.eta_max : null}
+            uniqueProfessions={stats ? stats.professioni_disponibili : []}
             selectedAgeRange={selectedAgeRange}
             setSelectedAgeRange={setSelectedAgeRange}
             selectedProfession={selectedProfession}
@@ -62,6 +62,30 @@ const SearchContainer = styled.div`
   display: flex;
   justify-content: flex-end;
   margin-bottom: 10px;
+  position: relative;
+`;
+
+const SuggestionsList = styled.ul`
+  position: absolute;
+  top: 100%;
+  right: 0;
+  z-index: 10;
+  min-width: 250px;
+  margin: 0;
+  padding: 0;
+  list-style: none;
+  background: #fff;
+  border: 1px solid #ddd;
+  border-radius: 4px;
+  box-shadow: 0 2px 6px rgba(0,0,0,0.15);
+`;
+
+const SuggestionItem = styled.li`
+  padding: 6px 12px;
+  cursor: pointer;
+  &:hover {
+    background-color: #f0f0f0;
+  }
 `;
 
 const SearchInput = styled.input`
@@ -191,6 +215,7 @@ const ListItem = styled.li`
 const Database = () => {
   const [clienti, setClienti] = useState([]);
   const [searchQuery, setSearchQuery] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
   const [currentPage, setCurrentPage] = useState(1);
   const resultsPerPage = 20;
 
@@ -205,18 +230,52 @@ const Database = () => {
   const [showNotesModal, setShowNotesModal] = useState(false);
   const [newNoteText, setNewNoteText] = useState('');
 
+  // cursors[i] is the cursor that loads page i + 1 (null for the first page)
+  const [cursors, setCursors] = useState([null]);
+  const [nextCursor, setNextCursor] = useState(null);
+
   useEffect(() => {
     const fetchClienti = async () => {
+      const params = new URLSearchParams({ limit: resultsPerPage });
+      if (searchQuery.trim()) params.append('q', searchQuery.trim());
+      if (sortKey) params.append('order_by', sortDirection === 'desc' ? `-${sortKey}` : sortKey);
+      const cursor = cursors[currentPage - 1];
+      if (cursor) params.append('cursor', cursor);
       try {
-        const response = await fetch(`${API_BASE_URL}/clienti`);
+        const response = await fetch(`${API_BASE_URL}/clienti?${params.toString()}`);
         const data = await response.json();
         setClienti(data);
+        setNextCursor(response.headers.get('X-Next-Cursor'));
       } catch (error) {
         console.error("Errore nel recuperare i dati", error);
       }
     };
     fetchClienti();
-  }, []);
+  }, [searchQuery, sortKey, sortDirection, currentPage, cursors]);
+
+  // type-ahead on customer names, tolerant to typos (debounced)
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (query.length < 2 || /^\d+$/.test(query)) {
+      setSuggestions([]);
+      return;
+    }
+    const timeout = setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({ q: query, limit: 8 });
+        const response = await fetch(`${API_BASE_URL}/clienti/suggerimenti?${params.toString()}`);
+        setSuggestions(response.ok ? await response.json() : []);
+      } catch (error) {
+        console.error("Errore nel recuperare i suggerimenti", error);
+      }
+    }, 200);
+    return () => clearTimeout(timeout);
+  }, [searchQuery]);
+
+  const resetPagination = () => {
+    setCursors([null]);
+    setCurrentPage(1);
+  };
 
   const handleSort = (key) => {
     if (sortKey === key) {
@@ -225,31 +284,15 @@ const Database = () => {
       setSortKey(key);
       setSortDirection('asc');
     }
+    resetPagination();
   };
 
-  const filteredClienti = clienti.filter(cliente =>
-    cliente.codice_cliente.toString().includes(searchQuery) ||
-    cliente.nome.toLowerCase().includes(searchQuery.toLowerCase()) ||
-    cliente.cognome.toLowerCase().includes(searchQuery.toLowerCase()) ||
-    cliente.professione.toLowerCase().includes(searchQuery.toLowerCase()) ||
-    cliente.luogo_di_residenza.toLowerCase().includes(searchQuery.toLowerCase())
-  );
-
-  const sortedClienti = sortKey
-    ? [...filteredClienti].sort((a, b) => {
-        if (a[sortKey] < b[sortKey]) return sortDirection === 'asc' ? -1 : 1;
-        if (a[sortKey] > b[sortKey]) return sortDirection === 'asc' ? 1 : -1;
-        return 0;
-      })
-    : filteredClienti;
-
-  const indexOfLastResult = currentPage * resultsPerPage;
-  const indexOfFirstResult = indexOfLastResult - resultsPerPage;
-  const currentResults = sortedClienti.slice(indexOfFirstResult, indexOfLastResult);
-  const totalPages = Math.ceil(sortedClienti.length / resultsPerPage);
+  const currentResults = clienti;
 
   const goToNextPage = () => {
-    setCurrentPage(prev => Math.min(prev + 1, totalPages));
+    if (!nextCursor) return;
+    setCursors(prev => [...prev.slice(0, currentPage), nextCursor]);
+    setCurrentPage(prev => prev + 1);
   };
 
   const goToPrevPage = () => {
@@ -258,7 +301,7 @@ const Database = () => {
 
   const handleSearchChange = (e) => {
     setSearchQuery(e.target.value);
-    setCurrentPage(1);
+    resetPagination();
   };
 
   const openEditModal = (cliente) => {
@@ -271,7 +314,7 @@ const Database = () => {
 
   const openDetails = async (codice_cliente) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/clienti/${codice_cliente}`);
+      const response = await fetch(`${API_BASE_URL}/clienti/${codice_cliente}/scheda`);
       const data = await response.json();
       setSelectedDetails(data);
       setShowDetailsModal(true);
@@ -287,12 +330,10 @@ const Database = () => {
 
   const openNotes = async (codice_cliente) => {
     try {
-      const clientResponse = await fetch(`${API_BASE_URL}/clienti/${codice_cliente}`);
-      const clientData = await clientResponse.json();
-      setSelectedDetails(clientData);
-      const response = await fetch(`${API_BASE_URL}/clienti/${codice_cliente}/note`);
+      const response = await fetch(`${API_BASE_URL}/clienti/${codice_cliente}/scheda`);
       const data = await response.json();
-      setNotes(data);
+      setSelectedDetails(data);
+      setNotes(data.note);
       setShowNotesModal(true);
     } catch (error) {
       console.error("Errore nel recuperare le note", error);
@@ -353,7 +394,23 @@ const Database = () => {
           placeholder="Cerca..."
           value={searchQuery}
           onChange={handleSearchChange}
+          onBlur={() => setTimeout(() => setSuggestions([]), 150)}
         />
+        {suggestions.length > 0 && (
+          <SuggestionsList>
+            {suggestions.map((suggestion) => (
+              <SuggestionItem
+                key={suggestion.codice_cliente}
+                onMouseDown={() => {
+                  setSuggestions([]);
+                  openDetails(suggestion.codice_cliente);
+                }}
+              >
+                {suggestion.nome} {suggestion.cognome} ({suggestion.codice_cliente})
+              </SuggestionItem>
+            ))}
+          </SuggestionsList>
+        )}
       </SearchContainer>
       <StyledTable>
         <thead>
@@ -397,8 +454,8 @@ const Database = () => {
         <PaginationButton onClick={goToPrevPage} disabled={currentPage === 1}>
           Prev
         </PaginationButton>
-        <span>Pagina {currentPage} di {totalPages}</span>
-        <PaginationButton onClick={goToNextPage} disabled={currentPage === totalPages}>
+        <span>Pagina {currentPage}</span>
+        <PaginationButton onClick={goToNextPage} disabled={!nextCursor}>
           Next
         </PaginationButton>
       </PaginationContainer>
@@ -118,26 +118,16 @@ const ModalContent = styled.div`
 // ------ API Fetching and Memoization ------
 
 const PolizzeDashboard = () => {
-  // State for API data
-  const [polizze, setPolizze] = useState([]);
-  const [reclami, setReclami] = useState([]);
-  const [sinistri, setSinistri] = useState([]);
+  // Per-product and per-area totals precomputed by the backend
+  const [rollup, setRollup] = useState({ prodotti: [], aree_di_bisogno: [] });
 
   // Fetch API calls only once
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [polizzeRes, reclamiRes, sinistriRes] = await Promise.all([
-          fetch(`${API_BASE_URL}/polizze`),
-          fetch(`${API_BASE_URL}/reclami_info`),
-          fetch(`${API_BASE_URL}/sinistri`)
-        ]);
-        const polizzeData = await polizzeRes.json();
-        const reclamiData = await reclamiRes.json();
-        const sinistriData = await sinistriRes.json();
-        setPolizze(polizzeData);
-        setReclami(reclamiData);
-        setSinistri(sinistriData);
+        const response = await fetch(`${API_BASE_URL}/polizze/rollup`);
+        const data = await response.json();
+        setRollup(data);
       } catch (error) {
         console.error("Error fetching data:", error);
       }
@@ -148,91 +138,57 @@ const PolizzeDashboard = () => {
   // ------ Data Processing for Charts ------
 
   // Memoize policies per product
-  const polizzeProdottoData = useMemo(() => {
-    const data = {};
-    polizze.forEach(p => {
-      const prodotto = p.prodotto;
-      if (prodotto) {
-        data[prodotto] = (data[prodotto] || 0) + 1;
+  const polizzeProdottoData = useMemo(() => ({
+    labels: rollup.prodotti.map(p => p.label),
+    datasets: [
+      {
+        label: 'Numero di polizze per prodotto',
+        data: rollup.prodotti.map(p => p.numero_polizze),
+        backgroundColor: 'rgba(54, 235, 114, 0.6)',
       }
-    });
-    return {
-      labels: Object.keys(data),
-      datasets: [
-        {
-          label: 'Numero di polizze per prodotto',
-          data: Object.values(data),
-          backgroundColor: 'rgba(54, 235, 114, 0.6)',
-        }
-      ]
-    };
-  }, [polizze]);
+    ]
+  }), [rollup]);
 
   // Memoize policies per need area
   const polizzeAreaData = useMemo(() => {
-    const data = {};
-    polizze.forEach(p => {
-      const area = p.area_di_bisogno;
-      if (area) {
-        data[area] = (data[area] || 0) + 1;
-      }
-    });
     const bgColors = [
       '#FF6384', '#36A2EB', '#FFCE56', '#8e44ad', '#2980b9', '#27ae60'
     ];
     return {
-      labels: Object.keys(data),
+      labels: rollup.aree_di_bisogno.map(a => a.label),
       datasets: [
         {
           label: 'Policies per Need Area',
-          data: Object.values(data),
-          backgroundColor: bgColors.slice(0, Object.keys(data).length),
+          data: rollup.aree_di_bisogno.map(a => a.numero_polizze),
+          backgroundColor: bgColors.slice(0, rollup.aree_di_bisogno.length),
         }
       ]
     };
-  }, [polizze]);
+  }, [rollup]);
 
   // Complaints per product
-  const reclamiData = useMemo(() => {
-    const data = {};
-    reclami.forEach(r => {
-      const prodotto = r.prodotto;
-      if (prodotto) {
-        data[prodotto] = (data[prodotto] || 0) + 1;
+  const reclamiData = useMemo(() => ({
+    labels: rollup.prodotti.map(p => p.label),
+    datasets: [
+      {
+        label: 'Reclami per prodotto',
+        data: rollup.prodotti.map(p => p.numero_reclami_info),
+        backgroundColor: 'rgba(138, 118, 54, 0.6)',
       }
-    });
-    return {
-      labels: Object.keys(data),
-      datasets: [
-        {
-          label: 'Reclami per prodotto',
-          data: Object.values(data),
-          backgroundColor: 'rgba(138, 118, 54, 0.6)',
-        }
-      ]
-    };
-  }, [reclami]);
+    ]
+  }), [rollup]);
 
   // Claims per product
-  const sinistriData = useMemo(() => {
-    const data = {};
-    sinistri.forEach(s => {
-      const prodotto = s.prodotto;
-      if (prodotto) {
-        data[prodotto] = (data[prodotto] || 0) + 1;
+  const sinistriData = useMemo(() => ({
+    labels: rollup.prodotti.map(p => p.label),
+    datasets: [
+      {
+        label: 'Sinistri per prodotto',
+        data: rollup.prodotti.map(p => p.numero_sinistri),
+        backgroundColor: 'rgba(199, 54, 235, 0.6)',
       }
-    });
-    return {
-      labels: Object.keys(data),
-      datasets: [
-        {
-          label: 'Sinistri per prodotto',
-          data: Object.values(data),
-          backgroundColor: 'rgba(199, 54, 235, 0.6)',
-        }
-      ]
-    };
-  }, [sinistri]);
+    ]
+  }), [rollup]);
 
   // Common chart options
   const commonOptions = {
@@ -244,23 +200,19 @@ const PolizzeDashboard = () => {
   // Aggregate data from extra policies by product and need area
   const aggregatedProducts = useMemo(() => {
     const data = {};
-    polizze.forEach(p => {
-      if (p.prodotto) {
-        data[p.prodotto] = (data[p.prodotto] || 0) + 1;
-      }
+    rollup.prodotti.forEach(p => {
+      data[p.label] = p.numero_polizze;
     });
     return data;
-  }, [polizze]);
+  }, [rollup]);
 
   const aggregatedAreas = useMemo(() => {
     const data = {};
-    polizze.forEach(p => {
-      if (p.area_di_bisogno) {
-        data[p.area_di_bisogno] = (data[p.area_di_bisogno] || 0) + 1;
-      }
+    rollup.aree_di_bisogno.forEach(a => {
+      data[a.label] = a.numero_polizze;
     });
     return data;
-  }, [polizze]);
+  }, [rollup]);
 
   // 5 colors for products and 3 for areas
   const productsColors = ['#FF6384', '#36A2EB', '#FFCE56', '#8e44ad', '#27ae60'];
@@ -70,15 +70,35 @@ const Button = styled.button`
   }
 `;
 
-const FeaturePlaceholder = styled.div`
-  text-align: center;
+const LiveTranscript = styled.div`
+  width: 100%;
+  min-height: 3rem;
+  margin-top: 1rem;
   padding: 1rem;
   border: 1px dashed #ccc;
   border-radius: 6px;
-  font-style: italic;
+  color: #333;
+`;
+
+const PartialText = styled.span`
   color: #888;
+  font-style: italic;
 `;
 
+const STREAM_SAMPLE_RATE = 16000;
+
+// Float32 samples at the AudioContext rate -> 16 kHz signed 16-bit PCM
+const toPcm16 = (input, inputRate) => {
+  const ratio = inputRate / STREAM_SAMPLE_RATE;
+  const length = Math.floor(input.length / ratio);
+  const output = new Int16Array(length);
+  for (let i = 0; i < length; i++) {
+    const sample = Math.max(-1, Math.min(1, input[Math.floor(i * ratio)]));
+    output[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+  }
+  return output.buffer;
+};
+
 const ResultContainer = styled.div`
   margin-top: 2rem;
   padding: 1.5rem;
@@ -127,8 +147,12 @@ const InfoValue = styled.td`
 const VoiceAssistant = () => {
   const [uploadResult, setUploadResult] = useState(null);
   const [loading, setLoading] = useState(false);
-  const [selectedFile, setSelectedFile] = useState(null);
+  const [selectedFiles, setSelectedFiles] = useState([]);
+  const [recording, setRecording] = useState(false);
+  const [segments, setSegments] = useState([]);
+  const [partial, setPartial] = useState("");
   const messagesEndRef = useRef(null);
+  const streamRef = useRef(null);
 
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -155,14 +179,110 @@ const VoiceAssistant = () => {
     setLoading(false);
   };
 
+  const stopAudio = () => {
+    const current = streamRef.current;
+    if (!current || current.stopped) return;
+    current.stopped = true;
+    current.processor.disconnect();
+    current.source.disconnect();
+    current.media.getTracks().forEach((track) => track.stop());
+    current.audioContext.close();
+  };
+
+  const startRecording = async () => {
+    setUploadResult(null);
+    setSegments([]);
+    setPartial("");
+    try {
+      const media = await navigator.mediaDevices.getUserMedia({ audio: true });
+      const socket = new WebSocket(`${API_BASE_URL.replace(/^http/, "ws")}/assistente-vocale/stream`);
+      socket.binaryType = "arraybuffer";
+      const audioContext = new (window.AudioContext || window.webkitAudioContext)();
+      const source = audioContext.createMediaStreamSource(media);
+      const processor = audioContext.createScriptProcessor(4096, 1, 1);
+      processor.onaudioprocess = (e) => {
+        if (socket.readyState === WebSocket.OPEN) {
+          socket.send(toPcm16(e.inputBuffer.getChannelData(0), audioContext.sampleRate));
+        }
+      };
+      socket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.tipo === "parziale") {
+          setPartial(message.testo);
+        } else if (message.tipo === "risultato") {
+          setSegments((prev) => [...prev, message.testo]);
+          setPartial("");
+        } else if (message.tipo === "finale") {
+          setUploadResult(message);
+          setLoading(false);
+        } else if (message.tipo === "errore") {
+          setUploadResult({ error: message.dettaglio });
+          setLoading(false);
+        }
+      };
+      socket.onclose = () => {
+        stopAudio();
+        streamRef.current = null;
+        setRecording(false);
+        setLoading(false);
+      };
+      source.connect(processor);
+      processor.connect(audioContext.destination);
+      streamRef.current = { socket, media, audioContext, source, processor };
+      setRecording(true);
+    } catch (error) {
+      console.error("Error:", error);
+      setUploadResult({ error: error.message });
+    }
+  };
+
+  const stopRecording = () => {
+    const current = streamRef.current;
+    if (!current) return;
+    stopAudio();
+    setRecording(false);
+    setLoading(true);
+    if (current.socket.readyState === WebSocket.OPEN) {
+      current.socket.send("fine");
+    }
+  };
+
+  useEffect(() => () => {
+    stopAudio();
+    streamRef.current?.socket.close();
+  }, []);
+
+  const handleUploadBatch = async (files) => {
+    setLoading(true);
+    const formData = new FormData();
+    files.forEach((file) => formData.append("files", file));
+    try {
+      const response = await fetch(`${API_BASE_URL}/assistente-vocale/batch`, {
+        method: "POST",
+        body: formData,
+      });
+      const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.detail || "Upload failed");
+      }
+      setUploadResult({ batch: data });
+    } catch (error) {
+      console.error("Error:", error);
+      setUploadResult({ error: error.message });
+    }
+    setLoading(false);
+  };
+
   const handleFileChange = (e) => {
-    const file = e.target.files[0];
-    setSelectedFile(file);
+    setSelectedFiles(Array.from(e.target.files));
   };
 
   const handleButtonUpload = () => {
-    if (selectedFile) {
-      handleUploadFile(selectedFile);
+    const isBatch = selectedFiles.length > 1 || selectedFiles.some((file) => file.name.toLowerCase().endsWith(".zip"));
+    if (isBatch) {
+      handleUploadBatch(selectedFiles);
+    } else if (selectedFiles.length === 1) {
+      handleUploadFile(selectedFiles[0]);
     }
   };
 
@@ -173,16 +293,21 @@ const VoiceAssistant = () => {
         <Section>
           <SectionTitle>Carica un file audio<br/ > (attualmente supportato solo formato .wav)</SectionTitle>
           <FileUploadContainer>
-            <FileInput type="file" accept="audio/*" onChange={handleFileChange} />
+            <FileInput type="file" accept="audio/*,.zip" multiple onChange={handleFileChange} />
             <Button onClick={handleButtonUpload}>Processa</Button>
           </FileUploadContainer>
         </Section>
         <Section>
           <SectionTitle>Registra dal microfono</SectionTitle>
           <MicrophoneContainer>
-            <FeaturePlaceholder>
-              Feature in costruzione - presto disponibile!
-            </FeaturePlaceholder>
+            <Button onClick={recording ? stopRecording : startRecording} disabled={loading}>
+              {recording ? "Termina registrazione" : "Avvia registrazione"}
+            </Button>
+            {(recording || segments.length > 0 || partial) && (
+              <LiveTranscript>
+                {segments.join(" ")} <PartialText>{partial}</PartialText>
+              </LiveTranscript>
+            )}
           </MicrophoneContainer>
         </Section>
       </SectionsWrapper>
@@ -194,6 +319,26 @@ const VoiceAssistant = () => {
               <ResultTitle>Error:</ResultTitle>
               <p>{uploadResult.error}</p>
             </>
+          ) : uploadResult.batch ? (
+            <>
+              <ResultTitle>
+                Note salvate: {uploadResult.batch.salvate} su {uploadResult.batch.totale}
+              </ResultTitle>
+              <InfoTable>
+                <tbody>
+                  {uploadResult.batch.file.map((voce) => (
+                    <InfoRow key={voce.file}>
+                      <InfoKey>{voce.file}</InfoKey>
+                      <InfoValue>
+                        {voce.stato === "salvata"
+                          ? `${voce.informazioni.nome} ${voce.informazioni.cognome} (cliente ${voce.codice_cliente}): ${voce.informazioni.nota}`
+                          : `Errore: ${voce.errore}`}
+                      </InfoValue>
+                    </InfoRow>
+                  ))}
+                </tbody>
+              </InfoTable>
+            </>
           ) : (
             <>
               <ResultTitle>Trascrizione:</ResultTitle>